@@ -6,9 +6,10 @@ mkdir -p /app/credentials
 mkdir -p /app/logs
 mkdir -p /app/midias_baixadas
 mkdir -p /app/plataformas
+mkdir -p /app/cache
 
 # Garantir permissões adequadas
-chmod -R 777 /app/credentials /app/logs /app/midias_baixadas /app/plataformas
+chmod -R 777 /app/credentials /app/logs /app/midias_baixadas /app/plataformas /app/cache
 
 # Função para registrar mensagens de log
 log() {
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jun  4 18:02:55 2025.
+
+@author: vcsil
+"""
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from pathlib import Path
+import threading
+import queue
+import time
+import os
+
+from utils.utils import MEDIA_SUFFIXES, iter_media_files
+
+
+class _MediaEventHandler(FileSystemEventHandler):
+    """Repassa ao observador os arquivos escritos ou movidos para a pasta."""
+
+    def __init__(self, notify):
+        super().__init__()
+        self.notify = notify
+
+    def on_closed(self, event):
+        """Arquivo fechado após escrita (IN_CLOSE_WRITE)."""
+        if not event.is_directory:
+            self.notify(event.src_path)
+
+    def on_moved(self, event):
+        """Arquivo ou pasta movido para dentro da pasta observada."""
+        if event.is_directory:
+            for path in iter_media_files(Path(event.dest_path)):
+                self.notify(str(path))
+        else:
+            self.notify(event.dest_path)
+
+
+class DirWatcher:
+    """
+    Observa um diretório e entrega os arquivos novos a uma fila de trabalho.
+
+    Cada evento reinicia o tempo de espera do arquivo. Ele só vai para a
+    fila quando passa `debounce` segundos sem eventos e o tamanho deixa de
+    mudar entre duas verificações, evitando enviar arquivos ainda sendo
+    escritos.
+
+    Parameters
+    ----------
+    root : Path
+        Diretório observado (recursivamente).
+    handler : TYPE
+        Chamável que recebe o endereço de cada arquivo pronto.
+    log : TYPE
+        Chamável de log.
+    debounce : float, optional
+        Segundos sem eventos antes de processar o arquivo. The default is 2.
+    workers : int, optional
+        Threads que consomem a fila. The default is 1.
+    max_queue : int, optional
+        Tamanho máximo da fila. The default is 1000.
+
+    """
+
+    def __init__(self, root: Path, handler, log, debounce: float = 2,
+                 workers: int = 1, max_queue: int = 1000):
+        self.root = Path(root)
+        self.handler = handler
+        self.log = log
+        self.debounce = debounce
+        self.workers = workers
+
+        self.queue = queue.Queue(maxsize=max_queue)
+        self._pending: dict[str, tuple[float, int]] = {}
+        self._queued: set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._started_workers = 0
+
+        self.observer = Observer()
+        self.observer.schedule(_MediaEventHandler(self.notify),
+                               str(self.root), recursive=True)
+
+    def notify(self, path: str) -> None:
+        """Registra (ou adia) um arquivo que recebeu evento."""
+        if Path(path).suffix.lower() not in MEDIA_SUFFIXES:
+            return
+
+        with self._lock:
+            self._pending[path] = (time.monotonic(), -1)
+
+    def _try_enqueue(self, path: str) -> bool:
+        """Coloca um arquivo na fila sem bloquear; False se ela está cheia."""
+        with self._lock:
+            if path in self._queued:
+                return True
+            try:
+                self.queue.put_nowait(path)
+            except queue.Full:
+                return False
+            self._queued.add(path)
+
+        return True
+
+    def _debounce_loop(self) -> None:
+        while not self._stop.wait(self.debounce / 4):
+            now = time.monotonic()
+            ready = []
+
+            with self._lock:
+                for path, (last_event, last_size) in list(
+                        self._pending.items()):
+                    if now - last_event < self.debounce:
+                        continue
+
+                    try:
+                        size = os.stat(path).st_size
+                    except OSError:
+                        # Arquivo removido antes de ficar pronto
+                        del self._pending[path]
+                        continue
+
+                    if size != last_size:
+                        # Ainda crescendo: espera mais um ciclo
+                        self._pending[path] = (now, size)
+                        continue
+
+                    del self._pending[path]
+                    ready.append(path)
+
+            for path in ready:
+                # Fila cheia (ex.: durante a varredura inicial, antes dos
+                # consumidores começarem): tenta de novo no próximo ciclo
+                if not self._try_enqueue(path):
+                    with self._lock:
+                        self._pending.setdefault(path, (now, -1))
+
+    def _worker_loop(self) -> None:
+        while True:
+            path = self.queue.get()
+            if path is None:
+                break
+
+            with self._lock:
+                self._queued.discard(path)
+
+            try:
+                if os.path.exists(path):
+                    self.handler(path)
+            except Exception as e:
+                self.log.error(f"Erro ao processar {path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def start_observer(self) -> None:
+        """Começa a receber eventos do diretório."""
+        self.observer.start()
+        thread = threading.Thread(target=self._debounce_loop, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def start_workers(self) -> None:
+        """Começa a consumir a fila de arquivos prontos."""
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self._started_workers += 1
+
+    def stop(self) -> None:
+        """Para o observador e espera as threads terminarem a fila."""
+        self.observer.stop()
+        self._stop.set()
+
+        for _ in range(self._started_workers):
+            self.queue.put(None)
+
+        self.observer.join()
+        for thread in self._threads:
+            thread.join()
@@ -7,7 +7,11 @@ Created on Mon Apr 21 14:15:43 2025.
 """
 
 from pydrive2.auth import GoogleAuth
+from datetime import datetime, timezone
 from pathlib import Path
+import threading
+import httplib2
+import os
 
 
 class DriveAuth:
@@ -21,6 +25,10 @@ class DriveAuth:
 
         self.gauth = GoogleAuth(settings=self._ensure_settings_file())
 
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+
     def authenticate(self):
         """Realiza autenticação, resgatando credenciais persistentes."""
         # Tenta carregar credenciais existentes
@@ -38,10 +46,88 @@ class DriveAuth:
             self.gauth.Authorize()
 
         # Salva as credenciais para uso futuro
-        self.gauth.SaveCredentialsFile(self.credentials_path)
+        self.save()
 
         return self.gauth
 
+    def save(self) -> None:
+        """Salva as credenciais de forma atômica."""
+        tmp_path = Path(self.credentials_path).with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(self.gauth.credentials.to_json())
+        os.replace(tmp_path, self.credentials_path)
+
+    def refresh(self) -> None:
+        """Renova o token de acesso e salva as credenciais."""
+        with self._lock:
+            # Conexão própria: a do GoogleAuth pode estar em uso
+            self.gauth.credentials.refresh(httplib2.Http(timeout=30))
+            self.save()
+
+    def seconds_to_expiry(self) -> float:
+        """Segundos até o token de acesso expirar (inf se desconhecido)."""
+        expiry = getattr(self.gauth.credentials, "token_expiry", None)
+        if expiry is None:
+            return float("inf")
+
+        # O oauth2client guarda a expiração em UTC sem fuso
+        if expiry.tzinfo is None:
+            expiry = expiry.replace(tzinfo=timezone.utc)
+        return (expiry - datetime.now(timezone.utc)).total_seconds()
+
+    def start_refresher(self, log=None, margin: float = 300,
+                        retry: float = 60) -> None:
+        """
+        Renova o token em segundo plano antes de ele expirar.
+
+        Sem isso, o token só é renovado quando uma requisição o encontra
+        expirado, e a renovação acontece no meio de um upload. Credenciais
+        sem expiração conhecida não são renovadas.
+
+        Parameters
+        ----------
+        log : TYPE, optional
+            Chamável de log. The default is None.
+        margin : float, optional
+            Segundos de antecedência da renovação. The default is 300.
+        retry : float, optional
+            Segundos até nova tentativa após uma falha. The default is 60.
+
+        """
+        if self._refresher is not None:
+            return
+        if self.seconds_to_expiry() == float("inf"):
+            if log is not None:
+                log.info("Credenciais do Drive sem expiração conhecida; "
+                         "renovação em segundo plano desativada.", False)
+            return
+
+        def loop():
+            while True:
+                wait = min(self.seconds_to_expiry() - margin, 3600)
+                if self._stop.wait(max(0, wait)):
+                    return
+                expiry = self.seconds_to_expiry()
+                if margin < expiry < float("inf"):
+                    continue
+                try:
+                    self.refresh()
+                    if log is not None:
+                        log.info("Credenciais do Drive renovadas.", False)
+                except Exception as e:
+                    if log is not None:
+                        log.warning(f"Falha ao renovar credenciais: {e}")
+                    if self._stop.wait(retry):
+                        return
+
+        self._refresher = threading.Thread(target=loop, name="drive-auth",
+                                           daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self) -> None:
+        """Encerra a renovação em segundo plano."""
+        self._stop.set()
+
     def _ensure_settings_file(self):
         """Cria settings.yaml necessário para a autenticação."""
         return {
@@ -6,17 +6,38 @@ Created on Mon Apr 21 14:19:51 2025.
 @author: vcsil
 """
 
+from concurrent.futures import ThreadPoolExecutor
 from pydrive2.drive import GoogleDrive
 from typing import Optional, List
 import datetime
 
+from driveSync.drive_request import DriveRequester, HttpPool, BATCH_LIMIT
+
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+# Pastas pai combinadas em uma única query de listagem
+PARENTS_PER_QUERY = 40
+
 
 class DriveClient:
     """Realiza operações no drive."""
 
-    def __init__(self, gauth):
+    def __init__(self, gauth, requester: Optional[DriveRequester] = None,
+                 pool_size: int = 4):
         """Inicia cliente do drive."""
         self.drive = GoogleDrive(gauth)
+        # Camada de requisições com controle de taxa e backoff
+        self.requester = requester or DriveRequester()
+        # O pydrive2 já reaproveita uma conexão por thread; o pool limita
+        # o total de conexões, qualquer que seja o número de threads, e
+        # dá uma conexão própria a cada batch (o http do serviço é um só
+        # e não é thread-safe)
+        self.pool = HttpPool(self.drive.auth.Get_Http_Object, pool_size)
+
+    @property
+    def service(self):
+        """Serviço da API do Drive usado nas requisições em batch."""
+        return self.drive.auth.service
 
     def list_folder(self, folder_id: str = "root",
                     folder_name: str = "root") -> List[dict]:
@@ -36,10 +57,28 @@ class DriveClient:
             Lista de arquivos/pastas.
 
         """
+        query = self._folder_query(folder_id, folder_name)
+        return self.requester.execute(
+            self.drive.ListFile({'q': query}).GetList)
+
+    def _call(self, method, param: Optional[dict] = None):
+        """Chama um método do pydrive2 com uma conexão do pool."""
+        with self.pool.lease() as http:
+            return method(param={**(param or {}), "http": http})
+
+    def _execute_batch(self, requests: list) -> list:
+        """Executa requisições em batch com uma conexão do pool."""
+        with self.pool.lease() as http:
+            return self.requester.execute_batch(self.service, requests,
+                                                http=http)
+
+    def _folder_query(self, folder_id: str, folder_name: str) -> str:
+        """Monta a query que busca uma pasta pelo nome dentro do pai."""
+        folder_name = folder_name.replace("\\", "\\\\").replace("'", "\\'")
         query = f"'{folder_id}' in parents and title='{folder_name}' "
-        query += "and mimeType='application/vnd.google-apps.folder' "
+        query += f"and mimeType='{FOLDER_MIME}' "
         query += "and trashed=false"
-        return self.drive.ListFile({'q': query}).GetList()
+        return query
 
     def print_file_list(self, file_list: list) -> None:
         """
@@ -65,7 +104,7 @@ class DriveClient:
         for file in file_list:
             file_type = (
                 "Pasta"
-                if file['mimeType'] == 'application/vnd.google-apps.folder'
+                if file['mimeType'] == FOLDER_MIME
                 else "Arquivo")
 
             print(f"{file['id']} | {file['title']} | {file_type}")
@@ -96,7 +135,7 @@ class DriveClient:
 
         # Faz o upload do arquivo
         start_time = datetime.datetime.now()
-        gfile.Upload()
+        self.requester.execute(self._call, gfile.Upload)
         end_time = datetime.datetime.now()
 
         gfile.metadata["uploadTime"] = (end_time - start_time).total_seconds()
@@ -124,30 +163,253 @@ class DriveClient:
         # Cria um objeto de pasta do Google Drive
         folder = self.drive.CreateFile({
             'title': name,
-            'mimeType': 'application/vnd.google-apps.folder',
+            'mimeType': FOLDER_MIME,
             **({'parents': [{'id': parent_id}]} if parent_id else {})
         })
-        folder.Upload()
+        self.requester.execute(self._call, folder.Upload)
         return folder.metadata
 
+    def list_folders_batch(self, specs: List[tuple]) -> List[List[dict]]:
+        """
+        Busca várias pastas pelo nome usando uma requisição em batch.
+
+        Parameters
+        ----------
+        specs : List[tuple]
+            Lista de tuplas (id da pasta pai, nome da pasta).
+
+        Returns
+        -------
+        List[List[dict]]
+            Pastas encontradas para cada tupla, na mesma ordem. None
+            para as buscas que falharam.
+
+        """
+        files = self.service.files()
+        requests = [files.list(q=self._folder_query(parent_id, name),
+                               maxResults=10, supportsAllDrives=True,
+                               includeItemsFromAllDrives=True)
+                    for parent_id, name in specs]
+
+        responses = self._execute_batch(requests)
+        return [resp.get('items', []) if resp is not None else None
+                for resp in responses]
+
+    def create_folders_batch(self, specs: List[tuple]) -> List[dict]:
+        """
+        Cria várias pastas usando uma requisição em batch.
+
+        Parameters
+        ----------
+        specs : List[tuple]
+            Lista de tuplas (id da pasta pai, nome da pasta).
+
+        Returns
+        -------
+        List[dict]
+            Metadados das pastas criadas, na mesma ordem. None para as
+            pastas que não puderam ser criadas.
+
+        """
+        files = self.service.files()
+        requests = [files.insert(body={'title': name,
+                                       'mimeType': FOLDER_MIME,
+                                       'parents': [{'id': parent_id}]},
+                                 supportsAllDrives=True)
+                    for parent_id, name in specs]
+
+        return self._execute_batch(requests)
+
+    def trash_items_batch(self, file_ids: List[str]) -> List[dict]:
+        """Envia vários itens para a lixeira usando requisições em batch."""
+        files = self.service.files()
+        requests = [files.trash(fileId=file_id, supportsAllDrives=True)
+                    for file_id in file_ids]
+
+        return self._execute_batch(requests)
+
+    def move_items_batch(self, moves: List[tuple]) -> List[dict]:
+        """
+        Move vários itens de pasta usando requisições em batch.
+
+        Parameters
+        ----------
+        moves : List[tuple]
+            Tuplas (id do item, id da pasta atual, id da nova pasta).
+
+        Returns
+        -------
+        List[dict]
+            Resposta de cada movimentação, na mesma ordem. None para as
+            que falharam.
+
+        """
+        files = self.service.files()
+        requests = [files.patch(fileId=file_id, addParents=new_parent,
+                                removeParents=old_parent, fields="id",
+                                supportsAllDrives=True)
+                    for file_id, old_parent, new_parent in moves]
+
+        return self._execute_batch(requests)
+
     def trash_item(self, file_id: str) -> None:
         """Envia um item para a lixeira."""
         gfile = self.drive.CreateFile({'id': file_id})
-        gfile.Trash()                       # 1 chamada HTTP
+        self.requester.execute(self._call, gfile.Trash)     # 1 chamada HTTP
         return
 
     def trash_folder_recursive(self, folder_id: str) -> None:
         """Envia o conteúdo de uma pasta para a lixeira."""
         # Lista todos os filhos (máx = 1000 por request → GetList() já pagina)
-        children = self.drive.ListFile({
+        children = self.requester.execute(self.drive.ListFile({
             'q': f"'{folder_id}' in parents and trashed=false"
-        }).GetList()
+        }).GetList)
 
         for child in children:
-            if child['mimeType'] == 'application/vnd.google-apps.folder':
+            if child['mimeType'] == FOLDER_MIME:
                 self.trash_folder_recursive(child['id'])
             else:
                 self.trash_item(child['id'])
 
         # por último, a própria pasta
         self.trash_item(folder_id)
+
+    def list_descendants(self, folder_id: str,
+                         fields: str = "id,title,mimeType,parents(id)"
+                         ) -> List[dict]:
+        """
+        Lista todos os descendentes de uma pasta com poucas queries.
+
+        Percorre a árvore em largura a partir de `folder_id`: cada nível
+        é listado combinando várias pastas pai em cada query, em vez de
+        uma listagem por pasta.
+
+        Parameters
+        ----------
+        folder_id : str
+            ID da pasta raiz.
+        fields : str, optional
+            Campos retornados de cada item.
+
+        Returns
+        -------
+        List[dict]
+            Pastas e arquivos sob `folder_id` (sem incluir a própria).
+
+        """
+        items = []
+        seen = {folder_id}
+        level = [folder_id]
+        while level:
+            next_level = []
+            for start in range(0, len(level), PARENTS_PER_QUERY):
+                chunk = level[start:start + PARENTS_PER_QUERY]
+                parents = " or ".join(f"'{pid}' in parents" for pid in chunk)
+                children = self.requester.execute(self.drive.ListFile({
+                    'q': f"({parents}) and trashed=false",
+                    'maxResults': 1000,
+                    'fields': f"items({fields}),nextPageToken"
+                }).GetList)
+
+                for child in children:
+                    # Um item com vários pais na árvore aparece uma vez
+                    if child['id'] in seen:
+                        continue
+                    seen.add(child['id'])
+                    items.append(child)
+                    if child['mimeType'] == FOLDER_MIME:
+                        next_level.append(child['id'])
+            level = next_level
+
+        return items
+
+    def trash_folder_bulk(self, folder_id: str, top_only: bool = False,
+                          workers: int = 4) -> List[str]:
+        """
+        Envia uma pasta e todo o seu conteúdo para a lixeira.
+
+        Os arquivos vão primeiro, em batches paralelos; depois as pastas,
+        das mais fundas para a raiz, cada uma só se tudo abaixo dela foi.
+        Assim, se algum item falhar, as pastas acima dele (e a raiz)
+        continuam fora da lixeira e o item continua acessível.
+
+        Parameters
+        ----------
+        folder_id : str
+            ID da pasta.
+        top_only : bool, optional
+            Envia só a pasta; o Drive leva junto os itens do usuário que
+            estão dentro dela (1 chamada HTTP). The default is False.
+        workers : int, optional
+            Batches enviados em paralelo no modo completo. The default is 4.
+
+        Returns
+        -------
+        List[str]
+            IDs das pastas que foram para a lixeira com todo o conteúdo,
+            a raiz primeiro quando ela foi.
+
+        """
+        if top_only:
+            self.trash_item(folder_id)
+            return [folder_id]
+
+        items = self.list_descendants(folder_id)
+        tree = {folder_id, *(item['id'] for item in items)}
+        parent_of = {item['id']: parent['id'] for item in items
+                     for parent in item.get('parents', [])
+                     if parent['id'] in tree}
+
+        # Pastas com algum item fora da lixeira: as acima do item que
+        # falhou, até a raiz
+        incomplete = set()
+
+        def mark_failed(item_id):
+            current = parent_of.get(item_id)
+            while current is not None and current not in incomplete:
+                incomplete.add(current)
+                current = parent_of.get(current)
+
+        file_ids = [item['id'] for item in items
+                    if item['mimeType'] != FOLDER_MIME]
+        chunks = [file_ids[start:start + BATCH_LIMIT]
+                  for start in range(0, len(file_ids), BATCH_LIMIT)]
+        # httplib2 não é thread-safe: cada batch usa sua própria conexão
+        # do pool
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            responses = [resp for chunk in pool.map(self.trash_items_batch,
+                                                    chunks)
+                         for resp in chunk]
+        for file_id, response in zip(file_ids, responses):
+            if response is None:
+                mark_failed(file_id)
+
+        # list_descendants devolve as pastas em largura: cada pai vem
+        # antes dos filhos
+        depth = {folder_id: 0}
+        levels = {}
+        for item in items:
+            if item['mimeType'] != FOLDER_MIME:
+                continue
+            depth[item['id']] = depth.get(parent_of.get(item['id']), 0) + 1
+            levels.setdefault(depth[item['id']], []).append(item['id'])
+
+        trashed = []
+        for level in sorted(levels, reverse=True):
+            folder_ids = [fid for fid in levels[level]
+                          if fid not in incomplete]
+            for start in range(0, len(folder_ids), BATCH_LIMIT):
+                chunk = folder_ids[start:start + BATCH_LIMIT]
+                for fid, response in zip(chunk,
+                                         self.trash_items_batch(chunk)):
+                    if response is None:
+                        mark_failed(fid)
+                    else:
+                        trashed.append(fid)
+
+        if folder_id in incomplete:
+            return trashed
+
+        # por último, a própria pasta
+        self.trash_item(folder_id)
+        return [folder_id] + trashed
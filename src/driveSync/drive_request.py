@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jun  3 09:41:07 2025.
+
+@author: vcsil
+"""
+from googleapiclient.errors import HttpError
+from pydrive2.files import ApiRequestError
+from contextlib import contextmanager
+import threading
+import httplib2
+import queue
+import random
+import socket
+import time
+import ssl
+
+# Motivos de erro 403 que indicam limite de taxa, não falta de permissão
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded",
+                      "sharingRateLimitExceeded"}
+
+# Máximo de requisições aceitas pelo Drive em um único batch
+BATCH_LIMIT = 100
+
+
+def _error_status(exc: Exception) -> tuple[int, set]:
+    """Retorna o código HTTP e os motivos de erro de uma exceção da API."""
+    if isinstance(exc, ApiRequestError):
+        error = exc.error or {}
+        reasons = {e.get("reason") for e in error.get("errors", [])}
+        return int(error.get("code") or 0), reasons
+
+    if isinstance(exc, HttpError):
+        status = int(getattr(exc.resp, "status", 0) or 0)
+        details = getattr(exc, "error_details", None) or []
+        reasons = {d.get("reason") for d in details if isinstance(d, dict)}
+        return status, reasons
+
+    return 0, set()
+
+
+def is_retryable(exc: Exception) -> bool:
+    """Indica se vale a pena repetir a requisição que gerou `exc`."""
+    if isinstance(exc, (ApiRequestError, HttpError)):
+        status, reasons = _error_status(exc)
+        if status == 429 or status >= 500:
+            return True
+        return status == 403 and bool(reasons & RATE_LIMIT_REASONS)
+
+    # Falhas de rede/transporte
+    return isinstance(exc, (ConnectionError, socket.timeout, ssl.SSLError,
+                            httplib2.HttpLib2Error))
+
+
+class DriveRateLimiter:
+    """
+    Balde de fichas thread-safe dimensionado pela cota do Drive.
+
+    Parameters
+    ----------
+    rate : float
+        Requisições por segundo permitidas.
+    capacity : float
+        Rajada máxima de requisições.
+
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """Bloqueia até existirem `tokens` fichas e as consome."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity,
+                                  self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                wait = (tokens - self.tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class DriveRequester:
+    """
+    Camada central de requisições ao Drive.
+
+    Toda chamada passa pelo balde de fichas e, em erros temporários
+    (403 de limite de taxa, 429, 5xx ou falhas de rede), é repetida com
+    backoff exponencial com jitter.
+
+    Parameters
+    ----------
+    log : TYPE, optional
+        Chamável de log. The default is None.
+    rate : float, optional
+        Requisições por segundo. The default is 10.
+    burst : float, optional
+        Rajada máxima. The default is 20.
+    max_retries : int, optional
+        Quantidade máxima de novas tentativas. The default is 6.
+    base_delay : float, optional
+        Atraso inicial do backoff em segundos. The default is 1.
+    max_delay : float, optional
+        Atraso máximo do backoff em segundos. The default is 64.
+
+    """
+
+    def __init__(self, log=None, rate: float = 10, burst: float = 20,
+                 max_retries: int = 6, base_delay: float = 1,
+                 max_delay: float = 64):
+        self.log = log
+        self.limiter = DriveRateLimiter(rate, burst)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def _backoff(self, attempt: int) -> float:
+        """Atraso exponencial com jitter para a tentativa `attempt`."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(ceiling / 2, ceiling)
+
+    def _warn(self, text: str) -> None:
+        if self.log is not None:
+            self.log.warning(text)
+
+    def execute(self, func, *args, **kwargs):
+        """
+        Executa `func` com controle de taxa e novas tentativas.
+
+        Parameters
+        ----------
+        func : TYPE
+            Chamável que faz a requisição.
+        *args, **kwargs
+            Argumentos repassados para `func`.
+
+        Returns
+        -------
+        TYPE
+            Resultado de `func`.
+
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return func(*args, **kwargs)
+            except Exception as exc:
+                if attempt == self.max_retries or not is_retryable(exc):
+                    raise
+
+                delay = self._backoff(attempt)
+                self._warn(f"Erro temporário no Drive ({exc}). "
+                           f"Nova tentativa em {delay:.1f}s.")
+                time.sleep(delay)
+
+    def execute_batch(self, service, requests: list, http=None) -> list:
+        """
+        Executa várias requisições usando batch HTTP do Drive.
+
+        Parameters
+        ----------
+        service : TYPE
+            Serviço da API do Drive (googleapiclient).
+        requests : list
+            Lista de HttpRequest ainda não executados.
+        http : TYPE, optional
+            Objeto HTTP usado no batch. The default is None.
+
+        Returns
+        -------
+        list
+            Respostas na mesma ordem de `requests`; None para as
+            requisições que falharam mesmo após as novas tentativas.
+
+        """
+        results = [None] * len(requests)
+        pending = list(range(len(requests)))
+
+        for attempt in range(self.max_retries + 1):
+            retry = []
+
+            for start in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[start:start + BATCH_LIMIT]
+                errors = {}
+
+                def callback(request_id, response, exception):
+                    if exception is None:
+                        results[int(request_id)] = response
+                    else:
+                        errors[int(request_id)] = exception
+
+                batch = service.new_batch_http_request(callback=callback)
+                for index in chunk:
+                    batch.add(requests[index], request_id=str(index))
+
+                # Cada item do batch conta na cota
+                self.limiter.acquire(len(chunk))
+                try:
+                    batch.execute(http=http)
+                except Exception as exc:
+                    if not is_retryable(exc):
+                        raise
+                    errors = {index: exc for index in chunk}
+
+                for index, exc in errors.items():
+                    if is_retryable(exc) and attempt < self.max_retries:
+                        retry.append(index)
+                    else:
+                        self._warn(f"Falha no item {index} do batch: {exc}")
+
+            if not retry:
+                break
+
+            pending = retry
+            delay = self._backoff(attempt)
+            self._warn(f"{len(retry)} itens do batch com erro temporário. "
+                       f"Nova tentativa em {delay:.1f}s.")
+            time.sleep(delay)
+
+        return results
+
+
+class HttpPool:
+    """
+    Conjunto de conexões HTTP autorizadas reaproveitadas entre requisições.
+
+    O httplib2 não é thread-safe, então cada thread pega uma conexão
+    emprestada e a devolve ao terminar. As conexões são criadas sob
+    demanda até `size` e mantidas abertas (keep-alive), então o total de
+    conexões não cresce com o número de threads. Todas compartilham as
+    credenciais, então um token renovado vale para as conexões já abertas.
+
+    Parameters
+    ----------
+    factory : TYPE
+        Chamável que cria uma conexão autorizada.
+    size : int, optional
+        Quantidade máxima de conexões. The default is 4.
+
+    """
+
+    def __init__(self, factory, size: int = 4):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+
+        if not create:
+            return self._idle.get()
+
+        try:
+            return self.factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def lease(self):
+        """Empresta uma conexão durante o bloco."""
+        http = self._get()
+        try:
+            yield http
+        finally:
+            self._idle.put(http)
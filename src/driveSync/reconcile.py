@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun 23 18:52:30 2025.
+
+@author: vcsil
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+import json
+import time
+import os
+
+from utils.utils import MEDIA_SUFFIXES, iter_media_files, md5_file
+from driveSync.drive_client import FOLDER_MIME
+
+# Campos pedidos ao Drive para montar o índice
+INDEX_FIELDS = "id,title,mimeType,parents(id),fileSize,md5Checksum"
+
+
+def build_remote_index(dclient, folder_id: str) -> dict:
+    """
+    Lista tudo que está sob `folder_id` no Drive.
+
+    Parameters
+    ----------
+    dclient : TYPE
+        Cliente Drive.
+    folder_id : str
+        ID da pasta raiz.
+
+    Returns
+    -------
+    dict
+        "folders": {caminho relativo: {"id", "parent"}} e
+        "files": lista de {"path", "id", "size", "md5"}.
+
+    """
+    items = dclient.list_descendants(folder_id, INDEX_FIELDS)
+    folders = {item["id"]: item for item in items
+               if item["mimeType"] == FOLDER_MIME}
+
+    paths = {folder_id: ()}
+
+    def folder_path(item_id: str) -> Optional[tuple]:
+        # Sobe pelos pais até uma pasta de caminho conhecido
+        chain = []
+        current = item_id
+        while current not in paths:
+            folder = folders.get(current)
+            if folder is None or not folder.get("parents"):
+                return None  # Fora da pasta raiz
+            chain.append(folder)
+            current = folder["parents"][0]["id"]
+
+        for folder in reversed(chain):
+            parent_id = folder["parents"][0]["id"]
+            paths[folder["id"]] = paths[parent_id] + (folder["title"],)
+
+        return paths[item_id]
+
+    index = {"folders": {}, "files": []}
+    for item in items:
+        if not item.get("parents"):
+            continue
+
+        parent_id = item["parents"][0]["id"]
+        parent = folder_path(parent_id)
+        if parent is None:
+            continue
+
+        path = "/".join(parent + (item["title"],))
+        if item["mimeType"] == FOLDER_MIME:
+            index["folders"][path] = {"id": item["id"], "parent": parent_id}
+        elif item.get("md5Checksum"):
+            index["files"].append({"path": path, "id": item["id"],
+                                   "size": int(item.get("fileSize", 0)),
+                                   "md5": item["md5Checksum"]})
+
+    return index
+
+
+def save_json(path: Path, data: dict) -> None:
+    """Salva um JSON de forma atômica."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def reconcile(local_dir: Path, log, dclient, dict_uploads, folder_id: str,
+              index_path: Path, report_path: Path, workers: int = 8,
+              dry_run: bool = False) -> dict:
+    """
+    Compara a pasta local com o Drive pelo caminho e md5 dos arquivos.
+
+    Arquivos locais que estão no Drive no mesmo caminho relativo e com o
+    mesmo conteúdo (por exemplo, enviados antes de uma queda que impediu
+    a remoção local) são apagados; os que faltam são devolvidos para
+    envio. Arquivos cujo conteúdo está no Drive em outro caminho não são
+    apagados nem enviados, só listados no relatório para conferência. As
+    mídias que só existem no Drive também vão para o relatório; no log
+    aparece só a contagem. Só são lidos os arquivos locais com tamanho
+    igual ao de algum arquivo do Drive.
+
+    Parameters
+    ----------
+    local_dir : Path
+        Diretório local espelhado no Drive.
+    log : TYPE
+        Chamável de log.
+    dclient : TYPE
+        Cliente Drive.
+    dict_uploads : dict
+        Dict de objetos sincronizados.
+    folder_id : str
+        ID da folder root do drive.
+    index_path : Path
+        Onde salvar o índice do Drive.
+    report_path : Path
+        Onde salvar o relatório.
+    workers : int, optional
+        Threads usadas no cálculo dos md5. The default is 8.
+    dry_run : bool, optional
+        Só gera o relatório, sem apagar nada. The default is False.
+
+    Returns
+    -------
+    dict
+        "missing": arquivos locais a enviar, "uploaded": arquivos locais
+        que já estão no Drive no mesmo caminho, "elsewhere": {arquivo
+        local: caminhos no Drive com o mesmo conteúdo} e "drive_only":
+        caminhos das mídias que só estão no Drive.
+
+    """
+    log.info("Listando o conteúdo do Drive...")
+    started = time.perf_counter()
+    remote = build_remote_index(dclient, folder_id)
+    save_json(index_path, {**remote, "updated": time.time()})
+    log.info(f"{len(remote['files'])} arquivos e {len(remote['folders'])} "
+             f"pastas no Drive ({time.perf_counter() - started:.1f}s).")
+
+    # Aproveita a listagem para completar o registro de pastas
+    dirs = dict_uploads.uploads["uploaded_dirs"]
+    for path, folder in remote["folders"].items():
+        name = path.rsplit("/", 1)[-1]
+        if name not in dirs.get(folder["parent"], {}):
+            dict_uploads.add_dir(folder["parent"], name, folder["id"])
+
+    # Um caminho pode ter mais de um arquivo (nomes repetidos no Drive)
+    remote_paths = {}
+    remote_md5 = {}
+    for f in remote["files"]:
+        remote_paths.setdefault(f["path"], set()).add(f["md5"])
+        remote_md5.setdefault(f["md5"], []).append(f["path"])
+    remote_sizes = {f["size"] for f in remote["files"]}
+
+    local_files = list(iter_media_files(local_dir))
+    candidates = [p for p in local_files
+                  if p.stat().st_size in remote_sizes]
+    log.info(f"Calculando md5 de {len(candidates)} de {len(local_files)} "
+             "arquivos locais...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        local_md5 = dict(zip(candidates, pool.map(md5_file, candidates)))
+
+    uploaded, missing, elsewhere = [], [], {}
+    for p in local_files:
+        md5 = local_md5.get(p)
+        relative = p.relative_to(local_dir).as_posix()
+        if md5 is not None and md5 in remote_paths.get(relative, ()):
+            uploaded.append(p)
+        elif md5 in remote_md5:
+            elsewhere[p] = remote_md5[md5]
+        else:
+            missing.append(p)
+
+    # Mídias do Drive sem cópia local (outros arquivos ficam de fora)
+    local_hashes = set(local_md5.values())
+    drive_only = [f["path"] for f in remote["files"]
+                  if f["md5"] not in local_hashes and
+                  Path(f["path"]).suffix.lower() in MEDIA_SUFFIXES]
+
+    save_json(report_path, {
+        "missing": [str(p.relative_to(local_dir)) for p in missing],
+        "uploaded": [str(p.relative_to(local_dir)) for p in uploaded],
+        "elsewhere": {str(p.relative_to(local_dir)): paths
+                      for p, paths in elsewhere.items()},
+        "drive_only": drive_only,
+        "updated": time.time()})
+    log.info(f"Reconciliação: {len(missing)} a enviar, {len(uploaded)} já "
+             f"no Drive, {len(elsewhere)} no Drive em outro caminho, "
+             f"{len(drive_only)} mídias só no Drive. Relatório em "
+             f"{report_path}.")
+
+    if not dry_run:
+        for path in uploaded:
+            try:
+                os.remove(path)
+                log.info("Já no Drive, apagado: "
+                         f"{path.relative_to(local_dir)}", False)
+            except OSError as err:
+                log.warning(f"Falhou para apagar {path}: {err}")
+
+    return {"missing": missing, "uploaded": uploaded,
+            "elsewhere": elsewhere, "drive_only": drive_only}
@@ -101,3 +101,41 @@ class UploadedFilesDirs:
                 if meta["id"] == folder_id:
                     meta["last_upload"] = now
                     return
+
+    def remove_tree(self, folder_id: str) -> int:
+        """
+        Remove do registro uma pasta e todas as suas subpastas.
+
+        Parameters
+        ----------
+        folder_id : str
+            ID da pasta removida do Drive.
+
+        Returns
+        -------
+        int
+            Quantidade de pastas removidas do registro.
+
+        """
+        dirs = self.uploads["uploaded_dirs"]
+
+        # Tira a pasta da lista de filhos do seu pai
+        found = folder_id in dirs
+        for children in dirs.values():
+            for name, meta in list(children.items()):
+                if meta["id"] == folder_id:
+                    del children[name]
+                    found = True
+
+        if not found:
+            return 0
+
+        removed = 0
+        stack = [folder_id]
+        while stack:
+            current = stack.pop()
+            removed += 1
+            for meta in dirs.pop(current, {}).values():
+                stack.append(meta["id"])
+
+        return removed
@@ -6,18 +6,57 @@ Created on Mon Apr 21 15:27:46 2025.
 @author: vcsil
 """
 from dotenv import dotenv_values
+from typing import Optional
 from pathlib import Path
 import os
 
-from utils.utils import BUILD_ABSPATH, file_root_recursive
-from driveSync.uploaded_filesdirs import UploadedFilesDirs
-from driveSync.drive_client import DriveClient
-from driveSync.drive_auth import DriveAuth
+from utils.utils import BUILD_ABSPATH, iter_media_files, try_lock
 from utils.logger_setup import SetupLogger
 
+# Arquivos da varredura inicial tratados por vez (pastas resolvidas em batch)
+CATCHUP_BATCH = 200
+
+
+def resolve_folder(path: str, log, dclient, local_path: Path,
+                   dict_uploads: dict, folder_id: str) -> str:
+    """
+    Recria no Drive as pastas de `path` e retorna o ID da última.
+
+    Parameters
+    ----------
+    path : str
+        Endereço do arquivo.
+    log : TYPE
+        Chamável de log.
+    dclient : TYPE
+        Cliente Drive.
+    local_path : Path
+        Diretório local espelhado no Drive.
+    dict_uploads : dict
+        Dict de objetos sincronizados.
+    folder_id : str
+        ID da folder root do drive.
+
+    Returns
+    -------
+    str
+        ID da pasta do Drive onde o arquivo deve ficar.
+
+    """
+    relative_path = Path(path).relative_to(local_path)
+
+    current_folder_id = folder_id
+    for folder_name in relative_path.parts[:-1]:
+        current_folder_id = get_or_create_folder(folder_name,
+                                                 current_folder_id, log,
+                                                 dclient, dict_uploads)
+
+    return current_folder_id
+
 
 def sync_upload(path: str, log, dclient, local_path: Path,
-                dict_uploads: dict, folder_id: str) -> None:
+                dict_uploads: dict, folder_id: str,
+                target_id: Optional[str] = None) -> Optional[dict]:
     """
     Faz operações necessárias para sincronizar pastas e arquivos.
 
@@ -33,11 +72,14 @@ def sync_upload(path: str, log, dclient, local_path: Path,
         Dict de objetos sincronizados.
     folder_id : str
         ID da folder root do drive.
+    target_id : Optional[str], optional
+        ID da pasta do Drive já resolvida para o arquivo (ex.: itens de
+        um mesmo álbum). The default is None.
 
     Returns
     -------
-    None
-        DESCRIPTION.
+    Optional[dict]
+        Metadados do arquivo no Drive, ou None se o envio falhou.
 
     """
     log.info(f"Novo arquivo detectado: {path}")
@@ -45,16 +87,14 @@ def sync_upload(path: str, log, dclient, local_path: Path,
     # Sincroniza o arquivo modificado
     relative_path = Path(path).relative_to(local_path)
 
-    current_folder_id = folder_id
+    current_folder_id = target_id
 
     try:
         # Recria a estrutura de pastas no Google Drive
-        if relative_path != '.':
-            for folder_name in relative_path.parts[:-1]:
-                current_folder_id = get_or_create_folder(folder_name,
-                                                         current_folder_id,
-                                                         log, dclient,
-                                                         dict_uploads)
+        if current_folder_id is None:
+            current_folder_id = resolve_folder(path, log, dclient,
+                                               local_path, dict_uploads,
+                                               folder_id)
 
         # Faz o upload do arquivo
         metadata = dclient.upload_file(path, current_folder_id)
@@ -72,8 +112,11 @@ def sync_upload(path: str, log, dclient, local_path: Path,
             # Não interrompe o fluxo se falhar, apenas registra
             log.warning(f"Falhou para apagar {relative_path}: {err}")
 
+        return metadata
+
     except Exception as exc:
         log.error(f"Falha mesmo após retries: {exc}")
+        return None
 
 
 def get_or_create_folder(folder_name, parent_folder_id, log, dclient,
@@ -110,9 +153,154 @@ def get_or_create_folder(folder_name, parent_folder_id, log, dclient,
         return folder["id"]
 
 
+def trash_remote_folder(folder_id: str, log, dclient, dict_uploads,
+                        top_only: bool = False, workers: int = 4) -> None:
+    """
+    Envia uma pasta do Drive para a lixeira e limpa o registro local.
+
+    Parameters
+    ----------
+    folder_id : str
+        ID da pasta no Drive.
+    log : TYPE
+        Chamável de log.
+    dclient : TYPE
+        Cliente Drive.
+    dict_uploads : dict
+        Dict de objetos sincronizados.
+    top_only : bool, optional
+        Envia só a pasta raiz (o Drive leva o conteúdo junto).
+        The default is False.
+    workers : int, optional
+        Batches enviados em paralelo. The default is 4.
+
+    Returns
+    -------
+    None.
+
+    """
+    log.info(f"Enviando a pasta {folder_id} para a lixeira...")
+    trashed = dclient.trash_folder_bulk(folder_id, top_only, workers)
+    if folder_id not in trashed:
+        log.warning(f"Alguns itens de {folder_id} não foram para a "
+                    "lixeira; a pasta e as que os contêm foram mantidas.")
+
+    # Só saem do registro as pastas que foram inteiras para a lixeira
+    removed = sum(dict_uploads.remove_tree(trashed_id)
+                  for trashed_id in trashed)
+    log.info(f"{len(trashed)} pastas na lixeira, {removed} removidas do "
+             "arquivo de registros.")
+
+
+def prefetch_folders(paths: list, local_path: Path, log, dclient,
+                     dict_uploads, folder_id: str) -> None:
+    """
+    Resolve em batch as pastas do Drive necessárias para `paths`.
+
+    As pastas são tratadas nível a nível: as que não estão no registro
+    são buscadas em uma única requisição em batch e as que não existirem
+    são criadas em outra. O que falhar aqui é resolvido depois, pasta a
+    pasta, por `get_or_create_folder`.
+
+    Parameters
+    ----------
+    paths : list
+        Endereços dos arquivos que serão enviados.
+    local_path : Path
+        Diretório local espelhado no Drive.
+    log : TYPE
+        Chamável de log.
+    dclient : TYPE
+        Cliente Drive.
+    dict_uploads : dict
+        Dict de objetos sincronizados.
+    folder_id : str
+        ID da folder root do drive.
+
+    Returns
+    -------
+    None.
+
+    """
+    dirs = dict_uploads.uploads["uploaded_dirs"]
+    folders = {Path(p).relative_to(local_path).parent.parts for p in paths}
+    known = {(): folder_id}
+
+    depth = 1
+    while any(len(parts) >= depth for parts in folders):
+        lookups = []
+        for parts in sorted({f[:depth] for f in folders if len(f) >= depth}):
+            parent_id = known.get(parts[:-1])
+            if parent_id is None:
+                continue  # Pai não resolvido, fica para o fluxo normal
+
+            cached = dirs.get(parent_id, {}).get(parts[-1])
+            if cached:
+                known[parts] = cached["id"]
+            else:
+                lookups.append(parts)
+
+        if lookups:
+            specs = [(known[parts[:-1]], parts[-1]) for parts in lookups]
+            log.info(f"Buscando {len(specs)} pastas em batch.", False)
+
+            missing = []
+            for parts, spec, found in zip(lookups, specs,
+                                          dclient.list_folders_batch(specs)):
+                if found:
+                    dict_uploads.add_dir(spec[0], found[0]["title"],
+                                         found[0]["id"])
+                    known[parts] = found[0]["id"]
+                elif found is not None:
+                    missing.append((parts, spec))
+
+            if missing:
+                log.info(f"Criando {len(missing)} pastas em batch.")
+                created = dclient.create_folders_batch(
+                    [spec for _, spec in missing])
+                for (parts, spec), folder in zip(missing, created):
+                    if folder:
+                        dict_uploads.add_dir(spec[0], folder["title"],
+                                             folder["id"])
+                        known[parts] = folder["id"]
+
+        depth += 1
+
+
 if __name__ == "__main__":
+    from itertools import islice
+    import argparse
+    import time
+
     from tqdm import tqdm
 
+    # Importados aqui para que sync_upload possa ser usado por outros
+    # módulos sem carregar a pilha do Drive
+    from driveSync.uploaded_filesdirs import UploadedFilesDirs
+    from driveSync.drive_request import DriveRequester
+    from driveSync.drive_client import DriveClient
+    from driveSync.dir_watcher import DirWatcher
+    from driveSync.drive_auth import DriveAuth
+    from driveSync.reconcile import reconcile
+    from ocr.text_index import TextIndex
+
+    parser = argparse.ArgumentParser(
+        description="Sincroniza a pasta de destino com o Google Drive.")
+    parser.add_argument("--once", action="store_true",
+                        help="Envia os arquivos existentes e encerra, "
+                             "sem observar a pasta.")
+    parser.add_argument("--trash", metavar="FOLDER_ID",
+                        help="Envia a pasta do Drive e todo o seu conteúdo "
+                             "para a lixeira e encerra.")
+    parser.add_argument("--top-only", action="store_true",
+                        help="Com --trash, envia só a pasta raiz.")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Compara a pasta local com o Drive pelo md5, "
+                             "envia só o que falta e encerra.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Com --reconcile, só gera o relatório.")
+    args = parser.parse_args()
+
     env = dotenv_values(BUILD_ABSPATH(__file__, "..", ".env"))
 
     # Inicia logger
@@ -122,23 +310,110 @@ if __name__ == "__main__":
     # Inicia conexao e autenticacao com o drive
     client_secrets_path = BUILD_ABSPATH(
         __file__, "../credentials/client_secrets.json")
-    auth = DriveAuth(client_secrets_path).authenticate()
+    drive_auth = DriveAuth(client_secrets_path)
+    auth = drive_auth.authenticate()
+    drive_auth.start_refresher(logger)
 
     # Inicia cliente do drive
-    drive_client = DriveClient(auth)
+    requester = DriveRequester(logger,
+                               rate=float(env.get("DRIVE_RATE", 10)),
+                               burst=float(env.get("DRIVE_RATE_BURST", 20)))
+    drive_client = DriveClient(auth, requester,
+                               pool_size=int(env.get("DRIVE_HTTP_POOL") or 4))
 
     # Lê arquivo que armazena informações do que já foi sincronizado
     obj_uploads = UploadedFilesDirs(BUILD_ABSPATH(__file__, "../uploads.json"))
 
     local_dir = BUILD_ABSPATH(__file__, "..", env["DESTINATION_DIR_IMAGE"])
+    base_folder_id = env["GDRIVE_BASE_FOLDER_ID"]
 
-    files = file_root_recursive(local_dir)
+    # Índice do OCR: guarda onde cada arquivo organizado ficou no Drive
+    text_index = TextIndex(BUILD_ABSPATH(__file__,
+                                         "../cache/ocr_index.sqlite"))
 
-    for file in tqdm(files):
-        sync_upload(file, logger, drive_client, local_dir, obj_uploads,
-                    env["GDRIVE_BASE_FOLDER_ID"])
+    def send(path):
+        """Envia um arquivo e registra o ID dele no índice do OCR."""
+        metadata = sync_upload(path, logger, drive_client, local_dir,
+                               obj_uploads, base_folder_id)
+        if metadata is not None:
+            parents = metadata.get("parents") or [{}]
+            text_index.uploaded(path, metadata["id"], parents[0].get("id"))
+
+    if args.trash:
+        try:
+            trash_remote_folder(args.trash, logger, drive_client, obj_uploads,
+                                args.top_only)
+        finally:
+            obj_uploads.update_dict()
+        raise SystemExit(0)
+
+    # Só um processo envia a pasta de destino: se o mainTelegram já está
+    # enviando o que organiza, os dois criariam duplicatas no Drive
+    upload_lock = None
+    if not (args.reconcile and args.dry_run):
+        upload_lock = try_lock(BUILD_ABSPATH(__file__,
+                                             "../cache/uploader.lock"))
+        if upload_lock is None:
+            logger.error("O mainTelegram já está enviando a pasta de "
+                         "destino. Encerrando.")
+            raise SystemExit(1)
+
+    # Arquivos da varredura inicial
+    files = iter_media_files(local_dir)
+    if args.reconcile:
+        report = reconcile(
+            local_dir, logger, drive_client, obj_uploads, base_folder_id,
+            BUILD_ABSPATH(__file__, "../cache/drive_index.json"),
+            BUILD_ABSPATH(__file__, "../logs/reconcile-report.json"),
+            dry_run=args.dry_run)
+        obj_uploads.update_dict()
+        if args.dry_run:
+            raise SystemExit(0)
+        files = iter(report["missing"])
+
+    last_save = time.monotonic()
+
+    def upload(path):
+        """Envia um arquivo detectado pelo observador."""
+        global last_save
+        send(path)
+
+        # Salva o registro periodicamente, na mesma thread que o altera
+        if time.monotonic() - last_save > 60:
+            obj_uploads.update_dict()
+            last_save = time.monotonic()
+
+    # O observador começa antes da varredura inicial para não perder
+    # arquivos criados enquanto ela acontece
+    watcher = None
+    if not (args.once or args.reconcile):
+        watcher = DirWatcher(local_dir, upload, logger,
+                             debounce=float(env.get("WATCH_DEBOUNCE", 2)))
+        watcher.start_observer()
 
     try:
-        logger.info("Iniciando observação de diretório.")
+        # Varredura inicial preguiçosa, em lotes, para começar a enviar logo
+        progress = tqdm(desc="Arquivos", unit="arq")
+        while batch := list(islice(files, CATCHUP_BATCH)):
+            # Cria de uma vez as pastas que ainda não existem no Drive
+            prefetch_folders(batch, local_dir, logger, drive_client,
+                             obj_uploads, base_folder_id)
+
+            for file in batch:
+                send(file)
+                progress.update()
+        progress.close()
+
+        if watcher is not None:
+            logger.info("Iniciando observação de diretório.")
+            watcher.start_workers()
+            while True:
+                time.sleep(60)
+
+    except KeyboardInterrupt:
+        logger.info("Interrupção de teclado detectada. Encerrando...")
+
     finally:
+        if watcher is not None:
+            watcher.stop()
         obj_uploads.update_dict()
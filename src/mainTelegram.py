@@ -9,26 +9,47 @@ Downloads media from a specified Telegram group and organizes it by date.
 @author: vcsil
 """
 
-from pyrogram.errors import FloodWait
 from pyrogram import Client, filters
 from pyrogram.types import Message
 from dotenv import dotenv_values
 from typing import Optional
 from pathlib import Path
 import nest_asyncio
+import threading
+import importlib
+import tempfile
 import asyncio
+import time
+import os
 
-from driveSync.uploaded_filesdirs import UploadedFilesDirs
-from driveSync.drive_client import DriveClient
-from driveSync.drive_auth import DriveAuth
+from telegramSync.parallel_download import ParallelDownloader, CHUNK_SIZE
+from telegramSync.rate_limiter import TelegramRateLimiter, check_download
+from telegramSync.scheduler import PriorityScheduler, LIVE, BACKFILL
+from telegramSync.session_pool import SessionPool, TelegramSession
+from telegramSync.unfinished import UnfinishedMessages
+from telegramSync.video_stream import moov_before_mdat
+from telegramSync.album_buffer import AlbumBuffer
+from telegramSync.seen_media import SeenMedia
+from telegramSync.spool import SpoolBudget
+from utils.mem_watchdog import MemoryWatchdog
+from utils.profiling import MessageProfiler
+from utils.transcode import Transcoder
 from utils.logger_setup import SetupLogger
-from organizeGroups import organize_midia
-from utils.utils import BUILD_ABSPATH
-from mainDrive import sync_upload
+from utils.utils import (BUILD_ABSPATH, iter_media_files, parse_size,
+                         try_lock)
+from mainDrive import sync_upload, resolve_folder
+
+# The OCR (cv2, numpy, pytesseract) and Drive (pydrive2) stacks are not
+# imported here: they are loaded on first use or warmed up in background
+# after the Telegram client has connected.
+STARTED_AT = time.perf_counter()
 
 # Apply patch to allow multiple event loops
 nest_asyncio.apply()
 
+# Quantidade de mensagens pedidas por página do histórico (máx. do Telegram)
+HISTORY_PAGE_SIZE = 100
+
 
 class TelegramMediaDownloader:
     """A class to download media from Telegram groups."""
@@ -52,75 +73,991 @@ class TelegramMediaDownloader:
         # Configure logging
         self.log = SetupLogger(self.logs_dir / "log-main.txt", "main")
 
+        # Google Drive settings; authentication is deferred
+        self.env = env
+        self.local_dir = BUILD_ABSPATH(__file__, "..",
+                                       env["DESTINATION_DIR_IMAGE"])
+        self.base_folder_id = env["GDRIVE_BASE_FOLDER_ID"]
+        self._drive = None
+        self._drive_lock = threading.Lock()
+
+        # Only one process uploads DESTINATION_DIR_IMAGE. If mainDrive is
+        # already watching it, organized files are left for its watcher
+        # until it releases the lock.
+        self._upload_lock_path = self.base_dir / "cache" / "uploader.lock"
+        self._upload_lock = try_lock(self._upload_lock_path)
+        self._upload_lock_guard = threading.Lock()
+
+        # OCR stack (organizeGroups), imported on first use. With
+        # OCR_PROCESSES, tesseract runs in worker processes fed through
+        # shared memory
+        self._organizer = None
+        self._organizer_lock = threading.Lock()
+        self.ocr_processes = int(env.get("OCR_PROCESSES") or 0)
+        self.ocr_slot_size = parse_size(env.get("OCR_SLOT_SIZE", "8M"))
+        self.ocr_pool = None
+
         # Telegram API credentials
         self.api_id = env["TELEGRAM_API_ID"]
         self.api_hash = env["TELEGRAM_API_HASH"]
         self.phone_number = env["TELEGRAM_PHONE_NUMBER"]
         self.group_id = int(env["TELEGRAM_GROUP_ID"], 0)
 
-        # Initialize Pyrogram client
+        # Initialize Pyrogram client. Short FloodWaits are slept inside
+        # Pyrogram; longer ones reach the rate limiter, which learns
+        # from them. Without max_concurrent_transmissions Pyrogram
+        # downloads a single file at a time.
+        client_options = {"max_concurrent_transmissions": int(
+            env.get("DOWNLOAD_MAX_CONNECTIONS") or 8)}
+        if env.get("TELEGRAM_SLEEP_THRESHOLD"):
+            client_options["sleep_threshold"] = int(
+                env["TELEGRAM_SLEEP_THRESHOLD"])
         self.app = Client(
             "minha_conta",
             api_id=self.api_id,
             api_hash=self.api_hash,
             phone_number=self.phone_number,
-            workdir=str(self.credentials_dir)
+            workdir=str(self.credentials_dir),
+            **client_options
         )
 
+        # Shared rate limiter for every call made to Telegram
+        self.limiter = TelegramRateLimiter(
+            self.log,
+            rate=float(env.get("TELEGRAM_RATE", 1.0)),
+            burst=float(env.get("TELEGRAM_RATE_BURST", 5)))
+
+        # Local spool budget: downloads wait while uploads are behind
+        self.spool = SpoolBudget(
+            [self.download_folder,
+             self.base_dir / env["DESTINATION_DIR_IMAGE"]],
+            self.log,
+            max_bytes=parse_size(env.get("SPOOL_MAX_BYTES")),
+            max_files=int(env.get("SPOOL_MAX_FILES") or 0),
+            video_share=float(env.get("SPOOL_VIDEO_SHARE", 0.8)),
+            status_path=self.logs_dir / "spool-status.json",
+            drain=self._drain_spool)
+        self._drain_lock = asyncio.Lock()
+
+        # Stage slots shared by live messages and backfill; live messages
+        # go first, backfill keeps a minimum share
+        self.scheduler = PriorityScheduler(
+            self.log,
+            {"download": int(env.get("SCHED_DOWNLOAD_SLOTS") or 3),
+             "ocr": int(env.get("SCHED_OCR_SLOTS") or os.cpu_count() or 1),
+             "transcode": int(env.get("TRANSCODE_WORKERS") or 2),
+             "upload": int(env.get("SCHED_UPLOAD_SLOTS") or 1)},
+            min_backfill_share=float(env.get("SCHED_MIN_BACKFILL_SHARE",
+                                             0.1)),
+            report_every=float(env.get("SCHED_REPORT_EVERY", 300)))
+
+        # Large videos are streamed and classified from their first
+        # chunks; already organized videos are skipped
+        self.stream_min_size = parse_size(env.get("STREAM_MIN_SIZE", "20M"))
+        self.stream_head_size = parse_size(env.get("STREAM_HEAD_SIZE", "4M"))
+        self.seen = SeenMedia(self.base_dir / "cache" / "seen_media.json")
+
+        # Large files are fetched in several ranges at once. The first
+        # segment always covers the streamed head.
+        self.parallel_min_size = parse_size(
+            env.get("PARALLEL_MIN_SIZE", "10M"))
+        head_chunks = -(-self.stream_head_size // CHUNK_SIZE)
+        download_options = {
+            "parts": int(env.get("DOWNLOAD_PARTS") or 4),
+            "max_connections": int(env.get("DOWNLOAD_MAX_CONNECTIONS") or 8),
+            "segment_chunks": max(8, head_chunks)}
+        self.downloader = ParallelDownloader(self.app, self.limiter,
+                                             self.log, **download_options)
+        self.session = TelegramSession("minha_conta", self.app,
+                                       self.limiter, self.downloader)
+
+        # Extra accounts that share the historical download. Each one
+        # needs an authorized session file in credentials/.
+        self.extra_sessions = []
+        for name in env.get("TELEGRAM_EXTRA_SESSIONS", "").split(","):
+            name = name.strip()
+            if not name:
+                continue
+            if not (self.credentials_dir / f"{name}.session").exists():
+                self.log.warning(f"Sessão {name} não encontrada em "
+                                 "credentials/. Ignorando.")
+                continue
+
+            client = Client(
+                name,
+                api_id=self.api_id,
+                api_hash=self.api_hash,
+                workdir=str(self.credentials_dir),
+                no_updates=True,
+                **client_options)
+            limiter = TelegramRateLimiter(
+                self.log,
+                rate=float(env.get("TELEGRAM_RATE", 1.0)),
+                burst=float(env.get("TELEGRAM_RATE_BURST", 5)))
+            self.extra_sessions.append(TelegramSession(
+                name, client, limiter,
+                ParallelDownloader(client, limiter, self.log,
+                                   **download_options)))
+        self.backfill_range = int(env.get("BACKFILL_RANGE") or 500)
+        self.backfill_handoff = float(env.get("BACKFILL_HANDOFF") or 30)
+
+        # Opt-in memory watchdog; crossing the ceiling drains the work in
+        # flight and exits so that the entrypoint restarts the process
+        self.memory = None
+        if env.get("MEM_WATCHDOG", "0") not in ("", "0"):
+            self.memory = MemoryWatchdog(
+                self.log,
+                interval=float(env.get("MEM_INTERVAL") or 60),
+                ceiling=parse_size(env.get("MEM_CEILING")),
+                top=int(env.get("MEM_TOP") or 10),
+                on_ceiling=self._drain_and_stop)
+
+        # Opt-in stack sampling of slow (and a fraction of all) messages
+        self.profiler = MessageProfiler(
+            self.log, self.logs_dir / "profiles",
+            enabled=env.get("PROFILE", "0") not in ("", "0"),
+            threshold=float(env.get("PROFILE_THRESHOLD") or 10),
+            sample_rate=float(env.get("PROFILE_SAMPLE_RATE") or 0))
+
+        # Optional re-encoding between organizing and uploading
+        self.transcoder = None
+        if env.get("TRANSCODE", "0") not in ("", "0"):
+            self.transcoder = Transcoder(
+                self.log,
+                photo_format=env.get("TRANSCODE_PHOTO_FORMAT", "webp"),
+                photo_quality=int(env.get("TRANSCODE_PHOTO_QUALITY") or 80),
+                video_preset=env.get("TRANSCODE_VIDEO_PRESET", "h264"),
+                min_saving=float(env.get("TRANSCODE_MIN_SAVING") or 0.1),
+                max_size=parse_size(env.get("TRANSCODE_MAX_SIZE")),
+                timeout=float(env.get("TRANSCODE_TIMEOUT") or 120))
+
+        # Album items are buffered and classified once per album
+        self.albums = AlbumBuffer(self.process_album,
+                                  delay=float(env.get("ALBUM_DELAY") or 2))
+        self.album_tries = int(env.get("ALBUM_TRIES") or 2)
+
+        # Messages being processed, and the shutdown signal. Messages
+        # still in flight or refused while draining are saved for the
+        # next run.
+        self._inflight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._draining = False
+        self._stop = asyncio.Event()
+        self._active = set()
+        self._deferred = set()
+        self._backfill_pool = None
+        self.unfinished = UnfinishedMessages(
+            self.base_dir / "cache" / "unfinished_messages.json")
+
         # Set up message handler
         @self.app.on_message(filters.chat(self.group_id) &
                              (filters.photo | filters.video))
         async def handle_new_message(client, message):
             """Handle new messages with media."""
             self.log.info(f"Nova mensagem recebida: {message.id}")
-            await self.process_media(message)
+            if self._draining:
+                self._deferred.add(message.id)
+                return
+            if message.media_group_id:
+                self.albums.add(message)
+            else:
+                await self.process_media(message)
 
-    async def process_media(self, message: Message) -> None:
+    async def process_media(self, message: Message, priority: str = LIVE,
+                            session: Optional[TelegramSession] = None
+                            ) -> None:
         """
         Process and download media from a message.
 
         Args
         ----
             message: The Telegram message containing media
+            priority: LIVE for new messages, BACKFILL for history
+            session: Account that fetched the message (default: main)
+        """
+        started = time.monotonic()
+        self._inflight += 1
+        self._idle.clear()
+        self._active.add(message.id)
+        media = message.video or message.photo
+        tags = {"msg": message.id,
+                "media": "video" if message.video else "photo",
+                "size": getattr(media, "file_size", 0) or 0}
+        async with self.profiler.profile(**tags):
+            try:
+                if self._should_stream(message):
+                    new_file_path = await self._stream_video(
+                        message, priority, session)
+                else:
+                    file_path = await self._download_media(
+                        message, priority, session)
+                    if file_path is None:
+                        return
+                    if not (message.photo or message.video):
+                        return
+
+                    # Process images and videos with organize_midia
+                    organizer = await asyncio.to_thread(self._get_organizer)
+                    async with self.scheduler.slot("ocr", priority):
+                        new_file_path = await asyncio.to_thread(
+                            organizer.organize_midia, str(file_path),
+                            message.date, self.log, message.id)
+
+                if new_file_path is not None:
+                    new_file_path = await self._transcode(new_file_path,
+                                                          priority)
+                    async with self.scheduler.slot("upload", priority):
+                        await asyncio.to_thread(self._upload, new_file_path)
+
+                self.scheduler.record_latency(priority,
+                                              time.monotonic() - started)
+
+            except Exception as e:
+                self.log.error(
+                    f"Erro ao processar a mensagem {message.id}: {e}")
+
+            finally:
+                self._active.discard(message.id)
+                self._inflight -= 1
+                if not self._inflight:
+                    self._idle.set()
+
+    async def process_album(self, messages: list[Message],
+                            priority: str = LIVE,
+                            session: Optional[TelegramSession] = None
+                            ) -> None:
+        """
+        Process the messages of an album, classifying it only once.
+
+        The most promising item (photos before videos, largest first) is
+        classified and its result is applied to every item; the next
+        candidates are only tried when nothing is found. The Drive folder
+        is resolved once for the whole album. Large videos already in
+        SeenMedia are skipped, and the album is profiled as a whole.
+
+        Args
+        ----
+            messages: Messages sharing the same media_group_id
+            priority: LIVE for new messages, BACKFILL for history
+            session: Account that fetched the messages (default: main)
+        """
+        messages = sorted(messages, key=lambda message: message.id)
+        started = time.monotonic()
+        self._inflight += 1
+        self._idle.clear()
+        self._active.update(message.id for message in messages)
+
+        def already_seen(message):
+            # Large videos are deduplicated as in _stream_video
+            if not self._should_stream(message):
+                return False
+            seen = self.seen.get(message.video.file_unique_id)
+            if seen is not None:
+                self.log.info(f"Vídeo {message.id} já organizado em {seen}. "
+                              "Pulando.")
+            return seen is not None
+
+        async def download(message):
+            try:
+                return await self._download_media(message, priority,
+                                                  session)
+            except Exception as e:
+                self.log.error(
+                    f"Erro ao baixar a mensagem {message.id}: {e}")
+                return None
+
+        tags = {"album": messages[0].media_group_id,
+                "items": len(messages),
+                "size": sum(getattr(message.video or message.photo,
+                                    "file_size", 0) or 0
+                            for message in messages)}
+        async with self.profiler.profile(**tags):
+            try:
+                self.log.info(f"Álbum {messages[0].media_group_id} com "
+                              f"{len(messages)} mídias.")
+                pending = [message for message in messages
+                           if not already_seen(message)]
+                paths = await asyncio.gather(*(download(message)
+                                               for message in pending))
+                items = [(message, path)
+                         for message, path in zip(pending, paths)
+                         if path is not None]
+                if not items:
+                    return
+
+                organizer = await asyncio.to_thread(self._get_organizer)
+                trace = []
+                matches = await self._classify_album(organizer, items,
+                                                     priority, trace)
+
+                target_id = None
+                for message, file_path in items:
+                    try:
+                        new_file_path = await asyncio.to_thread(
+                            organizer.move_file, file_path, message.date,
+                            matches, self.log)
+                    except Exception as e:
+                        self.log.error(
+                            f"Erro ao organizar a mensagem {message.id}: {e}")
+                        continue
+                    if message.video:
+                        self.seen.add(message.video.file_unique_id,
+                                      new_file_path)
+
+                    # Every item is indexed with the OCR of the tried items
+                    await asyncio.to_thread(
+                        organizer.index_media, new_file_path, message.date,
+                        trace, self.log, None, message.id)
+
+                    new_file_path = await self._transcode(new_file_path,
+                                                          priority)
+                    async with self.scheduler.slot("upload", priority):
+                        if target_id is None:
+                            target_id = await asyncio.to_thread(
+                                self._resolve_folder, new_file_path)
+                        await asyncio.to_thread(self._upload, new_file_path,
+                                                target_id)
+
+                self.scheduler.record_latency(priority,
+                                              time.monotonic() - started)
+
+            except Exception as e:
+                self.log.error("Erro ao processar o álbum "
+                               f"{messages[0].media_group_id}: {e}")
+
+            finally:
+                self._active.difference_update(message.id
+                                               for message in messages)
+                self._inflight -= 1
+                if not self._inflight:
+                    self._idle.set()
+
+    async def _classify_album(self, organizer, items: list,
+                              priority: str,
+                              trace: Optional[list] = None) -> list:
+        """
+        Find the URLs of an album from its most promising items.
+
+        Args
+        ----
+            organizer: The organizeGroups module
+            items: Pairs of (message, downloaded file)
+            priority: LIVE for new messages, BACKFILL for history
+            trace: Receives the OCR trace of the tried items
+
+        Returns
+        -------
+            list: URLs found, empty if none of the tried items had one
+        """
+        def rank(item):
+            message, _ = item
+            media = message.photo or message.video
+            area = (getattr(media, "width", 0) or 0) * \
+                (getattr(media, "height", 0) or 0)
+            return (0 if message.photo else 1, -area)
+
+        for message, file_path in sorted(items, key=rank)[:self.album_tries]:
+            try:
+                async with self.scheduler.slot("ocr", priority):
+                    matches = await asyncio.to_thread(
+                        organizer.classify_media, file_path, self.log,
+                        trace)
+            except Exception as e:
+                self.log.warning(
+                    f"Falha ao classificar a mensagem {message.id}: {e}")
+                continue
+
+            if matches:
+                return matches
+
+        return []
+
+    async def _drain_and_stop(self, timeout: float = 300) -> None:
+        """
+        Finish the messages in flight, then stop the client.
+
+        New live messages are refused meanwhile; they and the messages
+        still in flight after `timeout` are saved for the next run.
+
+        Args
+        ----
+            timeout: Maximum seconds to wait for the messages in flight
         """
+        self._draining = True
+        if self._backfill_pool is not None:
+            self._backfill_pool.stop()
+        self.log.warning(f"Finalizando {self._inflight} mensagens em "
+                         "andamento antes de reiniciar...")
         try:
-            if not message.media:
+            await asyncio.wait_for(self.albums.flush_all(), timeout)
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.log.warning("Tempo esgotado aguardando as mensagens em "
+                             "andamento.")
+
+        self._stop.set()
+
+    async def _resume_unfinished(self) -> None:
+        """Process the messages left unfinished by the previous run."""
+        ids = self.unfinished.take()
+        if not ids:
+            return
+
+        self.log.info(f"Retomando {len(ids)} mensagens da execução "
+                      "anterior...")
+        tasks = []
+        albums = {}
+        for start in range(0, len(ids), HISTORY_PAGE_SIZE):
+            if self._draining:
+                self._deferred.update(ids[start:])
+                break
+            messages = await self.limiter.call(
+                "get_messages", self.app.get_messages, self.group_id,
+                ids[start:start + HISTORY_PAGE_SIZE])
+            for message in messages:
+                if message.empty or not (message.photo or message.video):
+                    continue
+                if message.media_group_id:
+                    albums.setdefault(message.media_group_id,
+                                      []).append(message)
+                else:
+                    tasks.append(self.process_media(message))
+
+        tasks += [self.process_album(messages)
+                  for messages in albums.values()]
+        await asyncio.gather(*tasks)
+
+    async def _download_media(self, message: Message,
+                              priority: str = LIVE,
+                              session: Optional[TelegramSession] = None
+                              ) -> Optional[Path]:
+        """
+        Download the media of a message into its date folder.
+
+        Room in the spool is reserved before taking the download slot, so
+        a download waiting for disk space does not hold a slot.
+
+        Args
+        ----
+            message: The Telegram message containing media
+            priority: LIVE for new messages, BACKFILL for history
+            session: Account that fetched the message (default: main)
+
+        Returns
+        -------
+            Optional[Path]: Downloaded file, or None if there is no media
+        """
+        if not message.media:
+            return None
+
+        file_path = self._media_path(message)
+        media_folder = file_path.parent
+
+        # Wait for room in the local spool before downloading
+        kind = "video" if message.video else "photo"
+        media = message.video or message.photo
+        size = getattr(media, "file_size", 0) or 0
+        await self.spool.acquire(kind, size, file_path)
+
+        # Download the media
+        self.log.info(f"Baixando mídia da mensagem {message.id}...")
+        try:
+            session = session or self.session
+            async with self.scheduler.slot("download", priority):
+                if self._should_split(size):
+                    await session.downloader.download(message, file_path,
+                                                      size)
+                else:
+                    async def fetch():
+                        # Pyrogram ends a download early without raising
+                        await session.client.download_media(
+                            message, file_name=str(file_path))
+                        check_download(file_path, size)
+
+                    await session.limiter.call("download_media", fetch)
+        finally:
+            self.spool.release(size, file_path)
+        self.log.info(
+            f"Mídia {message.id} baixada com sucesso em {media_folder}!")
+
+        return file_path
+
+    def _media_path(self, message: Message) -> Path:
+        """
+        Build the local path of a message's media, inside its date folder.
+
+        Args
+        ----
+            message: The Telegram message containing media
+
+        Returns
+        -------
+            Path: Where the media is downloaded to
+        """
+        # Get message date and format as YYYY-MM-DD
+        message_date = message.date
+        date_folder = message_date.strftime("%Y-%m-%d")
+
+        # Create directory for this date
+        media_folder = self.download_folder / date_folder
+        media_folder.mkdir(exist_ok=True)
+
+        # Determine file extension based on media type
+        file_extension = self._get_file_extension(message)
+
+        # Formata o horário da mensagem e cria o novo nome do arquivo
+        message_time = message_date.strftime("%Hh%M")
+        new_file_name = f"{message_time} - {message.id}{file_extension}"
+
+        return media_folder / new_file_name
+
+    @staticmethod
+    def _message_id(file_path: Path) -> Optional[int]:
+        """
+        Recover the message ID from a name built by _media_path.
+
+        Args
+        ----
+            file_path: Downloaded, organized or re-encoded file
+
+        Returns
+        -------
+            Optional[int]: Message ID, or None for other names
+        """
+        _, _, message_id = file_path.stem.rpartition(" - ")
+        return int(message_id) if message_id.isdigit() else None
+
+    def _should_split(self, size: int) -> bool:
+        """Tell whether a file is large enough for a parallel download."""
+        if not self.parallel_min_size or self.downloader.parts < 2:
+            return False
+        return size >= self.parallel_min_size
+
+    def _should_stream(self, message: Message) -> bool:
+        """Tell whether a message's video is large enough to stream."""
+        if not (message.video and self.stream_min_size):
+            return False
+        return (message.video.file_size or 0) >= self.stream_min_size
+
+    async def _stream_video(self, message: Message, priority: str = LIVE,
+                            session: Optional[TelegramSession] = None
+                            ) -> Optional[Path]:
+        """
+        Download a large video while classifying it from its first chunks.
+
+        As soon as the head of the file is on disk, and if its moov atom
+        comes before the media data, the first frame is decoded from the
+        head and classified while the rest of the download continues. When
+        the classified destination already holds the same file, the
+        download is stopped. Otherwise the video is classified after the
+        download, as usual.
+
+        Args
+        ----
+            message: The Telegram message containing the video
+            priority: LIVE for new messages, BACKFILL for history
+            session: Account that fetched the message (default: main)
+
+        Returns
+        -------
+            Optional[Path]: Organized file, or None if it was skipped
+        """
+        session = session or self.session
+        video = message.video
+        seen = self.seen.get(video.file_unique_id)
+        if seen is not None:
+            self.log.info(f"Vídeo {message.id} já organizado em {seen}. "
+                          "Pulando.")
+            return None
+
+        organizer = await asyncio.to_thread(self._get_organizer)
+        file_path = self._media_path(message)
+        size = video.file_size or 0
+        state = {"task": None, "duplicate": None}
+        trace = []
+        stop = asyncio.Event()
+
+        def check_duplicate(task):
+            if task.cancelled() or task.result() is None:
                 return
+            target = organizer.destination_dir(message.date, task.result())
+            target = target / file_path.name
+            # The organized file usually left the disk after its upload
+            if self.seen.has_path(target) or (
+                    target.exists() and target.stat().st_size == size):
+                state["duplicate"] = target
+                stop.set()
 
-            # Get message date and format as YYYY-MM-DD
-            message_date = message.date
-            date_folder = message_date.strftime("%Y-%m-%d")
+        def on_head():
+            if state["task"] is not None:
+                return  # Retry after a FloodWait
+            with open(file_path, 'rb') as f:
+                head = f.read(self.stream_head_size)
+            if not moov_before_mdat(head):
+                self.log.info(f"Vídeo {message.id} sem moov no início. "
+                              "Classificando após o download.")
+                state["task"] = False
+                return
+            task = asyncio.create_task(
+                self._classify_head(organizer, head, priority, trace))
+            task.add_done_callback(check_duplicate)
+            state["task"] = task
 
-            # Create directory for this date
-            media_folder = self.download_folder / date_folder
-            media_folder.mkdir(exist_ok=True)
+        self.log.info(f"Baixando vídeo da mensagem {message.id} em stream...")
+        await self.spool.acquire("video", size, file_path)
+        try:
+            file_path.unlink(missing_ok=True)
+            async with self.scheduler.slot("download", priority):
+                if self._should_split(size):
+                    await session.downloader.download(message, file_path,
+                                                      size, on_head, stop)
+                else:
+                    await session.limiter.call(
+                        "stream_media", self._stream_to_file, message,
+                        file_path, on_head, stop, session.client)
+        except BaseException:
+            if state["task"]:
+                state["task"].cancel()
+            raise
+        finally:
+            self.spool.release(size, file_path)
 
-            # Determine file extension based on media type
-            file_extension = self._get_file_extension(message)
+        matches = await state["task"] if state["task"] else None
+        if state["duplicate"] is not None:
+            file_path.unlink(missing_ok=True)
+            self.log.info(f"Vídeo {message.id} já existe em "
+                          f"{state['duplicate']}. Download ignorado.")
+            self.seen.add(video.file_unique_id, state["duplicate"])
+            return None
 
-            # Formata o horário da mensagem e cria o novo nome do arquivo
-            message_time = message_date.strftime("%Hh%M")
-            new_file_name = f"{message_time} - {message.id}{file_extension}"
+        self.log.info(f"Mídia {message.id} baixada com sucesso!")
+        if matches is None:
+            async with self.scheduler.slot("ocr", priority):
+                new_file_path = await asyncio.to_thread(
+                    organizer.organize_midia, str(file_path), message.date,
+                    self.log, message.id)
+        else:
+            new_file_path = await asyncio.to_thread(
+                organizer.move_file, file_path, message.date, matches,
+                self.log)
+            await asyncio.to_thread(organizer.index_media, new_file_path,
+                                    message.date, trace, self.log, None,
+                                    message.id)
 
-            # Define full file path
-            file_path = media_folder / new_file_name
+        if new_file_path is not None:
+            self.seen.add(video.file_unique_id, new_file_path)
+        return new_file_path
 
-            # Download the media
-            self.log.info(f"Baixando mídia da mensagem {message.id}...")
-            await self.app.download_media(message, file_name=str(file_path))
-            self.log.info(
-                f"Mídia {message.id} baixada com sucesso em {media_folder}!")
+    async def _stream_to_file(self, message: Message, file_path: Path,
+                              on_head, stop: asyncio.Event,
+                              client: Optional[Client] = None) -> None:
+        """
+        Stream a media into a file, resuming from the chunks already saved.
 
-            # Process images and videos with organize_midia
-            if message.photo or message.video:
-                new_file_path = organize_midia(str(file_path), message.date,
-                                               self.log)
-                sync_upload(new_file_path, self.log, drive_client, local_dir,
-                            obj_uploads,  envv["GDRIVE_BASE_FOLDER_ID"])
+        Args
+        ----
+            message: The Telegram message containing media
+            file_path: Destination file
+            on_head: Called once the head of the file has been written
+            stop: When set, the download is interrupted
+            client: Client that fetched the message (default: main)
+        """
+        client = client or self.app
+        written = file_path.stat().st_size if file_path.exists() else 0
+        offset = written // CHUNK_SIZE
+        written = offset * CHUNK_SIZE
+
+        with open(file_path, 'r+b' if written else 'wb') as f:
+            f.truncate(written)
+            f.seek(written)
+            async for chunk in client.stream_media(message, offset=offset):
+                f.write(chunk)
+                written += len(chunk)
+                if on_head is not None and written >= self.stream_head_size:
+                    f.flush()
+                    on_head()
+                    on_head = None
+                if stop.is_set():
+                    return
+
+        # Pyrogram ends a stream early without raising; the limiter
+        # retries and the next call resumes from the saved chunks
+        check_download(file_path, message.video.file_size)
+        if on_head is not None:
+            on_head()
+
+    async def _classify_head(self, organizer, head: bytes, priority: str,
+                             trace: Optional[list] = None
+                             ) -> Optional[list]:
+        """
+        Classify a video from the first bytes of its file.
+
+        Args
+        ----
+            organizer: The organizeGroups module
+            head: First bytes of the video
+            priority: LIVE for new messages, BACKFILL for history
+            trace: Receives the OCR trace of the first frame
+
+        Returns
+        -------
+            Optional[list]: URLs found, or None if no frame was decoded
+        """
+        def classify():
+            with tempfile.NamedTemporaryFile(suffix=".mp4",
+                                             delete=False) as f:
+                f.write(head)
+                head_path = Path(f.name)
+            try:
+                frame = organizer.get_first_frame(head_path, self.log)
+                return organizer.process_image(frame, self.log,
+                                               trace=trace)
+            except Exception as e:
+                self.log.warning(f"Falha ao classificar o início: {e}")
+                return None
+            finally:
+                head_path.unlink(missing_ok=True)
+
+        async with self.scheduler.slot("ocr", priority):
+            return await asyncio.to_thread(classify)
+
+    async def _drain_spool(self, limit: int = 20) -> None:
+        """
+        Retry uploading files stranded in the destination folder.
+
+        Args
+        ----
+            limit: Maximum number of files retried per call
+        """
+        if not self._holds_upload_lock() or self._drain_lock.locked():
+            return
+
+        # Files of messages in flight are uploaded by their own task
+        active = set(self._active)
+
+        def stranded():
+            paths = []
+            for path in iter_media_files(self.local_dir):
+                if len(paths) >= limit:
+                    break
+                if self._message_id(path) not in active:
+                    paths.append(path)
+            return paths
+
+        async with self._drain_lock:
+            for path in await asyncio.to_thread(stranded):
+                async with self.scheduler.slot("upload", BACKFILL):
+                    await asyncio.to_thread(self._upload, path)
+
+    def _get_organizer(self):
+        """
+        Import the OCR stack on first use.
+
+        Returns
+        -------
+            module: The organizeGroups module
+        """
+        with self._organizer_lock:
+            if self._organizer is None:
+                started = time.perf_counter()
+                self._organizer = importlib.import_module("organizeGroups")
+                if self.ocr_processes:
+                    self._start_ocr_pool()
+                self.log.info("OCR carregado em "
+                              f"{time.perf_counter() - started:.2f}s.")
+
+        return self._organizer
+
+    def _start_ocr_pool(self) -> None:
+        """Start the tesseract worker processes, if tesserocr is there."""
+        try:
+            from ocr.ocr_pool import OCRPool
+        except ImportError as e:
+            self.log.warning(f"OCR_PROCESSES ignorado ({e}); o OCR "
+                             "continua nas threads do pipeline.")
+            return
+
+        self.ocr_pool = OCRPool(self.log, self.ocr_processes,
+                                self.ocr_slot_size)
+        self._organizer.use_ocr_pool(self.ocr_pool)
+
+    def _get_drive(self) -> tuple:
+        """
+        Authenticate with Google Drive on first use.
+
+        Returns
+        -------
+            tuple: Drive client and the UploadedFilesDirs registry
+        """
+        with self._drive_lock:
+            if self._drive is None:
+                started = time.perf_counter()
+                from driveSync.uploaded_filesdirs import UploadedFilesDirs
+                from driveSync.drive_request import DriveRequester
+                from driveSync.drive_client import DriveClient
+                from driveSync.drive_auth import DriveAuth
+
+                # Inicia conexao e autenticacao com o drive
+                client_secrets_path = self.credentials_dir / \
+                    "client_secrets.json"
+                drive_auth = DriveAuth(client_secrets_path)
+                auth = drive_auth.authenticate()
+                drive_auth.start_refresher(self.log)
+
+                # Inicia cliente do drive
+                requester = DriveRequester(
+                    self.log,
+                    rate=float(self.env.get("DRIVE_RATE", 10)),
+                    burst=float(self.env.get("DRIVE_RATE_BURST", 20)))
+                drive_client = DriveClient(
+                    auth, requester,
+                    pool_size=int(self.env.get("DRIVE_HTTP_POOL") or 4))
+
+                # Lê arquivo que armazena informações do que já foi
+                # sincronizado
+                obj_uploads = UploadedFilesDirs(
+                    BUILD_ABSPATH(__file__, "../uploads.json"))
+
+                self._drive = (drive_client, obj_uploads)
+                self.log.info("Google Drive pronto em "
+                              f"{time.perf_counter() - started:.2f}s.")
+
+        return self._drive
+
+    async def _warm_up(self) -> None:
+        """Load the OCR and Drive stacks in background threads."""
+        results = await asyncio.gather(
+            asyncio.to_thread(self._get_organizer),
+            asyncio.to_thread(self._get_drive),
+            return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, Exception):
+                self.log.error(
+                    f"Falha ao pré-carregar dependências: {result}")
+
+        self.log.info("Inicialização completa em "
+                      f"{time.perf_counter() - STARTED_AT:.2f}s.")
+
+    async def _transcode(self, file_path: Path, priority: str) -> Path:
+        """
+        Re-encode an organized file when transcoding is enabled.
+
+        Without the upload lock the file is left as is: mainDrive watches
+        the destination folder and would upload the original and the
+        re-encoded file.
+
+        Args
+        ----
+            file_path: Organized file
+            priority: LIVE for new messages, BACKFILL for history
+
+        Returns
+        -------
+            Path: File to upload, the re-encoded one or the original
+        """
+        if self.transcoder is None or not self._holds_upload_lock():
+            return file_path
+
+        async with self.scheduler.slot("transcode", priority):
+            new_path = await asyncio.to_thread(self.transcoder.transcode,
+                                               file_path)
+
+        if new_path != file_path:
+            organizer = await asyncio.to_thread(self._get_organizer)
+            await asyncio.to_thread(organizer.get_text_index().move,
+                                    file_path, new_path)
+        return new_path
+
+    def _holds_upload_lock(self) -> bool:
+        """Tell whether this process uploads, retrying the lock if not."""
+        with self._upload_lock_guard:
+            if self._upload_lock is None:
+                self._upload_lock = try_lock(self._upload_lock_path)
+                if self._upload_lock is not None:
+                    self.log.info("mainDrive liberou a pasta de destino; "
+                                  "os uploads voltam para o mainTelegram.")
+            return self._upload_lock is not None
+
+    def _resolve_folder(self, file_path: Path) -> Optional[str]:
+        """
+        Resolve the Drive folder of an organized file.
+
+        Returns
+        -------
+            Optional[str]: Folder ID, or None if it could not be resolved
+        """
+        if not self._holds_upload_lock():
+            return None
 
+        drive_client, obj_uploads = self._get_drive()
+        try:
+            return resolve_folder(file_path, self.log, drive_client,
+                                  self.local_dir, obj_uploads,
+                                  self.base_folder_id)
         except Exception as e:
-            self.log.error(
-                f"Erro ao processar a mensagem {message.id}: {e}")
+            self.log.warning(f"Falha ao resolver a pasta no Drive: {e}")
+            return None
+
+    def _upload(self, file_path: Path,
+                target_id: Optional[str] = None) -> None:
+        """Send an organized file to Google Drive."""
+        if not self._holds_upload_lock():
+            return  # mainDrive uploads it
+
+        drive_client, obj_uploads = self._get_drive()
+        metadata = sync_upload(file_path, self.log, drive_client,
+                               self.local_dir, obj_uploads,
+                               self.base_folder_id, target_id)
+        if metadata is not None:
+            parents = metadata.get("parents") or [{}]
+            self._get_organizer().get_text_index().uploaded(
+                file_path, metadata["id"], parents[0].get("id"))
+
+    async def _process_batch(self, messages: list[Message]) -> None:
+        """
+        Download several messages and classify them with a single OCR pass.
+
+        Args
+        ----
+            messages: Messages with photo or video
+        """
+        started = time.monotonic()
+        self._active.update(message.id for message in messages)
+        try:
+            items = []
+            for message in messages:
+                try:
+                    file_path = await self._download_media(message,
+                                                           BACKFILL)
+                    if file_path is not None:
+                        items.append((file_path, message.date, message.id))
+                except Exception as e:
+                    self.log.error(
+                        f"Erro ao baixar a mensagem {message.id}: {e}")
+
+            if not items:
+                return
+
+            self.log.info(f"Classificando lote de {len(items)} mídias...")
+            organizer = await asyncio.to_thread(self._get_organizer)
+            async with self.scheduler.slot("ocr", BACKFILL):
+                results = await asyncio.to_thread(organizer.organize_batch,
+                                                  items, self.log)
+
+            for _, new_file_path, err in results:
+                if new_file_path is not None:
+                    new_file_path = await self._transcode(new_file_path,
+                                                          BACKFILL)
+                    async with self.scheduler.slot("upload", BACKFILL):
+                        await asyncio.to_thread(self._upload, new_file_path)
+
+            self.scheduler.record_latency(BACKFILL,
+                                          time.monotonic() - started)
+        finally:
+            self._active.difference_update(message.id
+                                           for message in messages)
 
     def _get_file_extension(self, message: Message) -> str:
         """
@@ -142,7 +1079,8 @@ class TelegramMediaDownloader:
             return ".dat"  # Default extension
 
     async def download_historical_media(self, min_id: int,
-                                        max_id: Optional[int] = None) -> None:
+                                        max_id: Optional[int] = None,
+                                        batch_ocr: int = 0) -> None:
         """
         Download media from historical messages in the specified group.
 
@@ -150,25 +1088,70 @@ class TelegramMediaDownloader:
         ----
             min_id: Minimum message ID to download
             max_id: Maximum message ID to download (if None, no upper limit)
+            batch_ocr: Messages classified per tesseract call (0 disables)
         """
-        try:
-            self.log.info("Conectado à conta do Telegram!")
-            group = await self.app.get_chat(self.group_id)
-            self.log.info(f"Acessando o grupo: {group.title}")
+        self.log.info("Conectado à conta do Telegram!")
+        group = await self.limiter.call("get_chat", self.app.get_chat,
+                                        self.group_id)
+        self.log.info(f"Acessando o grupo: {group.title}")
 
-            async for message in self.app.get_chat_history(group.id):
-                try:
-                    # Check if message ID is within specified range
-                    if message.id < min_id:
-                        self.log.info(
-                            f"Atingido o ID mínimo {min_id}. Parando.")
-                        break
+        if self.extra_sessions and not batch_ocr:
+            await self._pool_backfill(group.id, min_id, max_id)
+            return
 
-                    if max_id and message.id > max_id:
-                        continue
+        # Posição da paginação: o Telegram devolve mensagens com ID menor
+        # que offset_id (0 começa pela mais recente)
+        offset_id = max_id + 1 if max_id else 0
 
-                    if message.photo or message.video:
-                        await self.process_media(message)
+        # Mensagens aguardando o OCR em lote e itens do álbum atual
+        pending = []
+        album = []
+        reached_min = False
+
+        while not reached_min and not self._draining:
+            page = await self.limiter.call("get_chat_history",
+                                           self._history_page, group.id,
+                                           offset_id)
+            if not page:
+                break
+
+            for i, message in enumerate(page):
+                # Ao finalizar, o restante da página fica para a próxima
+                # execução
+                if self._draining:
+                    self._deferred.update(
+                        m.id for m in page[i:]
+                        if m.id >= min_id and (m.photo or m.video))
+                    break
+
+                # Check if message ID is within specified range
+                if message.id < min_id:
+                    self.log.info(f"Atingido o ID mínimo {min_id}. Parando.")
+                    reached_min = True
+                    break
+
+                if not (message.photo or message.video):
+                    continue
+
+                # Os itens de um álbum vêm em sequência no histórico
+                if album and message.media_group_id != \
+                        album[0].media_group_id:
+                    await self.process_album(album, BACKFILL)
+                    album = []
+
+                if message.media_group_id and not batch_ocr:
+                    album.append(message)
+                    continue
+
+                if batch_ocr:
+                    pending.append(message)
+                    if len(pending) >= batch_ocr:
+                        await self._process_batch(pending)
+                        pending = []
+                    continue
+
+                try:
+                    await self.process_media(message, BACKFILL)
 
                 except Exception as e:
                     self.log.error(
@@ -176,13 +1159,96 @@ class TelegramMediaDownloader:
                     # Add small delay before continuing
                     await asyncio.sleep(1)
 
-        except FloodWait as e:
-            wait_time = e.value
-            self.log.warning(
-                f"FloodWait detectado. Esperando {wait_time}s para continuar.")
-            await asyncio.sleep(wait_time)
-            # Try processing again after waiting
-            await self.download_historical_media(min_id, message.id-1)
+            offset_id = page[-1].id
+
+        if self._draining:
+            self.log.info("Download histórico interrompido.")
+            self._deferred.update(m.id for m in album + pending)
+            return
+
+        if album:
+            await self.process_album(album, BACKFILL)
+        if pending:
+            await self._process_batch(pending)
+
+    async def _pool_backfill(self, chat_id: int, min_id: int,
+                             max_id: Optional[int] = None) -> None:
+        """
+        Download the history with the main and the extra sessions.
+
+        Args
+        ----
+            chat_id: Chat to read from
+            min_id: Minimum message ID to download
+            max_id: Maximum message ID to download (if None, the newest)
+        """
+        if not max_id:
+            newest = await self.limiter.call("get_chat_history",
+                                             self._history_page, chat_id, 0)
+            if not newest:
+                return
+            max_id = newest[0].id
+
+        sessions = [self.session]
+        for session in self.extra_sessions:
+            try:
+                # start() pede o código de login no stdin se a sessão não
+                # estiver autorizada; nesse caso a sessão fica de fora
+                authorized = await session.client.connect()
+                await session.client.disconnect()
+                if not authorized:
+                    self.log.warning(f"Sessão {session.name} não está "
+                                     "autorizada. Ignorando.")
+                    continue
+                await session.client.start()
+                await session.limiter.call("get_chat",
+                                           session.client.get_chat, chat_id)
+                sessions.append(session)
+            except Exception as e:
+                self.log.error(f"Sessão {session.name} indisponível: {e}")
+
+        async def process(messages, session):
+            media = [m for m in messages if m.photo or m.video]
+            if self._draining:
+                # Recusadas: ficam para a próxima execução
+                self._deferred.update(m.id for m in media)
+                return False
+            if not media:
+                return True
+            if media[0].media_group_id:
+                await self.process_album(media, BACKFILL, session)
+            else:
+                await self.process_media(media[0], BACKFILL, session)
+            return True
+
+        pool = SessionPool(self.log, sessions,
+                           range_size=self.backfill_range,
+                           handoff_after=self.backfill_handoff,
+                           status_path=self.logs_dir / "backfill.json")
+        self._backfill_pool = pool
+        try:
+            await pool.backfill(chat_id, min_id, max_id, process)
+        finally:
+            self._backfill_pool = None
+            for session in sessions[1:]:
+                await session.downloader.close()
+                await session.client.stop()
+
+    async def _history_page(self, chat_id: int, offset_id: int) -> list:
+        """
+        Fetch a single page of the chat history.
+
+        Args
+        ----
+            chat_id: Chat to read from
+            offset_id: Only messages older than this ID are returned
+
+        Returns
+        -------
+            list: Messages of the page, newest first
+        """
+        return [message async for message in self.app.get_chat_history(
+            chat_id, limit=HISTORY_PAGE_SIZE, offset_id=offset_id)]
 
     async def list_groups(self) -> dict:
         """
@@ -203,7 +1269,7 @@ class TelegramMediaDownloader:
         return groups
 
     async def run(self, download_historical: bool = False, min_id: int = 0,
-                  max_id: Optional[int] = None) -> None:
+                  max_id: Optional[int] = None, batch_ocr: int = 0) -> None:
         """
         Run the media downloader.
 
@@ -212,23 +1278,36 @@ class TelegramMediaDownloader:
             download_historical: Whether to download historical media
             min_id: Minimum message ID for historical download
             max_id: Maximum message ID for historical download
+            batch_ocr: Historical messages classified per tesseract call
         """
         # Start the client
         await self.app.start()
-        self.log.info("Cliente iniciado.")
+        self.log.info("Cliente iniciado em "
+                      f"{time.perf_counter() - STARTED_AT:.2f}s.")
+        if self._upload_lock is None:
+            self.log.warning("mainDrive já observa a pasta de destino; os "
+                             "uploads ficam com ele.")
+
+        # Warm up the heavy stacks while messages are already handled
+        warm_up = asyncio.create_task(self._warm_up())
+        memory = (asyncio.create_task(self.memory.run())
+                  if self.memory is not None else None)
 
         try:
+            await self._resume_unfinished()
+
             # Download historical media if requested
             if download_historical:
                 self.log.info(
                     f"Baixando (IDs {min_id} até {max_id or 'atual'})...")
-                await self.download_historical_media(min_id, max_id)
+                await self.download_historical_media(min_id, max_id,
+                                                     batch_ocr)
                 self.log.info("Download histórico concluído.")
 
-            # Keep the client running for new messages
+            # Keep the client running for new messages until a stop is
+            # requested
             self.log.info("Aguardando novas mensagens...")
-            # An alternative to idle() that's more explicit
-            await asyncio.Event().wait()
+            await self._stop.wait()
 
         except KeyboardInterrupt:
             self.log.info("Interrupção de teclado detectada. Encerrando...")
@@ -238,8 +1317,29 @@ class TelegramMediaDownloader:
 
         finally:
             # Stop the client
+            await self.albums.flush_all()
+            unfinished = self._active | self._deferred
+            if unfinished:
+                self.log.warning(f"{len(unfinished)} mensagens ficam para "
+                                 "a próxima execução.")
+                self.unfinished.save(unfinished)
+            await self.downloader.close()
             await self.app.stop()
-            obj_uploads.update_dict()
+            warm_up.cancel()
+            if memory is not None:
+                memory.cancel()
+            self.scheduler.report()
+            if self.transcoder is not None:
+                self.transcoder.report()
+            self.seen.save()
+            # Layouts learned since the last periodic save
+            if self._organizer is not None:
+                await asyncio.to_thread(self._organizer.save_state)
+            if self.ocr_pool is not None:
+                self._organizer.use_ocr_pool(None)
+                await asyncio.to_thread(self.ocr_pool.close)
+            if self._drive is not None:
+                self._drive[1].update_dict()
             self.log.info("Cliente encerrado.")
 
 
@@ -259,7 +1359,7 @@ async def main():
     # To download historical media
 # =============================================================================
 #     await downloader.run(download_historical=True, min_id=61027,
-#                          max_id=61890)
+#                          max_id=61890, batch_ocr=16)
 # =============================================================================
 
     # To just listen for new media
@@ -267,18 +1367,4 @@ async def main():
 
 
 if __name__ == "__main__":
-    # Inicia conexao e autenticacao com o drive
-    client_secrets_path = BUILD_ABSPATH(
-        __file__, "../credentials/client_secrets.json")
-    auth = DriveAuth(client_secrets_path).authenticate()
-
-    # Inicia cliente do drive
-    drive_client = DriveClient(auth)
-
-    # Lê arquivo que armazena informações do que já foi sincronizado
-    obj_uploads = UploadedFilesDirs(BUILD_ABSPATH(__file__, "../uploads.json"))
-
-    envv = dotenv_values()
-    local_dir = BUILD_ABSPATH(__file__, "..", envv["DESTINATION_DIR_IMAGE"])
-
     asyncio.run(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun  9 16:30:52 2025.
+
+@author: vcsil
+"""
+import pytesseract as tess
+import numpy as np
+
+# Limite de altura de uma página do tesseract (com folga)
+MAX_PAGE_HEIGHT = 30000
+
+
+class BatchOCR:
+    """
+    Agrupa faixas de várias imagens em uma página para um único OCR.
+
+    As faixas são empilhadas verticalmente, separadas por linhas brancas,
+    e a página é lida com uma só chamada ao tesseract. Cada palavra volta
+    para a faixa de origem pela posição vertical de sua caixa.
+
+    Parameters
+    ----------
+    config : str
+        Linha de configuração do tesseract.
+    separator : int, optional
+        Altura em pixels do separador entre faixas. The default is 40.
+    max_height : int, optional
+        Altura máxima de cada página. The default is MAX_PAGE_HEIGHT.
+
+    """
+
+    def __init__(self, config: str, separator: int = 40,
+                 max_height: int = MAX_PAGE_HEIGHT):
+        self.config = config
+        self.separator = separator
+        self.max_height = max_height
+        self._bands: list[tuple[object, np.ndarray]] = []
+
+    def __len__(self):
+        return len(self._bands)
+
+    def add(self, key, band: np.ndarray) -> None:
+        """Adiciona uma faixa em escala de cinza identificada por `key`."""
+        self._bands.append((key, band))
+
+    def _pages(self):
+        """Divide as faixas em páginas que respeitam a altura máxima."""
+        page, height = [], 0
+        for key, band in self._bands:
+            needed = band.shape[0] + self.separator
+            if page and height + needed > self.max_height:
+                yield page
+                page, height = [], 0
+            page.append((key, band))
+            height += needed
+
+        if page:
+            yield page
+
+    def _read_page(self, page: list) -> dict:
+        """Monta e lê uma página, devolvendo as palavras de cada faixa."""
+        width = max(band.shape[1] for _, band in page)
+        height = sum(band.shape[0] + self.separator for _, band in page)
+        canvas = np.full((height + self.separator, width), 255,
+                         dtype=np.uint8)
+
+        # Posição vertical [início, fim) de cada faixa na página
+        spans = []
+        top = self.separator
+        for key, band in page:
+            canvas[top:top + band.shape[0], :band.shape[1]] = band
+            spans.append((top, top + band.shape[0], key))
+            top += band.shape[0] + self.separator
+
+        data = tess.image_to_data(canvas, config=self.config,
+                                  output_type=tess.Output.DICT)
+
+        starts = np.array([start for start, _, _ in spans])
+        words = {key: [] for _, _, key in spans}
+        for i, word in enumerate(data["text"]):
+            if not word.strip():
+                continue
+
+            center = data["top"][i] + data["height"][i] / 2
+            index = int(np.searchsorted(starts, center, side="right")) - 1
+            if index < 0:
+                continue
+
+            start, end, key = spans[index]
+            if center >= end:
+                continue  # Ruído lido sobre o separador
+
+            box = (data["left"][i], data["top"][i] - start,
+                   data["width"][i], data["height"][i])
+            words[key].append((word, box))
+
+        return words
+
+    def run(self) -> dict:
+        """
+        Lê todas as faixas adicionadas e esvazia o lote.
+
+        Returns
+        -------
+        dict
+            Para cada chave, a lista de pares (palavra, (x, y, w, h)) com a
+            caixa relativa à própria faixa.
+
+        """
+        words = {}
+        for page in self._pages():
+            words.update(self._read_page(page))
+
+        self._bands = []
+        return words
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jun  5 21:17:40 2025.
+
+@author: vcsil
+"""
+from pathlib import Path
+import threading
+import fcntl
+import json
+import os
+
+# Crescimento máximo (em área) aceito ao unir uma região nova à anterior
+MAX_BOX_GROWTH = 1.5
+
+
+def _area(box: list[float]) -> float:
+    return max(0.0, box[2] - box[0]) * max(0.0, box[3] - box[1])
+
+
+def merge_box(old: list[float], new: list[float]) -> list[float]:
+    """
+    Une a região nova à anterior para tolerar pequenos desvios.
+
+    Se a união crescer mais que MAX_BOX_GROWTH em relação à maior das
+    duas, a arte mudou de lugar e a região nova substitui a anterior.
+
+    """
+    union = [min(old[0], new[0]), min(old[1], new[1]),
+             max(old[2], new[2]), max(old[3], new[3])]
+    if _area(union) > MAX_BOX_GROWTH * max(_area(old), _area(new)):
+        return list(new)
+    return union
+
+
+class LayoutCache:
+    """
+    Guarda onde cada domínio costuma aparecer nas imagens de cada fonte.
+
+    As regiões são salvas como frações da imagem (x0, y0, x1, y1) e
+    indexadas pelo tamanho exato da imagem ("1280x720") e pela proporção
+    ("ar:1.78"), para aproveitar a mesma arte em resoluções diferentes.
+
+    Um erro só é contado quando a busca completa acha o domínio fora da
+    sua região; imagens de outra fonte com a mesma geometria não contam.
+    Cada processo guarda as próprias alterações e as aplica sobre o
+    arquivo relido ao salvar, então processos paralelos não se
+    sobrescrevem.
+
+    Parameters
+    ----------
+    path : Path
+        Arquivo JSON onde o cache é persistido.
+    max_candidates : int, optional
+        Regiões testadas antes da busca completa. The default is 3.
+    save_every : int, optional
+        Alterações acumuladas antes de salvar no disco. The default is 20.
+
+    """
+
+    def __init__(self, path: Path, max_candidates: int = 3,
+                 save_every: int = 20):
+        self.path = Path(path)
+        self.max_candidates = max_candidates
+        self.save_every = save_every
+        self._dirty = 0
+        self._lock = threading.Lock()
+        # Alterações ainda não salvas: (chave, domínio, acertos, erros,
+        # caixa)
+        self._changes: list[tuple] = []
+
+        try:
+            with open(self.path, 'r') as f:
+                self.layouts = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.layouts = {}
+
+    @staticmethod
+    def keys(shape: tuple) -> tuple[str, str]:
+        """Retorna as chaves de tamanho e de proporção da imagem."""
+        height, width = shape[:2]
+        return f"{width}x{height}", f"ar:{width / height:.2f}"
+
+    def candidates(self, shape: tuple) -> list[tuple[str, list[float]]]:
+        """
+        Retorna as regiões conhecidas para imagens com essa geometria.
+
+        Returns
+        -------
+        list[tuple[str, list[float]]]
+            Pares (domínio, caixa normalizada), mais acertados primeiro.
+            Regiões do mesmo tamanho vêm antes das de mesma proporção.
+
+        """
+        found = []
+        seen = set()
+        with self._lock:
+            for key in self.keys(shape):
+                entries = sorted(self.layouts.get(key, {}).items(),
+                                 key=lambda item: -item[1]["hits"])
+                for domain, entry in entries:
+                    if domain not in seen:
+                        seen.add(domain)
+                        found.append((domain, entry["box"]))
+
+        return found[:self.max_candidates]
+
+    @staticmethod
+    def _apply(layouts: dict, key: str, domain: str, hits: int,
+               misses: int, box) -> None:
+        """Aplica uma alteração a um dicionário de regiões."""
+        entry = layouts.get(key, {}).get(domain)
+        if entry is None:
+            if box is None:
+                return
+            entry = layouts.setdefault(key, {})[domain] = {
+                "box": list(box), "hits": 0, "misses": 0}
+        elif box is not None:
+            entry["box"] = merge_box(entry["box"], box)
+
+        entry["hits"] += hits
+        entry["misses"] += misses
+        # Região que mais erra do que acerta deixa de ser usada
+        if entry["misses"] > entry["hits"]:
+            del layouts[key][domain]
+
+    def _change(self, shape: tuple, domain: str, hits: int, misses: int,
+                box) -> None:
+        with self._lock:
+            for key in self.keys(shape):
+                change = (key, domain.lower(), hits, misses, box)
+                self._apply(self.layouts, *change)
+                self._changes.append(change)
+
+            self._dirty += 1
+
+        self._maybe_save()
+
+    def record(self, shape: tuple, domain: str, box: list[float]) -> None:
+        """Registra (ou reforça) a região onde `domain` foi encontrado."""
+        self._change(shape, domain, 1, 0, box)
+
+    def miss(self, shape: tuple, domain: str) -> None:
+        """Registra que `domain` apareceu fora da região aprendida."""
+        self._change(shape, domain, 0, 1, None)
+
+    def _maybe_save(self) -> None:
+        if self._dirty >= self.save_every:
+            self.save()
+
+    def save(self) -> None:
+        """Aplica as alterações sobre o arquivo atual e o salva."""
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_suffix(".lock"), 'a') as lock:
+                # Um processo por vez relê, aplica e grava
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(self.path, 'r') as f:
+                        layouts = json.load(f)
+                except (FileNotFoundError, json.JSONDecodeError):
+                    layouts = {}
+
+                for change in self._changes:
+                    self._apply(layouts, *change)
+
+                tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+                with open(tmp_path, 'w') as f:
+                    json.dump(layouts, f)
+                os.replace(tmp_path, self.path)
+
+            self.layouts = layouts
+            self._changes = []
+            self._dirty = 0
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jul  1 14:02:51 2025.
+
+@author: vcsil
+"""
+from tesserocr import PyTessBaseAPI, iterate_level, OEM, PSM, RIL
+from concurrent.futures.process import BrokenProcessPool
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+import multiprocessing
+import threading
+
+import numpy as np
+
+from ocr.shared_frames import FrameRing, attach_frame
+
+# Instâncias do tesseract de cada processo, uma por modo de OCR (oem)
+_apis: dict[int, PyTessBaseAPI] = {}
+
+
+def _get_api(profile: dict) -> PyTessBaseAPI:
+    """Instância do tesseract do processo, ajustada para o perfil."""
+    api = _apis.get(profile["oem"])
+    if api is None:
+        # O modelo é carregado uma vez por processo, não a cada faixa
+        api = PyTessBaseAPI(oem=OEM(profile["oem"]))
+        _apis[profile["oem"]] = api
+
+    api.SetPageSegMode(PSM(profile["psm"]))
+    api.SetVariable("user_defined_dpi", str(profile["dpi"]))
+    api.SetVariable("tessedit_char_whitelist", profile.get("whitelist") or "")
+    return api
+
+
+def read_frame(frame: tuple, profile: dict) -> list[list]:
+    """
+    Lê as palavras de uma faixa escrita em um slot do FrameRing.
+
+    Returns
+    -------
+    list[list]
+        [palavra, x, y, w, h] de cada palavra não vazia, como em
+        `organizeGroups.read_words`.
+
+    """
+    band = attach_frame(frame)
+    height, width = band.shape
+    api = _get_api(profile)
+    try:
+        # O tesserocr só aceita bytes; é a única cópia da faixa
+        api.SetImageBytes(band.tobytes(), width, height, 1, width)
+        api.Recognize()
+
+        words = []
+        iterator = api.GetIterator()
+        if iterator is None:
+            return words
+
+        for word in iterate_level(iterator, RIL.WORD):
+            text = word.GetUTF8Text(RIL.WORD)
+            box = word.BoundingBox(RIL.WORD)
+            if text and text.strip() and box:
+                x0, y0, x1, y1 = box
+                words.append([text, x0, y0, x1 - x0, y1 - y0])
+        return words
+    finally:
+        api.Clear()
+
+
+class OCRPool:
+    """
+    Processos dedicados ao tesseract, alimentados por um FrameRing.
+
+    Cada processo mantém o tesseract carregado (tesserocr), então uma
+    faixa não passa por PNG temporário nem por um novo processo do
+    tesseract, como no pytesseract. Quem chama (uma thread do pipeline)
+    escreve a faixa já realçada direto em um slot livre, e o processo lê o
+    slot como uma visão numpy. O slot só é liberado quando o resultado
+    volta. Faixas maiores que um slot, ou chamadas feitas com o pool
+    quebrado, ficam para a própria thread.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    workers : int, optional
+        Processos de OCR. The default is 2.
+    slot_size : int, optional
+        Bytes de cada slot. The default is 8 MB.
+
+    """
+
+    def __init__(self, log, workers: int = 2,
+                 slot_size: int = 8 * 1024 * 1024):
+        self.log = log
+        self.workers = workers
+        # Dois slots por processo: um sendo lido e outro já escrito
+        self.ring = FrameRing(workers * 2, slot_size)
+        self.stats = {"shared": 0, "local": 0}
+
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        # spawn: o processo principal tem threads e um loop asyncio
+        return ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not broken:
+                return  # Outra thread já recriou
+            self.log.error("Processo de OCR morreu. Recriando o pool.")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start()
+
+    def _local(self) -> None:
+        with self._lock:
+            self.stats["local"] += 1
+
+    def read_words(self, band: np.ndarray, profile: dict,
+                   prepare: Callable[[np.ndarray, np.ndarray], None]
+                   ) -> Optional[list[list]]:
+        """
+        Lê as palavras de uma faixa em um processo do pool.
+
+        Parameters
+        ----------
+        band : np.ndarray
+            Faixa em escala de cinza, ainda sem o último preparo.
+        profile : dict
+            Perfil do tesseract.
+        prepare : Callable[[np.ndarray, np.ndarray], None]
+            Escreve a faixa pronta (mesmo formato) no destino dado.
+
+        Returns
+        -------
+        Optional[list[list]]
+            [palavra, x, y, w, h] de cada palavra, ou None se a faixa deve
+            ser lida na própria thread.
+
+        """
+        if not self.ring.fits(band.shape):
+            self._local()
+            return None
+
+        executor = self._executor
+        with self.ring.slot() as slot:
+            prepare(band, self.ring.view(slot, band.shape))
+            frame = self.ring.frame(slot, band.shape)
+            try:
+                words = executor.submit(read_frame, frame, profile).result()
+            except BrokenProcessPool:
+                self._restart(executor)
+                self._local()
+                return None
+
+        with self._lock:
+            self.stats["shared"] += 1
+        return words
+
+    def close(self) -> None:
+        """Encerra os processos e apaga a memória compartilhada."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self.ring.close()
+        self.log.info(f"OCR em processos: {self.stats['shared']} faixas "
+                      f"compartilhadas, {self.stats['local']} locais.",
+                      False)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jul  1 11:24:37 2025.
+
+@author: vcsil
+"""
+from multiprocessing.shared_memory import SharedMemory
+from contextlib import contextmanager
+from typing import Optional
+import queue
+
+import numpy as np
+
+# Blocos já abertos por este processo (lado de quem lê)
+_attached: dict[str, SharedMemory] = {}
+
+
+def attach_frame(frame: tuple) -> np.ndarray:
+    """
+    Abre, sem cópia, um quadro escrito em um slot de um FrameRing.
+
+    Parameters
+    ----------
+    frame : tuple
+        Descritor (nome do bloco, shape, dtype) devolvido por
+        `FrameRing.frame`.
+
+    Returns
+    -------
+    np.ndarray
+        Visão sobre a memória compartilhada. Só vale enquanto o slot não
+        for liberado por quem o escreveu.
+
+    """
+    name, shape, dtype = frame
+    block = _attached.get(name)
+    if block is None:
+        try:
+            # Quem lê não deve apagar o bloco ao sair (Python 3.13+)
+            block = SharedMemory(name, track=False)
+        except TypeError:
+            block = SharedMemory(name)
+        _attached[name] = block
+
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+class FrameRing:
+    """
+    Anel de buffers em memória compartilhada para passar quadros entre
+    processos sem serializá-los.
+
+    Os blocos são criados uma única vez e reaproveitados: quem escreve
+    reserva um slot, escreve o quadro direto na visão do slot (por
+    exemplo, como `dst` de uma função do OpenCV), entrega o descritor ao
+    outro processo e só libera o slot quando o resultado volta. `acquire`
+    bloqueia enquanto todos estiverem em uso, o que também limita quantos
+    quadros ficam em trânsito.
+
+    Parameters
+    ----------
+    slots : int, optional
+        Quantidade de slots. The default is 4.
+    slot_size : int, optional
+        Bytes de cada slot. The default is 8 MB.
+
+    """
+
+    def __init__(self, slots: int = 4, slot_size: int = 8 * 1024 * 1024):
+        self.slot_size = slot_size
+        self._blocks = [SharedMemory(create=True, size=slot_size)
+                        for _ in range(slots)]
+        self._free: queue.Queue[int] = queue.Queue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def __len__(self):
+        return len(self._blocks)
+
+    def fits(self, shape: tuple, dtype=np.uint8) -> bool:
+        """Indica se um quadro com esse formato cabe em um slot."""
+        return int(np.prod(shape)) * np.dtype(dtype).itemsize \
+            <= self.slot_size
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """Reserva um slot livre, esperando até `timeout` segundos."""
+        return self._free.get(timeout=timeout)
+
+    def release(self, slot: int) -> None:
+        """Devolve o slot ao anel."""
+        self._free.put(slot)
+
+    @contextmanager
+    def slot(self, timeout: Optional[float] = None):
+        """Reserva um slot durante o bloco."""
+        slot = self.acquire(timeout)
+        try:
+            yield slot
+        finally:
+            self.release(slot)
+
+    def view(self, slot: int, shape: tuple, dtype=np.uint8) -> np.ndarray:
+        """Visão do slot com o formato dado, para escrever diretamente."""
+        if not self.fits(shape, dtype):
+            raise ValueError(f"Quadro {shape} não cabe no slot "
+                             f"({self.slot_size} bytes).")
+        return np.ndarray(shape, dtype=dtype, buffer=self._blocks[slot].buf)
+
+    def frame(self, slot: int, shape: tuple, dtype=np.uint8) -> tuple:
+        """Descritor de um quadro já escrito no slot."""
+        return (self._blocks[slot].name, tuple(shape), np.dtype(dtype).str)
+
+    def close(self) -> None:
+        """Fecha e apaga todos os blocos."""
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
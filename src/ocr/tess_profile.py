@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jun  7 11:05:22 2025.
+
+@author: vcsil
+"""
+from pathlib import Path
+import json
+import os
+
+# Caracteres possíveis em um domínio
+DOMAIN_WHITELIST = ("abcdefghijklmnopqrstuvwxyz"
+                    "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-")
+
+# Configuração usada antes de existir um perfil medido
+DEFAULT_PROFILE = {
+    "oem": 3,
+    "psm": 11,
+    "dpi": 300,
+    "whitelist": None,
+    # Altura de linha (px) buscada ao redimensionar as faixas
+    "text_height": 32,
+    "min_scale": 1.0,
+    "max_scale": 4.0,
+    # Fator usado quando não é possível medir o texto
+    "scale": 2.0,
+}
+
+# Modos de página que leem vários blocos; a página do lote empilha faixas
+PAGE_PSMS = (6, 11)
+
+
+def load_profile(path: Path) -> dict:
+    """
+    Carrega o perfil do tesseract, completando com os valores padrão.
+
+    Parameters
+    ----------
+    path : Path
+        Arquivo JSON gerado pelo ajuste automático.
+
+    Returns
+    -------
+    dict
+        Perfil com as chaves de DEFAULT_PROFILE.
+
+    """
+    profile = dict(DEFAULT_PROFILE)
+    try:
+        with open(path, 'r') as f:
+            profile.update(json.load(f))
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    return profile
+
+
+def save_profile(path: Path, profile: dict) -> None:
+    """Salva o perfil de forma atômica."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_config(profile: dict) -> str:
+    """Monta a linha de configuração do tesseract a partir do perfil."""
+    config = f"--oem {profile['oem']} --psm {profile['psm']} "
+    config += f"--dpi {profile['dpi']}"
+    if profile.get("whitelist"):
+        config += f" -c tessedit_char_whitelist={profile['whitelist']}"
+
+    return config
+
+
+def build_page_config(profile: dict) -> str:
+    """
+    Monta a configuração para uma página com várias faixas empilhadas.
+
+    Mantém oem e whitelist do perfil, mas um psm de linha ou palavra única
+    (ex.: 7) leria a página inteira como uma só linha; nesse caso usa o
+    11 (texto esparso).
+
+    """
+    psm = profile["psm"] if profile["psm"] in PAGE_PSMS else 11
+    return build_config({**profile, "psm": psm})
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jul  2 09:41:16 2025.
+
+@author: vcsil
+"""
+from typing import Optional
+from pathlib import Path
+import threading
+import sqlite3
+import json
+import zlib
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    file_hash TEXT PRIMARY KEY,
+    message_id INTEGER,
+    path TEXT NOT NULL,
+    media_date TEXT NOT NULL,
+    phash TEXT,
+    trace BLOB NOT NULL,
+    drive_id TEXT,
+    drive_parent TEXT,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_path ON media (path);
+CREATE INDEX IF NOT EXISTS media_message ON media (message_id);
+"""
+
+_COLUMNS = ("file_hash", "message_id", "path", "media_date", "phash",
+            "trace", "drive_id", "drive_parent", "updated")
+
+
+class TextIndex:
+    """
+    Índice local com o resultado do OCR de cada mídia organizada.
+
+    Para cada arquivo (chave: md5 do conteúdo lido no OCR) são guardados
+    o ID da mensagem, o caminho organizado, a data da mídia, o dHash da
+    imagem e o rastro do OCR: as palavras lidas em cada faixa ou região,
+    com a geometria de cada uma, comprimido. Com isso as regras de
+    URL_RE e de pastas podem ser reaplicadas sem rodar o tesseract de
+    novo. O ID no Drive é preenchido quando o arquivo é enviado.
+
+    Parameters
+    ----------
+    path : Path
+        Arquivo SQLite do índice.
+
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30,
+                                     check_same_thread=False)
+        # Permite que o Telegram e o Drive escrevam ao mesmo tempo
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def _execute(self, query: str, params: tuple = ()) -> int:
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor.rowcount
+
+    def record(self, file_hash: str, path: Path, media_date: str,
+               trace: list, phash: Optional[str] = None,
+               message_id: Optional[int] = None) -> None:
+        """
+        Guarda (ou substitui) o OCR de um arquivo.
+
+        Parameters
+        ----------
+        file_hash : str
+            md5 do arquivo.
+        path : Path
+            Caminho do arquivo já organizado.
+        media_date : str
+            Data da mídia (ISO 8601).
+        trace : list
+            Rastro do OCR, ver organizeGroups.process_image.
+        phash : Optional[str], optional
+            dHash da imagem. The default is None.
+        message_id : Optional[int], optional
+            Mensagem de origem no Telegram. The default is None.
+
+        """
+        blob = zlib.compress(json.dumps(trace, separators=(",", ":"))
+                             .encode())
+        self._execute(
+            "INSERT INTO media (file_hash, message_id, path, media_date, "
+            "phash, trace, updated) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (file_hash) DO UPDATE SET "
+            "message_id = COALESCE(excluded.message_id, message_id), "
+            "path = excluded.path, media_date = excluded.media_date, "
+            "phash = COALESCE(excluded.phash, phash), "
+            "trace = excluded.trace, updated = excluded.updated",
+            (file_hash, message_id, str(path), media_date, phash, blob,
+             time.time()))
+
+    def move(self, old_path: Path, new_path: Path) -> bool:
+        """Atualiza o caminho de um arquivo (recodificado ou movido)."""
+        return bool(self._execute(
+            "UPDATE media SET path = ?, updated = ? WHERE path = ?",
+            (str(new_path), time.time(), str(old_path))))
+
+    def uploaded(self, path: Path, drive_id: str,
+                 drive_parent: Optional[str]) -> bool:
+        """Registra o ID do arquivo no Drive e a pasta onde ele está."""
+        return bool(self._execute(
+            "UPDATE media SET drive_id = ?, drive_parent = ?, updated = ? "
+            "WHERE path = ?",
+            (drive_id, drive_parent, time.time(), str(path))))
+
+    def relocate(self, file_hash: str, path: Path,
+                 drive_parent: Optional[str] = None) -> None:
+        """Registra o novo destino de um arquivo reclassificado."""
+        self._execute(
+            "UPDATE media SET path = ?, "
+            "drive_parent = COALESCE(?, drive_parent), updated = ? "
+            "WHERE file_hash = ?",
+            (str(path), drive_parent, time.time(), file_hash))
+
+    def entries(self):
+        """
+        Percorre todas as mídias do índice.
+
+        Yields
+        ------
+        dict
+            Colunas da mídia, com o rastro do OCR já descomprimido.
+
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM media "
+                "ORDER BY media_date").fetchall()
+
+        for row in rows:
+            entry = dict(zip(_COLUMNS, row))
+            entry["trace"] = json.loads(zlib.decompress(entry["trace"]))
+            yield entry
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM media").fetchone()[0]
+
+    def close(self) -> None:
+        """Fecha a conexão com o banco."""
+        with self._lock:
+            self._conn.close()
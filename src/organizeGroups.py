@@ -6,7 +6,8 @@ Created on Sat Feb  8 16:32:24 2025.
 """
 from typing import Union, Optional
 from dotenv import dotenv_values
-from datetime import datetime
+from datetime import datetime, timezone
+from functools import lru_cache
 import pytesseract as tess
 from pathlib import Path
 from tqdm import tqdm
@@ -18,31 +19,226 @@ import cv2
 import re
 import os
 
-from utils.utils import BUILD_ABSPATH, file_root_recursive
+from utils.utils import (BUILD_ABSPATH, IMAGE_SUFFIXES, VIDEO_SUFFIXES,
+                         file_root_recursive, md5_file)
+from ocr.tess_profile import load_profile, build_config, build_page_config
+from ocr.layout_cache import LayoutCache
+from ocr.text_index import TextIndex
+from ocr.batch_ocr import BatchOCR
 
-env = dotenv_values()
-
-IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
-VIDEO_SUFFIXES = {".mp4", ".avi", ".mkv", ".mov"}
 URL_RE = re.compile(
     r"\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org|me|cc|vip|win|bet|pro)\b",
     flags=re.I)
 
-# Diretório base onde as mídias estão armazenadas
-BASE_MEDIA_DIR = BUILD_ABSPATH(__file__, "..", env["FIRST_DONWLOAD_FOLDER"])
+# Nome dado por TelegramMediaDownloader.process_media: "%Hh%M - id"
+FILE_NAME_RE = re.compile(r"^(\d{2})h(\d{2}) - \d+")
+
+
+@lru_cache(maxsize=None)
+def _env() -> dict:
+    """Lê o .env apenas quando for necessário."""
+    return dotenv_values()
+
+
+def base_media_dir() -> Path:
+    """Diretório base onde as mídias estão armazenadas."""
+    return BUILD_ABSPATH(__file__, "..", _env()["FIRST_DONWLOAD_FOLDER"])
+
+
+def base_destination_dir() -> Path:
+    """Diretório base para onde as mídias serão movidas."""
+    return BUILD_ABSPATH(__file__, "..", _env()["DESTINATION_DIR_IMAGE"])
+
+
+def __getattr__(name: str):
+    """Mantém BASE_MEDIA_DIR/BASE_DESTINATION_DIR, resolvidos sob demanda."""
+    if name == "BASE_MEDIA_DIR":
+        return base_media_dir()
+    if name == "BASE_DESTINATION_DIR":
+        return base_destination_dir()
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# Cache das regiões onde cada domínio costuma aparecer
+LAYOUT_CACHE_PATH = BUILD_ABSPATH(__file__, "..", "cache",
+                                  "layout_cache.json")
+_layout_cache = None
+
+# Índice com o texto lido em cada mídia, usado por reclassify.py
+TEXT_INDEX_PATH = BUILD_ABSPATH(__file__, "..", "cache", "ocr_index.sqlite")
+_text_index = None
+
+# Configuração do tesseract medida por tuneTesseract.py
+TESS_PROFILE_PATH = BUILD_ABSPATH(__file__, "..", "cache",
+                                  "tesseract_profile.json")
+TESS_PROFILE = load_profile(TESS_PROFILE_PATH)
+
+# Largura mínima (px da imagem original) da caixa de texto; eram 100 px
+# com o antigo aumento fixo de 2x
+MIN_BOX_WIDTH = 50
+
+# Margem (fração da imagem) adicionada às regiões aprendidas
+LAYOUT_PAD_X = 0.05
+LAYOUT_PAD_Y = 0.02
+
+
+def get_layout_cache() -> LayoutCache:
+    """Retorna o cache de regiões, carregando-o na primeira chamada."""
+    global _layout_cache
+    if _layout_cache is None:
+        _layout_cache = LayoutCache(LAYOUT_CACHE_PATH)
+    return _layout_cache
+
+
+def get_text_index() -> TextIndex:
+    """Retorna o índice de texto, abrindo-o na primeira chamada."""
+    global _text_index
+    if _text_index is None:
+        _text_index = TextIndex(TEXT_INDEX_PATH)
+    return _text_index
+
+
+def save_state() -> None:
+    """Salva o cache de regiões e fecha o índice, se foram abertos."""
+    global _text_index
+    if _layout_cache is not None:
+        _layout_cache.save()
+    if _text_index is not None:
+        _text_index.close()
+        _text_index = None
+
+
+# Pool de processos do tesseract (ocr.ocr_pool.OCRPool), se ativado
+_ocr_pool = None
+
+
+def use_ocr_pool(pool) -> None:
+    """Passa a ler as faixas pelo pool de processos dado (None desliga)."""
+    global _ocr_pool
+    _ocr_pool = pool
+
+
+def read_band(band: np.ndarray, profile: Optional[dict] = None
+              ) -> list[list]:
+    """
+    Realça a faixa e lê suas palavras.
+
+    Com o pool de OCR ativo, o realce é escrito direto em um slot da
+    memória compartilhada lido pelo processo do tesseract.
+
+    Returns
+    -------
+    list[list]
+        [palavra, x, y, w, h] de cada palavra não vazia em `band`.
+
+    """
+    profile = profile or TESS_PROFILE
+    if _ocr_pool is not None:
+        words = _ocr_pool.read_words(band, profile, enhance_text)
+        if words is not None:
+            return words
+
+    return read_words(enhance_text(band), profile)
+
+
+def read_words(img: np.ndarray, profile: Optional[dict] = None
+               ) -> list[list]:
+    """
+    Lê as palavras da imagem.
+
+    Returns
+    -------
+    list[list]
+        [palavra, x, y, w, h] de cada palavra não vazia em `img`.
+
+    """
+    custom_config = build_config(profile or TESS_PROFILE)
+    data = tess.image_to_data(img, config=custom_config,
+                              output_type=tess.Output.DICT)
+    return [[word, data["left"][i], data["top"][i], data["width"][i],
+             data["height"][i]]
+            for i, word in enumerate(data["text"]) if word.strip()]
+
+
+def find_urls(words: list) -> list[tuple[str, tuple]]:
+    """Aplica URL_RE às palavras de `read_words`, com a caixa de cada URL."""
+    return [(url, tuple(box)) for word, *box in words
+            for url in URL_RE.findall(word)]
+
+
+def urls_from_trace(trace: list) -> list[str]:
+    """
+    Refaz a classificação a partir do rastro do OCR, sem o tesseract.
+
+    Como no OCR original, vale a primeira faixa ou região (na ordem em
+    que foram lidas) com alguma URL. Um rastro interrompido (ver
+    `trace_cut`) sem URL nas faixas lidas não diz nada sobre as demais.
+
+    """
+    for entry in trace:
+        if "words" not in entry:
+            continue
+        found = find_urls(entry["words"])
+        if found:
+            return [url for url, _ in found]
+
+    return []
+
+
+def trace_cut(trace: list) -> bool:
+    """Indica se o OCR parou antes de ler todas as faixas da imagem."""
+    return any(entry.get("cut") for entry in trace)
 
-# Diretório base para onde as mídias serão movidas
-BASE_DESTINATION_DIR = BUILD_ABSPATH(__file__,
-                                     "..", env["DESTINATION_DIR_IMAGE"])
 
+def dhash(image: np.ndarray, size: int = 8) -> str:
+    """Hash perceptual (dHash) de 64 bits da imagem, em hexadecimal."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+
+
+def index_media(file_path: Path, media_date: datetime, trace: list, log,
+                image: Optional[np.ndarray] = None,
+                message_id: Optional[int] = None) -> None:
+    """Guarda o rastro do OCR de um arquivo organizado no índice."""
+    try:
+        get_text_index().record(
+            md5_file(file_path), file_path, media_date.isoformat(), trace,
+            phash=dhash(image) if image is not None else None,
+            message_id=message_id)
+    except Exception as e:
+        # O índice é só um atalho para reclassificar; não para o fluxo
+        log.warning(f"Falha ao indexar {file_path}: {e}", False)
 
-def extract_urls(img: np.ndarray) -> list[str]:
+
+def extract_urls(img: np.ndarray, profile: Optional[dict] = None
+                 ) -> list[str]:
     """Extrai urls da imagem."""
-    # Extrair texto da imagem
-    custom_config = r'--oem 3 --psm 11 --dpi 300'
-    text = tess.image_to_string(img, config=custom_config)
+    return [url for url, _ in extract_urls_with_boxes(img, profile)]
+
+
+def extract_urls_with_boxes(img: np.ndarray, profile: Optional[dict] = None
+                            ) -> list[tuple[str, tuple]]:
+    """
+    Extrai urls da imagem junto com a posição de cada uma.
 
-    return URL_RE.findall(text)
+    Parameters
+    ----------
+    img : np.ndarray
+        Imagem já preparada para o OCR.
+    profile : Optional[dict], optional
+        Perfil do tesseract. The default is TESS_PROFILE.
+
+    Returns
+    -------
+    list[tuple[str, tuple]]
+        Pares (url, (x, y, w, h)) com a caixa da palavra em `img`.
+
+    """
+    # Extrair texto da imagem, palavra a palavra
+    return find_urls(read_words(img, profile))
 
 
 def crop_image_percentage(imagem: np.ndarray) -> list[np.ndarray]:
@@ -82,8 +278,20 @@ def crop_image_percentage(imagem: np.ndarray) -> list[np.ndarray]:
     return cortes
 
 
-def retorna_contornos(image: np.ndarray):
-    """Desenha contornos na imagem."""
+def band_offsets(imagem: np.ndarray) -> list[int]:
+    """Retorna a linha inicial de cada corte de `crop_image_percentage`."""
+    altura = imagem.shape[0]
+    return [0, int(8.5 * 0.1 * altura)]
+
+
+def retorna_contornos(image: np.ndarray, scale: float = 2.0):
+    """
+    Desenha contornos na imagem.
+
+    `scale` é o aumento aplicado à faixa; a largura mínima da caixa é
+    medida em pixels da imagem original.
+
+    """
     altura, largura = image.shape  # Obtém dimensões da imagem
 
     # Aumentar contraste usando equalização de histograma
@@ -107,57 +315,326 @@ def retorna_contornos(image: np.ndarray):
     x, y, w, h = cv2.boundingRect(c)
 
     # Ignora caixa muito pequenas
-    if w < 100:
+    if w < MIN_BOX_WIDTH * scale:
         return None
 
     # Recortar a região detectada
     cropped = image[y:y+h, x:x+w]
 
-    return cropped, contours
+    return cropped, contours, (x, y, w, h)
+
+
+def enhance_text(image: np.ndarray, dst: Optional[np.ndarray] = None
+                 ) -> np.ndarray:
+    """
+    Aplica operações morfológicas para destacar o texto.
+
+    Se `dst` for dado (mesmo formato de `image`), o resultado é escrito
+    nele.
+
+    """
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+    img_dilated = cv2.dilate(image, kernel, iterations=1)
+
+    return cv2.erode(img_dilated, kernel, dst=dst, iterations=1)
+
+
+def estimate_text_height(gray: np.ndarray) -> Optional[float]:
+    """
+    Estima a altura das linhas de texto pelo perfil de projeção.
+
+    A faixa é binarizada (Otsu) e a tinta é a classe minoritária, o que
+    cobre texto claro em fundo escuro e vice-versa. As linhas com tinta
+    formam trechos contínuos; a mediana das alturas desses trechos é a
+    altura típica da linha de texto.
+
+    Parameters
+    ----------
+    gray : np.ndarray
+        Faixa em escala de cinza.
+
+    Returns
+    -------
+    Optional[float]
+        Altura estimada em pixels, ou None se não houver texto aparente.
+
+    """
+    _, binary = cv2.threshold(gray, 0, 255,
+                              cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ink = binary > 0
+    if np.count_nonzero(ink) > ink.size / 2:
+        ink = ~ink
+
+    # Linha com tinta em pelo menos 1% da largura
+    rows = np.count_nonzero(ink, axis=1) > max(1, ink.shape[1] // 100)
+
+    # Início e fim de cada trecho contínuo de linhas com tinta
+    edges = np.diff(np.concatenate(([0], rows.view(np.int8), [0])))
+    heights = np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+    # Ignora ruído e blocos que ocupam quase toda a faixa
+    heights = heights[(heights >= 3) & (heights < 0.9 * gray.shape[0])]
+    if not heights.size:
+        return None
+
+    return float(np.median(heights))
 
 
-def process_image(image: np.ndarray, log) -> Union[str, False]:
-    """Faz transformações na imagem para buscar URL."""
+def fit_to_text(gray: np.ndarray, profile: dict) -> tuple[np.ndarray, float]:
+    """
+    Redimensiona a faixa só o necessário para o texto ficar legível.
+
+    Parameters
+    ----------
+    gray : np.ndarray
+        Faixa em escala de cinza.
+    profile : dict
+        Perfil do tesseract (text_height, min_scale, max_scale, scale).
+
+    Returns
+    -------
+    tuple[np.ndarray, float]
+        Faixa redimensionada e o fator usado.
+
+    """
+    text_height = estimate_text_height(gray)
+    if text_height is None:
+        scale = profile["scale"]
+    else:
+        scale = min(profile["max_scale"],
+                    max(profile["min_scale"],
+                        profile["text_height"] / text_height))
+
+    if abs(scale - 1.0) < 0.05:
+        return gray, 1.0
+
+    interpolation = cv2.INTER_LINEAR if scale > 1 else cv2.INTER_AREA
+    return cv2.resize(gray, None, fx=scale, fy=scale,
+                      interpolation=interpolation), scale
+
+
+def _ocr_learned_regions(image: np.ndarray, profile: dict,
+                         cache: LayoutCache, trace: Optional[list] = None,
+                         tried: Optional[list] = None
+                         ) -> Optional[list[str]]:
+    """
+    Faz OCR apenas nas regiões onde o domínio costuma aparecer.
+
+    `tried` recebe os domínios cujas regiões foram lidas sem resultado.
+
+    """
+    altura, largura = image.shape[:2]
+    tried = [] if tried is None else tried
+
+    for domain, (x0, y0, x1, y1) in cache.candidates(image.shape):
+        # Converte a caixa normalizada (com margem) para pixels
+        left = int(max(0.0, x0 - LAYOUT_PAD_X) * largura)
+        right = int(min(1.0, x1 + LAYOUT_PAD_X) * largura)
+        top = int(max(0.0, y0 - LAYOUT_PAD_Y) * altura)
+        bottom = int(min(1.0, y1 + LAYOUT_PAD_Y) * altura)
+        if right - left < 2 or bottom - top < 2:
+            continue
+
+        gray = cv2.cvtColor(image[top:bottom, left:right], cv2.COLOR_BGR2GRAY)
+        region, _ = fit_to_text(gray, profile)
+        blurred = cv2.GaussianBlur(region, (5, 5), 0)
+
+        words = read_band(blurred, profile)
+        if trace is not None:
+            trace.append({"region": [x0, y0, x1, y1], "words": words})
+
+        matches = [url for url, _ in find_urls(words)]
+        if matches:
+            cache.record(image.shape, matches[0], [x0, y0, x1, y1])
+            return matches
+
+        tried.append(domain)
+
+    return None
+
+
+def process_image(image: np.ndarray, log, profile: Optional[dict] = None,
+                  use_cache: bool = True, trace: Optional[list] = None
+                  ) -> Union[str, False]:
+    """
+    Faz transformações na imagem para buscar URL.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        Imagem (BGR) a ser analisada.
+    log : TYPE
+        Chamável de log.
+    profile : Optional[dict], optional
+        Perfil do tesseract. The default is TESS_PROFILE.
+    use_cache : bool, optional
+        Se deve usar e alimentar o cache de regiões. The default is True.
+    trace : Optional[list], optional
+        Recebe, na ordem de leitura, as palavras de cada região ("region",
+        caixa normalizada) ou faixa ("band", [linha inicial, escala, x,
+        y]) lida. Se a busca parar em uma URL antes da última faixa, o
+        rastro termina com {"cut": True}. The default is None.
+
+    """
     if image is None:
         log.error(f"Não foi possível carregar a imagem: {image}")
         return
 
-    # Redimensionar a imagem para aumentar a resolução
-    scale_percent = 200  # Aumenta a resolução em 200%
-    width = int(image.shape[1] * scale_percent / 100)
-    height = int(image.shape[0] * scale_percent / 100)
-    dim = (width, height)
-    resized = cv2.resize(image, dim, interpolation=cv2.INTER_LINEAR)
+    profile = profile or TESS_PROFILE
+
+    # Tenta primeiro as regiões aprendidas para imagens dessa geometria
+    cache = get_layout_cache() if use_cache else None
+    tried = []
+    if cache is not None:
+        matches = _ocr_learned_regions(image, profile, cache, trace, tried)
+        if matches:
+            if trace is not None:
+                trace.append({"cut": True})
+            return matches
+
+    for band, inicio, scale, (x, y) in prepare_bands(image, profile,
+                                                     enhance=False):
+        # Procurar URLs no texto extraído
+        words = read_band(band, profile)
+        if trace is not None:
+            trace.append({"band": [inicio, scale, int(x), int(y)],
+                          "words": words})
+
+        found = find_urls(words)
+        if found:
+            if cache is not None:
+                # A região aprendida só errou se o domínio estava fora dela
+                if found[0][0].lower() in tried:
+                    cache.miss(image.shape, found[0][0])
+                learn_layout(cache, image.shape, found[0], inicio, scale,
+                             (x, y))
+            if trace is not None:
+                trace.append({"cut": True})
+            return [url for url, _ in found]
+
+    return False
+
+
+def prepare_bands(image: np.ndarray, profile: dict, enhance: bool = True):
+    """
+    Prepara para o OCR as faixas onde a URL costuma estar.
+
+    As faixas são geradas sob demanda, então quem para na primeira faixa
+    com resultado não paga pelo preparo das demais. Com `enhance=False`
+    o último passo (enhance_text) fica para quem lê a faixa, que pode
+    escrevê-lo direto no destino (ver read_band).
+
+    Yields
+    ------
+    tuple
+        (faixa pronta para o OCR, linha inicial da faixa na imagem, fator
+        de escala aplicado, posição (x, y) do recorte na faixa escalada).
+
+    """
+    # Pegar as partes de interesse da imagem, cortes finais e iniciais.
+    # Só a faixa é convertida e redimensionada, nunca a imagem inteira.
+    for corte, inicio in zip(crop_image_percentage(image),
+                             band_offsets(image)):
 
-    # Converter para escala de cinza
-    gray = cv2.cvtColor(resized, cv2.COLOR_BGR2GRAY)
+        # Converter para escala de cinza
+        gray = cv2.cvtColor(corte, cv2.COLOR_BGR2GRAY)
 
-    # Aplicar um filtro para melhorar o contraste
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        # Aumenta a resolução conforme a altura medida do texto
+        scaled, scale = fit_to_text(gray, profile)
 
-    # Pegar as partes de interesse da imagem, cortes finais e iniciais
-    for corte in crop_image_percentage(blurred):
+        # Aplicar um filtro para melhorar o contraste
+        blurred = cv2.GaussianBlur(scaled, (5, 5), 0)
 
-        img_cropped = retorna_contornos(corte)
+        img_cropped = retorna_contornos(blurred, scale)
 
         # Pula se não encontrar bordas utils
         if img_cropped is None:
             continue
 
-        img_cropped = img_cropped[0].copy()
+        x, y = img_cropped[2][:2]
+        img_cropped = img_cropped[0]
+        if enhance:
+            img_cropped = enhance_text(img_cropped)
 
-        # Aplicar operações morfológicas para destacar o texto
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-        img_dilated = cv2.dilate(img_cropped, kernel, iterations=1)
+        yield img_cropped, inicio, scale, (x, y)
 
-        img_eroded = cv2.erode(img_dilated, kernel, iterations=1)
 
-        # Procurar URLs no texto extraído
-        matches = extract_urls(img_eroded)
-        if matches:
-            return matches
+def learn_layout(cache: LayoutCache, shape: tuple, found: tuple,
+                 inicio: int, scale: float, offset: tuple) -> None:
+    """Guarda a posição do domínio como fração da imagem original."""
+    altura, largura = shape[:2]
+    url, (wx, wy, ww, wh) = found
+    x, y = offset
 
-    return False
+    top = inicio + (y + wy) / scale
+    cache.record(shape, url,
+                 [(x + wx) / scale / largura, top / altura,
+                  (x + wx + ww) / scale / largura,
+                  (top + wh / scale) / altura])
+
+
+def classify_batch(images: list[np.ndarray], log,
+                   profile: Optional[dict] = None,
+                   traces: Optional[list] = None) -> list[list[str]]:
+    """
+    Busca URLs em várias imagens com uma única chamada ao tesseract.
+
+    As regiões aprendidas não são usadas aqui: todas as faixas de todas
+    as imagens vão para a mesma página, e o resultado de cada imagem é a
+    primeira faixa (na ordem de `prepare_bands`) que contém URL.
+
+    Parameters
+    ----------
+    images : list[np.ndarray]
+        Imagens (BGR); None para as que não puderam ser lidas.
+    log : TYPE
+        Chamável de log.
+    profile : Optional[dict], optional
+        Perfil do tesseract. The default is TESS_PROFILE.
+    traces : Optional[list], optional
+        Recebe o rastro do OCR de cada imagem (ver process_image), na
+        mesma ordem. The default is None.
+
+    Returns
+    -------
+    list[list[str]]
+        URLs encontradas em cada imagem, na mesma ordem.
+
+    """
+    profile = profile or TESS_PROFILE
+    cache = get_layout_cache()
+    batch = BatchOCR(build_page_config(profile))
+    geometry = {}
+
+    for i, image in enumerate(images):
+        if image is None:
+            log.error(f"Não foi possível carregar a imagem {i} do lote.")
+            continue
+
+        for j, band in enumerate(prepare_bands(image, profile)):
+            batch.add((i, j), band[0])
+            geometry[(i, j)] = band[1:]
+
+    words = batch.run()
+    results = [[] for _ in images]
+    if traces is not None:
+        traces.extend([] for _ in images)
+    for (i, j) in sorted(words):
+        if traces is not None:
+            inicio, scale, (x, y) = geometry[(i, j)]
+            traces[i].append({"band": [inicio, scale, int(x), int(y)],
+                              "words": [[word, *box]
+                                        for word, box in words[(i, j)]]})
+        if results[i]:
+            continue
+
+        found = [(url, box) for word, box in words[(i, j)]
+                 for url in URL_RE.findall(word)]
+        if found:
+            learn_layout(cache, images[i].shape, found[0], *geometry[(i, j)])
+            results[i] = [url for url, _ in found]
+
+    return results
 
 
 # Função para capturar o primeiro quadro de um vídeo
@@ -260,12 +737,17 @@ def _try_opencv_extraction(video_path: Path, log) -> Optional[np.ndarray]:
     return None
 
 
-def move_file(src: Path, midia_date, urls: list[str], log) -> None:
-    """Move arquivo para outro diretório."""
+def destination_dir(midia_date, urls: list[str]) -> Path:
+    """Retorna a pasta de destino de uma mídia com a data e as URLs dadas."""
     month = midia_date.strftime("%m-%Y")
     domain = urls[0] if urls else Path("others") / midia_date.strftime("%Y-%m-%d")
-    target = BUILD_ABSPATH("../..", env["DESTINATION_DIR_IMAGE"],
-                           month, domain)
+    return BUILD_ABSPATH("../..", _env()["DESTINATION_DIR_IMAGE"],
+                         month, domain)
+
+
+def move_file(src: Path, midia_date, urls: list[str], log) -> None:
+    """Move arquivo para outro diretório."""
+    target = destination_dir(midia_date, urls)
     target.mkdir(parents=True, exist_ok=True)
     shutil.move(src, target / src.name)
 
@@ -273,41 +755,376 @@ def move_file(src: Path, midia_date, urls: list[str], log) -> None:
     return target / src.name
 
 
-def organize_midia(file_path: str, file_date: datetime, log) -> None:
-    """Move imagem para diretório correspondente a URL."""
-    file_path = Path(file_path)
+def load_media(file_path: Path, log) -> Union[np.ndarray, None, False]:
+    """
+    Carrega a imagem (ou o primeiro quadro do vídeo) de um arquivo.
+
+    Returns
+    -------
+    Union[np.ndarray, None, False]
+        A imagem, None se não foi possível lê-la ou False se o arquivo
+        não for imagem nem vídeo.
+
+    """
     # Verificar se o arquivo é uma imagem ou vídeo
     if file_path.suffix.lower() in IMAGE_SUFFIXES:
-        image = cv2.imread(file_path)
+        return cv2.imread(str(file_path))
 
-    elif file_path.suffix.lower() in VIDEO_SUFFIXES:
-        image = get_first_frame(file_path, log)
+    if file_path.suffix.lower() in VIDEO_SUFFIXES:
+        return get_first_frame(file_path, log)
 
-    else:
+    return False
+
+
+def classify_media(file_path: Path, log, trace: Optional[list] = None
+                   ) -> Union[list[str], None, False]:
+    """
+    Busca as URLs de um arquivo de mídia.
+
+    `trace` recebe o rastro do OCR, como em process_image.
+
+    Returns
+    -------
+    Union[list[str], None, False]
+        As URLs encontradas (lista vazia se nenhuma), None se a mídia não
+        pôde ser lida ou False se o arquivo não for imagem nem vídeo.
+
+    """
+    image = load_media(Path(file_path), log)
+    if image is False or image is None:
+        return image
+
+    return process_image(image, log, trace=trace) or []
+
+
+def organize_midia(file_path: str, file_date: datetime, log,
+                   message_id: Optional[int] = None) -> None:
+    """Move imagem para diretório correspondente a URL e indexa o OCR."""
+    file_path = Path(file_path)
+    image = load_media(file_path, log)
+    if image is False:
         # Ignorar arquivos que não são imagens ou vídeos
         log.info(f"Ignorando arquivo não suportado: {file_path}")
         return
 
-    matches = process_image(image, log)
+    trace = []
+    matches = process_image(image, log, trace=trace)
+
+    new_path = move_file(file_path, file_date, matches, log)
+    if image is not None:
+        index_media(new_path, file_date, trace, log, image, message_id)
+    return new_path
 
-    return move_file(file_path, file_date, matches, log)
+
+def organize_batch(items: list[tuple], log
+                   ) -> list[tuple[Path, Optional[Path], Optional[str]]]:
+    """
+    Organiza várias mídias usando um único OCR para todo o lote.
+
+    Parameters
+    ----------
+    items : list[tuple]
+        Pares (arquivo, data da mídia) ou trios (arquivo, data, ID da
+        mensagem no Telegram).
+    log : TYPE
+        Chamável de log.
+
+    Returns
+    -------
+    list[tuple[Path, Optional[Path], Optional[str]]]
+        Para cada arquivo: origem, novo caminho (None se não foi movido) e
+        a mensagem de erro (None em caso de sucesso).
+
+    """
+    results = []
+    loaded = []
+    for file_path, file_date, *message_id in items:
+        file_path = Path(file_path)
+        message_id = message_id[0] if message_id else None
+        try:
+            image = load_media(file_path, log)
+        except Exception as e:
+            log.error(f"Erro ao carregar {file_path}: {e}")
+            results.append((file_path, None, str(e)))
+            continue
+
+        if image is False:
+            log.info(f"Ignorando arquivo não suportado: {file_path}")
+            results.append((file_path, None, None))
+            continue
+
+        loaded.append((file_path, file_date, image, message_id))
+
+    traces = []
+    matches = classify_batch([image for _, _, image, _ in loaded], log,
+                             traces=traces)
+
+    for (file_path, file_date, image, message_id), urls, trace in zip(
+            loaded, matches, traces):
+        try:
+            new_path = move_file(file_path, file_date, urls, log)
+            results.append((file_path, new_path, None))
+            if image is not None:
+                index_media(new_path, file_date, trace, log, image,
+                            message_id)
+        except Exception as e:
+            log.error(f"Erro ao organizar {file_path}: {e}")
+            results.append((file_path, None, str(e)))
+
+    return results
+
+
+def media_date(file_path: Path, tz: timezone) -> datetime:
+    """
+    Descobre a data de uma mídia sem abrir o conteúdo do arquivo.
+
+    A ordem de busca é: nome do arquivo ("%Hh%M - id") junto com a pasta
+    de data ("%Y-%m-%d") criada no download, só a pasta de data, a data
+    de criação gravada no contêiner do vídeo e, por fim, a data de
+    modificação do arquivo.
+
+    Parameters
+    ----------
+    file_path : Path
+        Caminho da mídia.
+    tz : timezone
+        Fuso horário usado nas datas locais.
+
+    Returns
+    -------
+    datetime
+        Data da mídia.
+
+    """
+    file_path = Path(file_path)
+
+    try:
+        day = datetime.strptime(file_path.parent.name, "%Y-%m-%d")
+    except ValueError:
+        day = None
+
+    if day is not None:
+        match = FILE_NAME_RE.match(file_path.stem)
+        if match:
+            day = day.replace(hour=int(match[1]), minute=int(match[2]))
+        return day.replace(tzinfo=tz)
+
+    if file_path.suffix.lower() in VIDEO_SUFFIXES:
+        created = _container_date(file_path)
+        if created is not None:
+            return created.astimezone(tz)
+
+    return datetime.fromtimestamp(file_path.stat().st_mtime, tz)
+
+
+def _container_date(video_path: Path) -> Optional[datetime]:
+    """Lê a tag creation_time do contêiner do vídeo com ffprobe."""
+    command = [
+        "ffprobe",
+        "-v", "quiet",
+        "-show_entries", "format_tags=creation_time",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        str(video_path)
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True,
+                                timeout=10)
+        created = result.stdout.strip()
+        if not created:
+            return None
+        return datetime.fromisoformat(created.replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+# Logger de cada processo do modo em lote
+_worker_log = None
+
+
+def _init_worker(log_dir: Path) -> None:
+    """Inicializa o logger próprio de cada processo trabalhador."""
+    from utils.logger_setup import SetupLogger
+
+    global _worker_log
+    _worker_log = SetupLogger(log_dir / f"log-organize-{os.getpid()}.txt",
+                              f"organize-{os.getpid()}")
+
+
+def _organize_chunk(files: list[Path], tz: timezone, log=None,
+                    batch_ocr: int = 0) -> list[tuple[Path, Optional[str]]]:
+    """
+    Organiza um lote de arquivos isolando as falhas de cada um.
+
+    Com `batch_ocr`, os arquivos são lidos em grupos desse tamanho com
+    uma única chamada ao tesseract por grupo.
+
+    Returns
+    -------
+    list[tuple[Path, Optional[str]]]
+        Para cada arquivo, a mensagem de erro ou None em caso de sucesso.
+
+    """
+    log = log or _worker_log
+    results = []
+
+    if batch_ocr:
+        for i in range(0, len(files), batch_ocr):
+            group = files[i:i + batch_ocr]
+            try:
+                items = [(file, media_date(file, tz)) for file in group]
+                results.extend((file, err) for file, _, err in
+                               organize_batch(items, log))
+            except Exception as e:
+                log.error(f"Erro no lote de OCR: {e}")
+                results.extend((file, str(e)) for file in group)
+
+        get_layout_cache().save()
+        return results
+
+    for file in files:
+        try:
+            organize_midia(file, media_date(file, tz), log)
+            results.append((file, None))
+        except Exception as e:
+            log.error(f"Erro ao organizar {file}: {e}")
+            results.append((file, str(e)))
+
+    get_layout_cache().save()
+    return results
+
+
+def run_batch(files: list[Path], tz: timezone, log, workers: int,
+              chunksize: int = 16, batch_ocr: int = 0
+              ) -> list[tuple[Path, str]]:
+    """
+    Organiza os arquivos em paralelo, em lotes, usando vários processos.
+
+    Se um processo morrer (por exemplo, uma falha nativa no OpenCV), o
+    pool é recriado e os arquivos dos lotes em andamento que ainda não
+    foram movidos são tentados mais uma vez; os que falharem de novo são
+    marcados como erro.
+
+    Parameters
+    ----------
+    files : list[Path]
+        Arquivos a organizar.
+    tz : timezone
+        Fuso horário usado nas datas locais.
+    log : TYPE
+        Chamável de log.
+    workers : int
+        Quantidade de processos.
+    chunksize : int, optional
+        Arquivos por lote. The default is 16.
+    batch_ocr : int, optional
+        Imagens por chamada ao tesseract (0 desativa). The default is 0.
+
+    Returns
+    -------
+    list[tuple[Path, str]]
+        Arquivos que falharam e o erro correspondente.
+
+    """
+    from concurrent.futures import (ProcessPoolExecutor, wait,
+                                    FIRST_COMPLETED)
+    from concurrent.futures.process import BrokenProcessPool
+    from collections import deque
+
+    failures = []
+    log_dir = base_media_dir().parent
+    progress = tqdm(total=len(files), unit="arq")
+    pending = deque((files[i:i + chunksize], 0)
+                    for i in range(0, len(files), chunksize))
+
+    while pending:
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(log_dir,)) as pool:
+            inflight = {}
+            broken = False
+
+            while (pending or inflight) and not broken:
+                # Mantém no máximo dois lotes por processo em andamento
+                while pending and len(inflight) < workers * 2:
+                    chunk, tries = pending.popleft()
+                    future = pool.submit(_organize_chunk, chunk, tz,
+                                         batch_ocr=batch_ocr)
+                    inflight[future] = (chunk, tries)
+
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk, tries = inflight.pop(future)
+                    try:
+                        results = future.result()
+                    except BrokenProcessPool:
+                        broken = True
+                        inflight[future] = (chunk, tries)
+                        continue
+
+                    failures.extend((f, err) for f, err in results if err)
+                    progress.update(len(chunk))
+
+            if broken:
+                log.error("Processo trabalhador morreu. Recriando o pool.")
+                for chunk, tries in inflight.values():
+                    # O processo pode ter movido parte do lote antes de morrer
+                    remaining = [f for f in chunk if Path(f).exists()]
+                    progress.update(len(chunk) - len(remaining))
+                    if not remaining:
+                        continue
+                    if tries < 1:
+                        pending.append((remaining, tries + 1))
+                    else:
+                        failures.extend((f, "processo morreu")
+                                        for f in remaining)
+                        progress.update(len(remaining))
+
+    progress.close()
+    return failures
 
 
 def main():
     """Percorre por todas os arquivos com sufixo especificado na pasta."""
     from utils.logger_setup import SetupLogger
-    from datetime import timedelta, timezone
-
-    logger = SetupLogger(BASE_MEDIA_DIR.parent / "log-organize.txt",
+    from datetime import timedelta
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Organiza as mídias baixadas por domínio.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos em paralelo (1 = sem paralelismo).")
+    parser.add_argument("--chunksize", type=int, default=16,
+                        help="Arquivos enviados por vez a cada processo.")
+    parser.add_argument("--batch-ocr", type=int, default=0,
+                        help="Imagens lidas por chamada ao tesseract "
+                             "(0 = uma chamada por faixa).")
+    args = parser.parse_args()
+
+    media_dir = base_media_dir()
+    logger = SetupLogger(media_dir.parent / "log-organize.txt",
                          "organize")
 
     # UTC-3
     tz = timezone(timedelta(hours=-3))
 
-    files = file_root_recursive(BASE_MEDIA_DIR)
+    files = file_root_recursive(media_dir)
 
-    for file in tqdm(files):
-        organize_midia(file, datetime.now(tz), logger)
+    if args.workers > 1:
+        failures = run_batch(files, tz, logger, args.workers, args.chunksize,
+                             args.batch_ocr)
+    else:
+        failures = []
+        step = args.batch_ocr or 1
+        with tqdm(total=len(files)) as progress:
+            for i in range(0, len(files), step):
+                chunk = files[i:i + step]
+                failures.extend((f, err) for f, err in _organize_chunk(
+                    chunk, tz, logger, args.batch_ocr) if err)
+                progress.update(len(chunk))
+
+    logger.info(f"{len(files) - len(failures)} arquivos organizados, "
+                f"{len(failures)} com erro.")
+    for file, err in failures:
+        logger.error(f"Falhou: {file}: {err}", False)
 
 
 # Executa o script
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jul  2 15:12:08 2025.
+
+Reclassificação pelo índice do OCR.
+
+Reaplica URL_RE e as regras de pastas de organizeGroups ao texto já lido
+de cada mídia (cache/ocr_index.sqlite), sem rodar o tesseract. Só são
+movidos, na pasta local e no Drive, os arquivos cujo destino mudou.
+
+@author: vcsil
+"""
+from dotenv import dotenv_values
+from datetime import datetime
+from pathlib import Path
+import argparse
+import shutil
+
+from organizeGroups import (destination_dir, get_text_index, trace_cut,
+                            urls_from_trace)
+from utils.utils import BUILD_ABSPATH
+from utils.logger_setup import SetupLogger
+
+
+def plan_moves(index) -> tuple[list[dict], int]:
+    """
+    Compara o destino atual de cada mídia com o das regras vigentes.
+
+    Rastros interrompidos em que as regras vigentes não acham URL são
+    ignorados: as faixas não lidas poderiam ter uma.
+
+    Returns
+    -------
+    tuple[list[dict], int]
+        Entradas do índice cujo destino mudou, com "old" e "new" (caminhos
+        locais) e "urls" (o novo resultado), e quantas foram ignoradas.
+
+    """
+    moves = []
+    skipped = 0
+    for entry in index.entries():
+        urls = urls_from_trace(entry["trace"])
+        if not urls and trace_cut(entry["trace"]):
+            skipped += 1
+            continue
+        old = Path(entry["path"])
+        new = destination_dir(datetime.fromisoformat(entry["media_date"]),
+                              urls) / old.name
+        if new != old:
+            moves.append({**entry, "old": old, "new": new, "urls": urls})
+
+    return moves, skipped
+
+
+def move_local(moves: list[dict], index, log) -> int:
+    """Move os arquivos que ainda estão na pasta local."""
+    moved = 0
+    for move in moves:
+        if not move["old"].exists():
+            continue
+        try:
+            move["new"].parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(move["old"], move["new"])
+            index.relocate(move["file_hash"], move["new"])
+            moved += 1
+        except OSError as e:
+            log.warning(f"Falhou para mover {move['old']}: {e}")
+
+    return moved
+
+
+def move_remote(moves: list[dict], index, log, env: dict) -> int:
+    """Move no Drive os arquivos já enviados (com a pasta conhecida)."""
+    # Importados aqui para que a simulação não carregue a pilha do Drive
+    from driveSync.uploaded_filesdirs import UploadedFilesDirs
+    from driveSync.drive_request import DriveRequester
+    from driveSync.drive_client import DriveClient
+    from driveSync.drive_auth import DriveAuth
+    from mainDrive import resolve_folder
+
+    drive_auth = DriveAuth(BUILD_ABSPATH(
+        __file__, "../credentials/client_secrets.json"))
+    requester = DriveRequester(log,
+                               rate=float(env.get("DRIVE_RATE", 10)),
+                               burst=float(env.get("DRIVE_RATE_BURST", 20)))
+    dclient = DriveClient(drive_auth.authenticate(), requester,
+                          pool_size=int(env.get("DRIVE_HTTP_POOL") or 4))
+    dict_uploads = UploadedFilesDirs(BUILD_ABSPATH(__file__,
+                                                   "../uploads.json"))
+    local_dir = BUILD_ABSPATH(__file__, "..", env["DESTINATION_DIR_IMAGE"])
+
+    # Sem a pasta atual não há de onde tirar o arquivo no Drive
+    orphans = [move for move in moves if not move["drive_parent"]]
+    for move in orphans:
+        log.warning(f"{move['old'].name} está no Drive sem pasta "
+                    "registrada. Não foi movido lá.", False)
+    if orphans:
+        log.warning(f"{len(orphans)} arquivos enviados sem pasta "
+                    "registrada ficaram no lugar no Drive.")
+
+    try:
+        pending = []
+        for move in moves:
+            if not move["drive_parent"]:
+                continue
+            target_id = resolve_folder(str(move["new"]), log, dclient,
+                                       local_dir, dict_uploads,
+                                       env["GDRIVE_BASE_FOLDER_ID"])
+            if target_id != move["drive_parent"]:
+                pending.append((move, target_id))
+
+        responses = dclient.move_items_batch(
+            [(move["drive_id"], move["drive_parent"], target_id)
+             for move, target_id in pending])
+    finally:
+        dict_uploads.update_dict()
+
+    moved = 0
+    for (move, target_id), response in zip(pending, responses):
+        if response is None:
+            log.warning(f"Falhou para mover {move['old'].name} no Drive.")
+            continue
+        index.relocate(move["file_hash"], move["new"], target_id)
+        moved += 1
+
+    return moved
+
+
+def main():
+    """Reclassifica as mídias indexadas com as regras atuais."""
+    parser = argparse.ArgumentParser(
+        description="Reaplica as regras de classificação ao índice do OCR.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Só lista as mudanças de destino.")
+    parser.add_argument("--local-only", action="store_true",
+                        help="Não mexe nos arquivos já enviados ao Drive.")
+    args = parser.parse_args()
+
+    env = dotenv_values(BUILD_ABSPATH(__file__, "..", ".env"))
+    log = SetupLogger(BUILD_ABSPATH(__file__, "../logs/log-reclassify.txt"),
+                      "reclassify")
+
+    index = get_text_index()
+    moves, skipped = plan_moves(index)
+    log.info(f"{len(moves)} de {len(index)} mídias mudam de destino.")
+    if skipped:
+        log.info(f"{skipped} mídias ignoradas: o OCR parou antes de ler "
+                 "todas as faixas e nenhuma das lidas tem URL.")
+    for move in moves:
+        log.info(f"{move['old'].name}: {move['old'].parent} → "
+                 f"{move['new'].parent} ({', '.join(move['urls']) or '-'})",
+                 args.dry_run)
+
+    if args.dry_run or not moves:
+        index.close()
+        return
+
+    local = move_local(moves, index, log)
+
+    remote = 0
+    uploaded = [move for move in moves if move["drive_id"]]
+    if uploaded and not args.local_only:
+        remote = move_remote(uploaded, index, log, env)
+
+    # Arquivos que não estão mais em lugar nenhum: só o índice muda
+    for move in moves:
+        if not move["drive_id"] and not move["new"].exists():
+            index.relocate(move["file_hash"], move["new"])
+
+    log.info(f"Reclassificação: {local} arquivos movidos na pasta local e "
+             f"{remote} no Drive.")
+    index.close()
+
+
+# Executa o script
+if __name__ == "__main__":
+    main()
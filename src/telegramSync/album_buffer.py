@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Jun 27 14:08:55 2025.
+
+@author: vcsil
+"""
+import asyncio
+
+# Máximo de itens em um álbum do Telegram
+ALBUM_MAX_ITEMS = 10
+
+
+class AlbumBuffer:
+    """
+    Agrupa as mensagens de um álbum (`media_group_id`) que chegam soltas.
+
+    Cada mensagem reinicia a espera do seu álbum. Quando passam `delay`
+    segundos sem novos itens, ou o álbum chega a ALBUM_MAX_ITEMS, as
+    mensagens são entregues juntas, em ordem de ID, para `handler`.
+
+    Parameters
+    ----------
+    handler : TYPE
+        Corrotina que recebe a lista de mensagens do álbum.
+    delay : float, optional
+        Segundos de espera por novos itens. The default is 2.
+
+    """
+
+    def __init__(self, handler, delay: float = 2):
+        self.handler = handler
+        self.delay = delay
+        self._groups: dict[str, list] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def add(self, message) -> None:
+        """Adiciona uma mensagem ao seu álbum."""
+        group_id = message.media_group_id
+        group = self._groups.setdefault(group_id, [])
+        group.append(message)
+
+        timer = self._timers.pop(group_id, None)
+        if timer is not None:
+            timer.cancel()
+
+        if len(group) >= ALBUM_MAX_ITEMS:
+            self._flush(group_id)
+        else:
+            loop = asyncio.get_running_loop()
+            self._timers[group_id] = loop.call_later(self.delay, self._flush,
+                                                     group_id)
+
+    def _flush(self, group_id: str) -> None:
+        self._timers.pop(group_id, None)
+        messages = self._groups.pop(group_id, [])
+        if not messages:
+            return
+
+        messages.sort(key=lambda message: message.id)
+        task = asyncio.create_task(self.handler(messages))
+        # Mantém a referência até a tarefa terminar
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush_all(self) -> None:
+        """Entrega os álbuns pendentes e espera o processamento."""
+        for group_id in list(self._groups):
+            self._flush(group_id)
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jun 18 09:14:51 2025.
+
+@author: vcsil
+"""
+from pyrogram.file_id import FileId, FileType
+from pyrogram.session import Session, Auth
+from typing import Optional
+from pyrogram import raw
+from pathlib import Path
+import asyncio
+import os
+
+from telegramSync.rate_limiter import ShortDownload
+
+# Tamanho dos pedaços entregues por stream_media
+CHUNK_SIZE = 1024 * 1024
+
+
+class ParallelDownloader:
+    """
+    Baixa uma mídia em vários trechos simultâneos.
+
+    O arquivo é pré-alocado com o tamanho final e dividido em segmentos de
+    `segment_chunks` pedaços. Até `parts` segmentos do mesmo arquivo são
+    pedidos ao mesmo tempo, cada um gravado na sua posição. Um semáforo
+    global limita os pedidos somados de todos os downloads.
+
+    Os pedaços são pedidos com upload.GetFile por uma única sessão de
+    mídia por DC, aberta no primeiro uso e mantida até `close`. O
+    `stream_media` do Pyrogram abre (e autoriza, em outro DC) uma sessão
+    nova a cada chamada e só transmite um arquivo por vez; ele fica só
+    para os arquivos servidos por CDN. Segmentos que chegam menores que o
+    esperado levantam ShortDownload e são pedidos de novo pelo limitador.
+
+    Parameters
+    ----------
+    client : pyrogram.Client
+        Cliente conectado.
+    limiter : TelegramRateLimiter
+        Limitador de requisições ao Telegram.
+    log : TYPE
+        Chamável de log.
+    parts : int, optional
+        Segmentos simultâneos por arquivo. The default is 4.
+    max_connections : int, optional
+        Segmentos simultâneos somando todos os arquivos. The default is 8.
+    segment_chunks : int, optional
+        Pedaços de 1 MB por segmento. The default is 8.
+
+    """
+
+    def __init__(self, client, limiter, log, parts: int = 4,
+                 max_connections: int = 8, segment_chunks: int = 8):
+        self.client = client
+        self.limiter = limiter
+        self.log = log
+        self.parts = max(1, parts)
+        self.segment_chunks = max(1, segment_chunks)
+        self._connections = asyncio.Semaphore(max(1, max_connections))
+        self._sessions = {}
+        self._sessions_lock = asyncio.Lock()
+
+    async def _media_session(self, dc_id: int) -> Session:
+        """Retorna a sessão de mídia do DC, abrindo-a no primeiro uso."""
+        async with self._sessions_lock:
+            session = self._sessions.get(dc_id)
+            if session is not None:
+                return session
+
+            storage = self.client.storage
+            test_mode = await storage.test_mode()
+            home = dc_id == await storage.dc_id()
+            auth_key = (await storage.auth_key() if home else
+                        await Auth(self.client, dc_id, test_mode).create())
+            session = Session(self.client, dc_id, auth_key, test_mode,
+                              is_media=True)
+            await session.start()
+            try:
+                if not home:
+                    exported = await self.client.invoke(
+                        raw.functions.auth.ExportAuthorization(dc_id=dc_id))
+                    await session.invoke(
+                        raw.functions.auth.ImportAuthorization(
+                            id=exported.id, bytes=exported.bytes))
+            except BaseException:
+                await session.stop()
+                raise
+
+            self._sessions[dc_id] = session
+            return session
+
+    async def close(self) -> None:
+        """Fecha as sessões de mídia abertas."""
+        async with self._sessions_lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            await session.stop()
+
+    def segments(self, size: int) -> list[tuple[int, int, int]]:
+        """
+        Divide um arquivo em segmentos.
+
+        Returns
+        -------
+        list[tuple[int, int, int]]
+            Trios (primeiro pedaço, quantidade de pedaços, bytes esperados).
+
+        """
+        total_chunks = -(-size // CHUNK_SIZE)
+        segments = []
+        for first in range(0, total_chunks, self.segment_chunks):
+            count = min(self.segment_chunks, total_chunks - first)
+            expected = min(count * CHUNK_SIZE, size - first * CHUNK_SIZE)
+            segments.append((first, count, expected))
+
+        return segments
+
+    @staticmethod
+    def _location(file_id: FileId):
+        """Monta a localização do arquivo usada em upload.GetFile."""
+        if file_id.file_type == FileType.PHOTO:
+            return raw.types.InputPhotoFileLocation(
+                id=file_id.media_id, access_hash=file_id.access_hash,
+                file_reference=file_id.file_reference,
+                thumb_size=file_id.thumbnail_size)
+        return raw.types.InputDocumentFileLocation(
+            id=file_id.media_id, access_hash=file_id.access_hash,
+            file_reference=file_id.file_reference,
+            thumb_size=file_id.thumbnail_size)
+
+    async def _fetch_segment(self, message, fd: int, first: int,
+                             count: int, expected: int, name: str) -> int:
+        """Baixa um segmento e grava cada pedaço na sua posição."""
+        media = getattr(message, message.media.value)
+        file_id = FileId.decode(media.file_id)
+        session = await self._media_session(file_id.dc_id)
+        location = self._location(file_id)
+
+        written = 0
+        position = first * CHUNK_SIZE
+        for index in range(count):
+            # FloodWaits acima do limite do cliente chegam ao limitador
+            r = await session.invoke(
+                raw.functions.upload.GetFile(
+                    location=location, offset=position + written,
+                    limit=CHUNK_SIZE),
+                sleep_threshold=self.client.sleep_threshold)
+            if not isinstance(r, raw.types.upload.File):
+                # Arquivo servido por CDN: o Pyrogram trata o redirect
+                async for chunk in self.client.stream_media(
+                        message, limit=count - index, offset=first + index):
+                    os.pwrite(fd, chunk, position + written)
+                    written += len(chunk)
+                break
+
+            os.pwrite(fd, r.bytes, position + written)
+            written += len(r.bytes)
+            if len(r.bytes) < CHUNK_SIZE:
+                break
+
+        if written < expected:
+            raise ShortDownload(name, written, expected)
+        return written
+
+    async def download(self, message, file_path: Path, size: int,
+                       on_head=None,
+                       stop: Optional[asyncio.Event] = None) -> bool:
+        """
+        Baixa a mídia de uma mensagem para `file_path`.
+
+        Parameters
+        ----------
+        message : pyrogram.types.Message
+            Mensagem com a mídia.
+        file_path : Path
+            Arquivo de destino.
+        size : int
+            Tamanho da mídia em bytes.
+        on_head : TYPE, optional
+            Chamado quando o primeiro segmento termina. The default is None.
+        stop : Optional[asyncio.Event], optional
+            Quando definido, interrompe o download. The default is None.
+
+        Returns
+        -------
+        bool
+            True se o arquivo foi baixado por completo, False se foi
+            interrompido por `stop`.
+
+        Raises
+        ------
+        IOError
+            Se algum segmento não chegou com o tamanho esperado.
+
+        """
+        segments = self.segments(size)
+        queue = asyncio.Queue()
+        for index, segment in enumerate(segments):
+            queue.put_nowait((index, segment))
+
+        received = [0] * len(segments)
+
+        async def worker():
+            while not queue.empty():
+                if stop is not None and stop.is_set():
+                    return
+                index, (first, count, expected) = queue.get_nowait()
+                async with self._connections:
+                    received[index] = await self.limiter.call(
+                        "get_file", self._fetch_segment, message, fd,
+                        first, count, expected, file_path.name)
+                if index == 0 and on_head is not None:
+                    on_head()
+
+        with open(file_path, 'wb') as f:
+            # Pré-aloca o arquivo para gravar os segmentos fora de ordem
+            f.truncate(size)
+            fd = f.fileno()
+            workers = [asyncio.create_task(worker())
+                       for _ in range(min(self.parts, len(segments)))]
+            try:
+                await asyncio.gather(*workers)
+            except BaseException:
+                for task in workers:
+                    task.cancel()
+                raise
+
+        if stop is not None and stop.is_set():
+            return False
+
+        missing = [index for index, (_, _, expected) in enumerate(segments)
+                   if received[index] != expected]
+        if missing or file_path.stat().st_size != size:
+            raise IOError(f"Download incompleto de {file_path.name}: "
+                          f"segmentos {missing} com tamanho inesperado")
+
+        self.log.info(f"{file_path.name} baixado em {len(segments)} "
+                      f"segmentos ({size / 1e6:.1f} MB).", False)
+        return True
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Jun  2 10:12:31 2025.
+
+@author: vcsil
+"""
+from pyrogram.errors import FloodWait
+from collections import deque
+from pathlib import Path
+import asyncio
+import time
+
+# Pausa (s) após um download incompleto. O get_file do Pyrogram dorme
+# sozinho os FloodWait de até 30 s; os maiores interrompem o download.
+SHORT_DOWNLOAD_WAIT = 30
+
+
+class ShortDownload(IOError):
+    """
+    Download entregue incompleto pelo Pyrogram.
+
+    O get_file do Pyrogram trata sozinho os FloodWait curtos e, nos longos
+    ou em erros de rede, registra a exceção e encerra o download como se
+    tivesse terminado. Um arquivo menor que o esperado é o único sinal
+    que chega ao limitador, que o trata como um FloodWait de `value`
+    segundos e repete a chamada.
+
+    """
+
+    def __init__(self, name: str, received: int, expected: int,
+                 wait: float = SHORT_DOWNLOAD_WAIT):
+        super().__init__(f"Download incompleto de {name}: {received} de "
+                         f"{expected} bytes")
+        self.value = wait
+
+
+def check_download(file_path: Path, expected: int) -> None:
+    """Levanta ShortDownload se o arquivo ficou menor que `expected`."""
+    file_path = Path(file_path)
+    received = file_path.stat().st_size if file_path.exists() else 0
+    if expected and received < expected:
+        raise ShortDownload(file_path.name, received, expected)
+
+
+class TokenBucket:
+    """
+    Balde de fichas assíncrono para espaçar requisições.
+
+    Parameters
+    ----------
+    rate : float
+        Fichas repostas por segundo (requisições por segundo).
+    capacity : float
+        Quantidade máxima de fichas acumuladas (rajada permitida).
+
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        """Aguarda até existir ficha disponível e a consome."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Esvazia o balde e bloqueia novas fichas por `seconds`."""
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.blocked_until = max(self.blocked_until, self.updated + seconds)
+
+
+class TelegramRateLimiter:
+    """
+    Limitador compartilhado para as chamadas feitas ao Telegram.
+
+    Cada método (get_chat_history, download_media, get_chat...) tem seu
+    próprio balde, pois o Telegram aplica FloodWait por método. Quando um
+    FloodWait acontece, a taxa efetiva tolerada pelo servidor é estimada a
+    partir das chamadas feitas na última janela e o balde passa a operar
+    um pouco abaixo dela. Sem FloodWait, a taxa sobe aos poucos.
+
+    Só chegam aqui os FloodWait acima do sleep_threshold do cliente. Nos
+    downloads, que o Pyrogram nunca repassa, o sinal é um ShortDownload
+    levantado por quem confere o tamanho do arquivo.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    rate : float, optional
+        Taxa inicial em requisições por segundo. The default is 1.0.
+    burst : float, optional
+        Rajada máxima de requisições. The default is 5.
+    min_rate : float, optional
+        Taxa mínima permitida. The default is 0.05.
+    max_rate : float, optional
+        Taxa máxima permitida. The default is 5.0.
+    safety : float, optional
+        Fração da taxa aprendida que será usada. The default is 0.9.
+    increase : float, optional
+        Incremento aditivo da taxa a cada sucesso. The default is 0.01.
+    window : float, optional
+        Janela em segundos usada para estimar a taxa. The default is 60.
+    ceiling_ttl : float, optional
+        Segundos até esquecer o teto aprendido. The default is 3600.
+    max_retries : int, optional
+        Tentativas extras da mesma chamada após FloodWait. The default is 5.
+    on_flood : TYPE, optional
+        Chamável avisado de cada FloodWait com (método, segundos).
+        The default is None.
+
+    """
+
+    def __init__(self, log, rate: float = 1.0, burst: float = 5,
+                 min_rate: float = 0.05, max_rate: float = 5.0,
+                 safety: float = 0.9, increase: float = 0.01,
+                 window: float = 60, ceiling_ttl: float = 3600,
+                 max_retries: int = 5, on_flood=None):
+        self.log = log
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.safety = safety
+        self.increase = increase
+        self.window = window
+        self.ceiling_ttl = ceiling_ttl
+        self.max_retries = max_retries
+        self.on_flood = on_flood
+
+        self._buckets: dict[str, TokenBucket] = {}
+        self._history: dict[str, deque] = {}
+        # Teto aprendido por método: (taxa efetiva, instante do FloodWait)
+        self._ceilings: dict[str, tuple[float, float]] = {}
+
+    def _bucket(self, method: str) -> TokenBucket:
+        if method not in self._buckets:
+            self._buckets[method] = TokenBucket(self.rate, self.burst)
+            self._history[method] = deque()
+        return self._buckets[method]
+
+    def _calls_in_window(self, method: str) -> int:
+        history = self._history[method]
+        limit = time.monotonic() - self.window
+        while history and history[0] < limit:
+            history.popleft()
+        return len(history)
+
+    def _cap(self, method: str) -> float:
+        """Retorna a taxa máxima atual para o método."""
+        ceiling = self._ceilings.get(method)
+        if ceiling is None:
+            return self.max_rate
+
+        rate, when = ceiling
+        if time.monotonic() - when > self.ceiling_ttl:
+            # Teto antigo, volta a sondar taxas maiores
+            del self._ceilings[method]
+            return self.max_rate
+
+        return max(self.min_rate, self.safety * rate)
+
+    def _on_flood(self, method: str, wait: float,
+                  reason: str = "FloodWait") -> None:
+        bucket = self._bucket(method)
+
+        # O servidor aceitou `calls` chamadas na janela e exigiu `wait`
+        # segundos extras: a taxa tolerada é ~calls / (janela + wait)
+        calls = max(1, self._calls_in_window(method))
+        effective = calls / (self.window + wait)
+
+        self._ceilings[method] = (effective, time.monotonic())
+        bucket.rate = max(self.min_rate,
+                          min(bucket.rate, self.safety * effective))
+        bucket.pause(wait)
+
+        self.log.warning(
+            f"{reason} de {wait}s em {method}. "
+            f"Nova taxa: {bucket.rate:.3f} req/s.")
+
+        # Um download incompleto não diz quanto esperar: só o FloodWait
+        # real é repassado
+        if self.on_flood is not None and reason == "FloodWait":
+            self.on_flood(method, wait)
+
+    def _on_success(self, method: str) -> None:
+        bucket = self._bucket(method)
+        bucket.rate = min(self._cap(method), bucket.rate + self.increase)
+
+    async def call(self, method: str, func, *args, **kwargs):
+        """
+        Executa `func` respeitando a taxa do método.
+
+        Em caso de FloodWait (ou ShortDownload) apenas esta chamada é
+        repetida, depois de aguardar o tempo exigido pelo Telegram.
+
+        Parameters
+        ----------
+        method : str
+            Nome do método, usado para escolher o balde.
+        func : TYPE
+            Corrotina a ser executada.
+        *args, **kwargs
+            Argumentos repassados para `func`.
+
+        Returns
+        -------
+        TYPE
+            Resultado de `func`.
+
+        """
+        bucket = self._bucket(method)
+
+        for attempt in range(self.max_retries + 1):
+            await bucket.acquire()
+            self._history[method].append(time.monotonic())
+
+            try:
+                result = await func(*args, **kwargs)
+            except FloodWait as e:
+                self._on_flood(method, e.value)
+                if attempt == self.max_retries:
+                    raise
+                # O balde fica bloqueado pelo tempo exigido
+                continue
+            except ShortDownload as e:
+                self._on_flood(method, e.value, "Download incompleto")
+                if attempt == self.max_retries:
+                    raise
+                # O balde fica bloqueado pelo tempo exigido
+                continue
+
+            self._on_success(method)
+            return result
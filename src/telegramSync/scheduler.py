@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Jun 15 19:27:44 2025.
+
+@author: vcsil
+"""
+from contextlib import asynccontextmanager
+from collections import deque
+import statistics
+import asyncio
+import time
+
+from utils.profiling import record_wait
+
+# Classes de prioridade
+LIVE = "live"
+BACKFILL = "backfill"
+
+
+class _Stage:
+    """Vagas de uma etapa do processamento e suas filas de espera."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiters = {LIVE: deque(), BACKFILL: deque()}
+        # Classes das últimas vagas concedidas, para medir a fatia
+        self.grants = deque(maxlen=20)
+
+
+class PriorityScheduler:
+    """
+    Distribui as vagas de cada etapa entre mensagens novas e backfill.
+
+    Mensagens novas (LIVE) sempre passam à frente do backfill, exceto
+    quando a fatia do backfill nas últimas vagas concedidas fica abaixo
+    de `min_backfill_share`, para que o backfill nunca pare por completo.
+    O tempo de espera por etapa e a latência total são medidos por classe.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    capacities : dict[str, int]
+        Vagas simultâneas por etapa (ex.: download, ocr, upload).
+    min_backfill_share : float, optional
+        Fração mínima das vagas garantida ao backfill. The default is 0.1.
+    report_every : float, optional
+        Segundos entre relatórios de latência. The default is 300.
+
+    """
+
+    def __init__(self, log, capacities: dict[str, int],
+                 min_backfill_share: float = 0.1, report_every: float = 300):
+        self.log = log
+        self.min_backfill_share = min_backfill_share
+        self.report_every = report_every
+        self.stages = {name: _Stage(capacity)
+                       for name, capacity in capacities.items()}
+
+        # Amostras de espera por (etapa, classe) e de latência por classe
+        self.waits: dict[tuple[str, str], deque] = {}
+        self.latencies = {LIVE: deque(maxlen=1000),
+                          BACKFILL: deque(maxlen=1000)}
+        self._last_report = time.monotonic()
+
+    def _backfill_share(self, stage: _Stage) -> float:
+        if not stage.grants:
+            return 0.0
+        return stage.grants.count(BACKFILL) / len(stage.grants)
+
+    def _dispatch(self, stage: _Stage) -> None:
+        """Concede vagas livres aos próximos da fila."""
+        while stage.in_use < stage.capacity:
+            live = stage.waiters[LIVE]
+            backfill = stage.waiters[BACKFILL]
+            if not live and not backfill:
+                return
+
+            starved = self._backfill_share(stage) < self.min_backfill_share
+            if backfill and (not live or starved):
+                priority, queue = BACKFILL, backfill
+            else:
+                priority, queue = LIVE, live
+
+            future = queue.popleft()
+            if future.done():
+                continue  # Espera cancelada
+
+            stage.in_use += 1
+            stage.grants.append(priority)
+            future.set_result(None)
+
+    async def _acquire(self, name: str, priority: str) -> None:
+        stage = self.stages[name]
+        future = asyncio.get_running_loop().create_future()
+        stage.waiters[priority].append(future)
+        self._dispatch(stage)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A vaga foi concedida junto com o cancelamento
+                self._release(name)
+            raise
+
+    def _release(self, name: str) -> None:
+        stage = self.stages[name]
+        stage.in_use -= 1
+        self._dispatch(stage)
+
+    @asynccontextmanager
+    async def slot(self, name: str, priority: str = LIVE):
+        """
+        Ocupa uma vaga da etapa `name` durante o bloco.
+
+        Parameters
+        ----------
+        name : str
+            Nome da etapa.
+        priority : str, optional
+            LIVE ou BACKFILL. The default is LIVE.
+
+        """
+        started = time.monotonic()
+        await self._acquire(name, priority)
+        waited = time.monotonic() - started
+        self.waits.setdefault((name, priority), deque(maxlen=1000)).append(
+            waited)
+        record_wait(name, waited)
+
+        try:
+            yield
+        finally:
+            self._release(name)
+
+    def record_latency(self, priority: str, seconds: float) -> None:
+        """Registra a latência total de uma mensagem."""
+        self.latencies[priority].append(seconds)
+        if time.monotonic() - self._last_report > self.report_every:
+            self.report()
+
+    @staticmethod
+    def _summary(samples) -> str:
+        if not samples:
+            return "sem dados"
+
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return (f"p50 {statistics.median(ordered):.1f}s, "
+                f"p95 {p95:.1f}s, n={len(ordered)}")
+
+    def report(self) -> dict:
+        """
+        Registra no log e retorna as métricas de latência por classe.
+
+        Returns
+        -------
+        dict
+            Resumo de latência total e espera por etapa de cada classe.
+
+        """
+        self._last_report = time.monotonic()
+        summary = {}
+        for priority in (LIVE, BACKFILL):
+            total = self._summary(self.latencies[priority])
+            waits = {name: self._summary(self.waits.get((name, priority)))
+                     for name in self.stages}
+            summary[priority] = {"total": total, "waits": waits}
+
+            details = "; ".join(f"{name}: {text}"
+                                for name, text in waits.items())
+            self.log.info(f"Latência {priority}: {total} | espera {details}",
+                          False)
+
+        return summary
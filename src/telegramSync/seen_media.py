@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jun 17 11:20:35 2025.
+
+@author: vcsil
+"""
+from typing import Optional
+from pathlib import Path
+import threading
+import json
+import os
+
+
+class SeenMedia:
+    """
+    Registro das mídias já organizadas, pelo `file_unique_id` do Telegram.
+
+    O mesmo vídeo encaminhado em mensagens diferentes mantém o
+    `file_unique_id`, o que permite pular o download de duplicatas.
+
+    Parameters
+    ----------
+    path : Path
+        Arquivo JSON onde o registro é persistido.
+    save_every : int, optional
+        Alterações acumuladas antes de salvar no disco. The default is 20.
+
+    """
+
+    def __init__(self, path: Path, save_every: int = 20):
+        self.path = Path(path)
+        self.save_every = save_every
+        self._dirty = 0
+        self._lock = threading.Lock()
+
+        try:
+            with open(self.path, 'r') as f:
+                self.media = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.media = {}
+        self._paths = set(self.media.values())
+
+    def get(self, unique_id: str) -> Optional[str]:
+        """Retorna onde a mídia foi organizada, ou None se é nova."""
+        with self._lock:
+            return self.media.get(unique_id)
+
+    def has_path(self, path: Path) -> bool:
+        """Indica se alguma mídia já foi organizada em `path`."""
+        with self._lock:
+            return str(path) in self._paths
+
+    def add(self, unique_id: str, path: Path) -> None:
+        """Registra o destino de uma mídia organizada."""
+        with self._lock:
+            self.media[unique_id] = str(path)
+            self._paths.add(str(path))
+            self._dirty += 1
+            if self._dirty < self.save_every:
+                return
+        self.save()
+
+    def save(self) -> None:
+        """Salva o registro de forma atômica."""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(self.media, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = 0
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sun Jun 29 16:45:12 2025.
+
+@author: vcsil
+"""
+from collections import deque
+from typing import Optional
+from pathlib import Path
+import asyncio
+import json
+import time
+import os
+
+# Limite de mensagens por página do histórico (máx. do Telegram)
+PAGE_SIZE = 100
+
+
+class TelegramSession:
+    """
+    Uma conta do Telegram usada no download do histórico.
+
+    Parameters
+    ----------
+    name : str
+        Nome da sessão (arquivo .session em credentials/).
+    client : pyrogram.Client
+        Cliente da sessão.
+    limiter : TelegramRateLimiter
+        Limitador de requisições próprio da sessão.
+    downloader : ParallelDownloader, optional
+        Downloader em trechos da sessão. The default is None.
+
+    """
+
+    def __init__(self, name: str, client, limiter, downloader=None):
+        self.name = name
+        self.client = client
+        self.limiter = limiter
+        self.downloader = downloader
+        self.flooded_until = 0.0
+        self.stats = {"messages": 0, "ranges": 0, "floods": 0}
+
+    def flood_left(self) -> float:
+        """Segundos restantes do último FloodWait da sessão."""
+        return max(0.0, self.flooded_until - time.monotonic())
+
+
+class _Range:
+    """Faixa [lo, hi] de IDs; `cursor` é o menor ID já assumido."""
+
+    def __init__(self, lo: int, hi: int):
+        self.lo = lo
+        self.hi = hi
+        self.cursor = hi + 1
+
+
+class SessionPool:
+    """
+    Divide o download do histórico entre várias sessões do Telegram.
+
+    O intervalo de IDs é dividido em faixas de `range_size` IDs, pegas por
+    cada sessão livre, das mais recentes para as mais antigas. Quando uma
+    sessão recebe um FloodWait de pelo menos `handoff_after` segundos, a
+    parte da faixa que ela ainda não assumiu volta para o início da fila e
+    fica com outra sessão. Só chegam aqui os FloodWait das chamadas feitas
+    pelo limitador (histórico e downloads em segmentos); os downloads
+    comuns do Pyrogram os tratam internamente. O progresso de todas é
+    combinado no maior trecho contínuo concluído a partir de `max_id`.
+    Depois de `stop()` nenhuma faixa nova é entregue e só a parte já
+    tratada das faixas em andamento conta como concluída.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    sessions : list[TelegramSession]
+        Sessões disponíveis (todas membros do grupo).
+    range_size : int, optional
+        IDs por faixa. The default is 500.
+    handoff_after : float, optional
+        FloodWait mínimo (s) para repassar o trabalho. The default is 30.
+    status_path : Optional[Path], optional
+        JSON com o progresso, para monitoramento. The default is None.
+
+    """
+
+    def __init__(self, log, sessions: list[TelegramSession],
+                 range_size: int = 500, handoff_after: float = 30,
+                 status_path: Optional[Path] = None):
+        self.log = log
+        self.sessions = sessions
+        self.range_size = range_size
+        self.handoff_after = handoff_after
+        self.status_path = status_path
+
+        self._queue: deque[_Range] = deque()
+        self._current: dict[str, Optional[_Range]] = {}
+        self._done: list[list[int]] = []
+        self._busy = 0
+        self._bounds = (0, 0)
+        self._stopped = False
+
+        for session in sessions:
+            session.limiter.on_flood = (
+                lambda method, wait, session=session:
+                    self._on_flood(session, wait))
+
+    def _on_flood(self, session: TelegramSession, wait: float) -> None:
+        session.flooded_until = max(session.flooded_until,
+                                    time.monotonic() + wait)
+        session.stats["floods"] += 1
+        if wait < self.handoff_after:
+            return
+
+        work = self._current.get(session.name)
+        if work is None or work.cursor - 1 < work.lo:
+            return
+
+        # Repassa o que a sessão ainda não assumiu
+        self._queue.appendleft(_Range(work.lo, work.cursor - 1))
+        work.lo = work.cursor
+        self.log.info(f"Sessão {session.name} em FloodWait ({wait}s). "
+                      f"IDs até {work.cursor - 1} repassados.")
+
+    def stop(self) -> None:
+        """Para de entregar faixas e de processar novas mensagens."""
+        self._stopped = True
+
+    def _mark_done(self, lo: int, hi: int) -> None:
+        if lo > hi:
+            return
+
+        intervals = sorted(self._done + [[lo, hi]])
+        merged = [intervals[0]]
+        for start, end in intervals[1:]:
+            if start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._done = merged
+
+    def watermark(self) -> Optional[int]:
+        """Menor ID a partir do qual todo o intervalo até max_id acabou."""
+        _, max_id = self._bounds
+        for start, end in self._done:
+            if start <= max_id <= end:
+                return start
+        return None
+
+    def _report(self) -> None:
+        min_id, max_id = self._bounds
+        watermark = self.watermark()
+        done = sum(end - start + 1 for start, end in self._done)
+        total = max_id - min_id + 1
+        self.log.info(f"Histórico: {done / total:.0%} concluído; contínuo "
+                      f"até o ID {watermark if watermark else max_id + 1}.",
+                      False)
+
+        if self.status_path is None:
+            return
+
+        status = {
+            "min_id": min_id,
+            "max_id": max_id,
+            "watermark": watermark,
+            "done": self._done,
+            "pending": [[w.lo, w.hi] for w in self._queue],
+            "sessions": {s.name: s.stats for s in self.sessions},
+            "updated": time.time(),
+        }
+        try:
+            tmp_path = Path(self.status_path).with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, self.status_path)
+        except OSError as e:
+            self.log.warning(f"Falha ao salvar o progresso: {e}", False)
+
+    async def _page(self, session: TelegramSession, chat_id: int,
+                    offset_id: int) -> list:
+        return [message async for message in session.client.get_chat_history(
+            chat_id, limit=PAGE_SIZE, offset_id=offset_id)]
+
+    async def _run_range(self, session: TelegramSession, chat_id: int,
+                         work: _Range, process) -> bool:
+        """
+        Processa uma faixa, das mensagens mais novas para as antigas.
+
+        Retorna False se parou antes do fim; nesse caso só os IDs a partir
+        de `work.cursor` foram tratados.
+        """
+        offset_id = work.hi + 1
+        while True:
+            page = await session.limiter.call("get_chat_history", self._page,
+                                              session, chat_id, offset_id)
+            if not page:
+                return True
+
+            # Agrupa os itens de um mesmo álbum
+            groups = []
+            for message in page:
+                if message.id > work.hi:
+                    continue
+                if (groups and message.media_group_id and
+                        groups[-1][0].media_group_id ==
+                        message.media_group_id):
+                    groups[-1].append(message)
+                else:
+                    groups.append([message])
+
+            for group in groups:
+                # `lo` sobe quando o restante foi repassado
+                if max(m.id for m in group) < work.lo:
+                    return True
+                if self._stopped:
+                    return False
+                work.cursor = min(m.id for m in group)
+                if not await process(group, session):
+                    # O grupo recusado continua pendente
+                    work.cursor = max(m.id for m in group) + 1
+                    return False
+                session.stats["messages"] += len(group)
+
+            if page[-1].id <= work.lo:
+                return True
+            offset_id = page[-1].id
+
+    def _release(self, work: _Range) -> None:
+        """Conclui a parte tratada da faixa e devolve o restante à fila."""
+        self._mark_done(work.cursor, work.hi)
+        if work.cursor - 1 >= work.lo:
+            self._queue.appendleft(_Range(work.lo, work.cursor - 1))
+
+    async def _worker(self, session: TelegramSession, chat_id: int,
+                      process) -> None:
+        while (self._queue or self._busy) and not self._stopped:
+            wait = session.flood_left()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            if not self._queue:
+                await asyncio.sleep(1)
+                continue
+
+            work = self._queue.popleft()
+            self._current[session.name] = work
+            self._busy += 1
+            try:
+                if await self._run_range(session, chat_id, work, process):
+                    self._mark_done(work.lo, work.hi)
+                    session.stats["ranges"] += 1
+                else:
+                    self._release(work)
+            except Exception as e:
+                # Devolve o restante e tira a sessão do pool
+                self.log.error(f"Sessão {session.name} falhou: {e}")
+                self._release(work)
+                return
+            finally:
+                self._current[session.name] = None
+                self._busy -= 1
+
+            self._report()
+
+    async def backfill(self, chat_id: int, min_id: int, max_id: int,
+                       process) -> None:
+        """
+        Percorre o histórico entre `min_id` e `max_id` com todas as sessões.
+
+        Parameters
+        ----------
+        chat_id : int
+            Grupo de origem.
+        min_id : int
+            Menor ID processado.
+        max_id : int
+            Maior ID processado.
+        process : TYPE
+            Corrotina chamada com (mensagens, sessão); recebe uma mensagem
+            avulsa ou todos os itens de um álbum dentro da página e
+            retorna False se elas não foram tratadas, o que encerra a
+            faixa sem concluí-la.
+
+        """
+        self._bounds = (min_id, max_id)
+        self._done = []
+        self._queue = deque(
+            _Range(max(min_id, hi - self.range_size + 1), hi)
+            for hi in range(max_id, min_id - 1, -self.range_size))
+
+        names = ", ".join(s.name for s in self.sessions)
+        self.log.info(f"Histórico dividido em {len(self._queue)} faixas "
+                      f"entre as sessões: {names}.")
+
+        await asyncio.gather(*(self._worker(session, chat_id, process)
+                               for session in self.sessions))
+
+        if self._queue and self._stopped:
+            self.log.warning(f"Histórico interrompido; {len(self._queue)} "
+                             "faixas ficam pendentes.")
+        elif self._queue:
+            self.log.warning(f"{len(self._queue)} faixas não foram "
+                             "processadas: nenhuma sessão disponível.")
+        self._report()
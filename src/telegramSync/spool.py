@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jun 12 08:54:13 2025.
+
+@author: vcsil
+"""
+from pathlib import Path
+from typing import Optional
+import asyncio
+import json
+import time
+import os
+
+
+def dir_usage(root: Path, skip: frozenset = frozenset()
+              ) -> tuple[int, int]:
+    """Retorna (bytes, arquivos) ocupados sob `root`, exceto `skip`."""
+    total_bytes = total_files = 0
+    stack = [os.path.abspath(root)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        # O Pyrogram baixa em "<arquivo>.temp"
+                        if (entry.path in skip or
+                                entry.path.removesuffix(".temp") in skip):
+                            continue
+                        total_bytes += entry.stat().st_size
+                        total_files += 1
+        except OSError:
+            continue
+
+    return total_bytes, total_files
+
+
+class SpoolBudget:
+    """
+    Limita o espaço local ocupado por mídias que ainda não foram enviadas.
+
+    O uso é a soma das pastas de download e de destino mais os downloads
+    em andamento; os arquivos desses downloads ficam fora da varredura
+    (que roda em uma thread) para não serem contados duas vezes. Quando
+    o limite é atingido, novos downloads esperam.
+    Vídeos param antes (em `video_share` do limite) para que fotos, mais
+    leves, continuem passando. Para evitar oscilação, quem pausou só
+    volta quando o uso cai abaixo de `resume_at` do seu limite.
+
+    Parameters
+    ----------
+    roots : list[Path]
+        Pastas que compõem o spool local.
+    log : TYPE
+        Chamável de log.
+    max_bytes : int, optional
+        Limite em bytes (0 = sem limite). The default is 0.
+    max_files : int, optional
+        Limite em arquivos (0 = sem limite). The default is 0.
+    video_share : float, optional
+        Fração do limite disponível para vídeos. The default is 0.8.
+    resume_at : float, optional
+        Fração do limite abaixo da qual os downloads voltam.
+        The default is 0.9.
+    status_path : Optional[Path], optional
+        Arquivo JSON com o uso atual, para monitoramento.
+        The default is None.
+    drain : TYPE, optional
+        Corrotina chamada enquanto os downloads estão pausados, para
+        tentar esvaziar o spool. The default is None.
+    refresh : float, optional
+        Segundos entre varreduras do disco. The default is 5.
+
+    """
+
+    def __init__(self, roots: list[Path], log, max_bytes: int = 0,
+                 max_files: int = 0, video_share: float = 0.8,
+                 resume_at: float = 0.9, status_path: Optional[Path] = None,
+                 drain=None, refresh: float = 5):
+        self.roots = [Path(root) for root in roots]
+        self.log = log
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.video_share = video_share
+        self.resume_at = resume_at
+        self.status_path = status_path
+        self.drain = drain
+        self.refresh = refresh
+
+        self.reserved_bytes = 0
+        self.reserved_files = 0
+        self.paused = {"photo": False, "video": False}
+        self._inflight = set()
+        self._scanned = (0, 0)
+        self._scanned_at = float("-inf")
+        self._scan_lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Indica se existe algum limite configurado."""
+        return bool(self.max_bytes or self.max_files)
+
+    def _scan(self, skip: frozenset) -> tuple[int, int]:
+        disk_bytes = disk_files = 0
+        for root in self.roots:
+            used_bytes, used_files = dir_usage(root, skip)
+            disk_bytes += used_bytes
+            disk_files += used_files
+        return disk_bytes, disk_files
+
+    async def rescan(self, force: bool = False) -> None:
+        """
+        Varre o disco de novo, fora do loop de eventos.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Ignora a varredura em cache. The default is False.
+
+        """
+        async with self._scan_lock:
+            if (not force and
+                    time.monotonic() - self._scanned_at <= self.refresh):
+                return
+            started = time.monotonic()
+            self._scanned = await asyncio.to_thread(
+                self._scan, frozenset(self._inflight))
+            self._scanned_at = started
+            self._write_status()
+
+    def usage(self) -> dict:
+        """
+        Retorna o uso do spool segundo a última varredura.
+
+        Returns
+        -------
+        dict
+            Bytes e arquivos em disco, reservados e os limites.
+
+        """
+        return {
+            "bytes": self._scanned[0] + self.reserved_bytes,
+            "files": self._scanned[1] + self.reserved_files,
+            "reserved_bytes": self.reserved_bytes,
+            "reserved_files": self.reserved_files,
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+            "paused": dict(self.paused),
+        }
+
+    def _write_status(self) -> None:
+        if self.status_path is None:
+            return
+
+        status = {
+            "bytes": self._scanned[0] + self.reserved_bytes,
+            "files": self._scanned[1] + self.reserved_files,
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+            "paused": self.paused,
+            "updated": time.time(),
+        }
+        try:
+            tmp_path = Path(self.status_path).with_suffix(".tmp")
+            with open(tmp_path, 'w') as f:
+                json.dump(status, f)
+            os.replace(tmp_path, self.status_path)
+        except OSError as e:
+            self.log.warning(f"Falha ao salvar o uso do spool: {e}", False)
+
+    def _fits(self, kind: str, size: int) -> bool:
+        share = self.video_share if kind == "video" else 1.0
+        if self.paused[kind]:
+            share *= self.resume_at
+
+        usage = self.usage()
+        if usage["files"] == 0:
+            return True  # Arquivo maior que o limite, com o spool vazio
+        if self.max_bytes and usage["bytes"] + size > self.max_bytes * share:
+            return False
+        if self.max_files and usage["files"] + 1 > self.max_files * share:
+            return False
+        return True
+
+    async def acquire(self, kind: str, size: int,
+                      path: Optional[Path] = None,
+                      interval: float = 10) -> None:
+        """
+        Espera haver espaço no spool e reserva `size` bytes.
+
+        Parameters
+        ----------
+        kind : str
+            "photo" ou "video".
+        size : int
+            Tamanho esperado do arquivo em bytes.
+        path : Optional[Path], optional
+            Arquivo do download, que a varredura ignora enquanto ele
+            está reservado. The default is None.
+        interval : float, optional
+            Segundos entre novas verificações. The default is 10.
+
+        """
+        if not self.enabled:
+            return
+
+        await self.rescan()
+        while not self._fits(kind, size):
+            if not self.paused[kind]:
+                self.paused[kind] = True
+                usage = self.usage()
+                self.log.warning(
+                    f"Spool cheio ({usage['bytes'] / 1e6:.0f} MB, "
+                    f"{usage['files']} arquivos). Pausando downloads de "
+                    f"{kind}.")
+                self._write_status()
+
+            if self.drain is not None:
+                await self.drain()
+
+            await asyncio.sleep(interval)
+            await self.rescan(force=True)
+
+        if self.paused[kind]:
+            self.paused[kind] = False
+            self.log.info(f"Spool liberado. Retomando downloads de {kind}.")
+            self._write_status()
+
+        self.reserved_bytes += size
+        self.reserved_files += 1
+        if path is not None:
+            self._inflight.add(os.path.abspath(path))
+
+    def release(self, size: int, path: Optional[Path] = None) -> None:
+        """Libera a reserva de um download concluído (ou que falhou)."""
+        if not self.enabled:
+            return
+
+        self.reserved_bytes -= size
+        self.reserved_files -= 1
+        if path is not None:
+            self._inflight.discard(os.path.abspath(path))
+        # O arquivo baixado passa a ser contado pela varredura
+        self._scanned_at = float("-inf")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jul  3 10:27:44 2025.
+
+@author: vcsil
+"""
+from pathlib import Path
+import json
+import os
+
+
+class UnfinishedMessages:
+    """
+    IDs das mensagens que ficaram sem processar em um reinício.
+
+    Ao encerrar, as mensagens ainda em andamento e as recusadas durante a
+    finalização são gravadas; na próxima execução elas são buscadas de
+    novo e processadas.
+
+    Parameters
+    ----------
+    path : Path
+        Arquivo JSON com a lista de IDs.
+
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def take(self) -> list[int]:
+        """Retorna os IDs gravados e apaga o arquivo."""
+        try:
+            with open(self.path, 'r') as f:
+                ids = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+        self.path.unlink(missing_ok=True)
+        return sorted(set(ids))
+
+    def save(self, ids) -> None:
+        """Grava os IDs de forma atômica (nada é gravado sem IDs)."""
+        ids = sorted(set(ids))
+        if not ids:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(ids, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Jun 17 10:42:08 2025.
+
+@author: vcsil
+"""
+from typing import Optional
+import struct
+
+
+def moov_before_mdat(head: bytes) -> Optional[bool]:
+    """
+    Verifica se o índice (moov) de um MP4 vem antes dos dados (mdat).
+
+    Percorre as caixas de primeiro nível do início do arquivo. Só com o
+    moov na frente o ffmpeg consegue decodificar o primeiro quadro a partir
+    de um arquivo incompleto.
+
+    Parameters
+    ----------
+    head : bytes
+        Primeiros bytes do arquivo.
+
+    Returns
+    -------
+    Optional[bool]
+        True se o moov aparece primeiro, False se o mdat aparece primeiro e
+        None se não foi possível decidir com os bytes disponíveis.
+
+    """
+    offset = 0
+    while offset + 8 <= len(head):
+        size, box_type = struct.unpack(">I4s", head[offset:offset + 8])
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+
+        if size == 1:
+            # Tamanho de 64 bits logo após o tipo
+            if offset + 16 > len(head):
+                return None
+            size = struct.unpack(">Q", head[offset + 8:offset + 16])[0]
+        elif size == 0:
+            return None  # Caixa vai até o fim do arquivo
+
+        if size < 8:
+            return None  # Arquivo não é um MP4 válido
+        offset += size
+
+    return None
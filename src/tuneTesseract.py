@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jun  7 14:48:09 2025.
+
+Ajuste automático da configuração do tesseract.
+
+Roda um corpus rotulado por várias configurações candidatas, mede a
+latência e a taxa de acerto de cada uma e grava no perfil a mais rápida
+que atinge a taxa de acerto desejada.
+
+O corpus deve ser rotulado à mão (--labels). Com --from-tree, o rótulo
+de cada arquivo é a pasta onde a configuração anterior o colocou, então
+o "acerto" medido é a concordância com essa configuração, não a
+precisão real.
+
+@author: vcsil
+"""
+from itertools import product
+from pathlib import Path
+import argparse
+import random
+import json
+import time
+
+from organizeGroups import (BASE_DESTINATION_DIR, TESS_PROFILE_PATH,
+                            load_media, process_image)
+from ocr.tess_profile import DEFAULT_PROFILE, DOMAIN_WHITELIST, save_profile
+from utils.utils import BUILD_ABSPATH, iter_media_files
+from utils.logger_setup import SetupLogger
+
+# Valores testados para cada parâmetro
+CANDIDATE_PSM = [6, 7, 11]
+CANDIDATE_OEM = [1, 3]
+CANDIDATE_WHITELIST = [None, DOMAIN_WHITELIST]
+CANDIDATE_TEXT_HEIGHT = [24, 32, 40]
+
+
+def load_corpus(corpus_dir: Path, labels_path: Path = None,
+                limit: int = 200) -> list[tuple[Path, set]]:
+    """
+    Monta o corpus rotulado.
+
+    Sem arquivo de rótulos, usa a própria árvore organizada
+    (mês/domínio/arquivo): o nome da pasta é o domínio esperado e os
+    arquivos de "others" esperam nenhuma URL. Esses rótulos vêm da
+    configuração anterior do OCR, então medem concordância com ela.
+
+    Parameters
+    ----------
+    corpus_dir : Path
+        Diretório com as mídias.
+    labels_path : Path, optional
+        JSON {"caminho relativo": ["dominio", ...]}; lista vazia para
+        mídias sem URL. The default is None.
+    limit : int, optional
+        Quantidade máxima de amostras. The default is 200.
+
+    Returns
+    -------
+    list[tuple[Path, set]]
+        Pares (arquivo, domínios esperados em minúsculas).
+
+    """
+    if labels_path is not None:
+        with open(labels_path, 'r') as f:
+            labels = json.load(f)
+        corpus = [(corpus_dir / name, {d.lower() for d in domains})
+                  for name, domains in labels.items()]
+    else:
+        corpus = []
+        for path in iter_media_files(corpus_dir):
+            if "others" in path.relative_to(corpus_dir).parts:
+                corpus.append((path, set()))
+            else:
+                corpus.append((path, {path.parent.name.lower()}))
+
+    # Amostra fixa para que as execuções sejam comparáveis
+    random.Random(0).shuffle(corpus)
+    return corpus[:limit]
+
+
+def evaluate(images: list, profile: dict, log) -> dict:
+    """
+    Mede latência e taxa de acerto de um perfil no corpus.
+
+    Uma amostra sem domínio esperado acerta quando nenhuma URL é achada.
+
+    """
+    hits = 0
+    start = time.perf_counter()
+    for image, expected in images:
+        matches = {m.lower() for m in process_image(
+            image, log, profile=profile, use_cache=False) or []}
+        if (expected & matches) if expected else not matches:
+            hits += 1
+    elapsed = time.perf_counter() - start
+
+    return {"recall": hits / len(images),
+            "latency": elapsed / len(images)}
+
+
+def main():
+    """Procura a configuração mais rápida com a taxa de acerto desejada."""
+    parser = argparse.ArgumentParser(
+        description="Ajusta a configuração do tesseract com um corpus.")
+    parser.add_argument("--corpus", type=Path, default=BASE_DESTINATION_DIR,
+                        help="Diretório com as mídias rotuladas.")
+    parser.add_argument("--labels", type=Path, default=None,
+                        help="JSON com os domínios esperados por arquivo, "
+                             "rotulado à mão.")
+    parser.add_argument("--from-tree", action="store_true",
+                        help="Sem --labels, usa as pastas de --corpus como "
+                             "rótulos. Mede a concordância com a "
+                             "configuração que organizou os arquivos, não "
+                             "a precisão.")
+    parser.add_argument("--limit", type=int, default=200,
+                        help="Quantidade máxima de amostras.")
+    parser.add_argument("--recall", type=float, default=0.95,
+                        help="Taxa de acerto mínima aceita.")
+    parser.add_argument("--output", type=Path, default=TESS_PROFILE_PATH,
+                        help="Arquivo de perfil a ser gravado.")
+    args = parser.parse_args()
+    if args.labels is None and not args.from_tree:
+        parser.error("informe --labels (recomendado) ou --from-tree")
+
+    log = SetupLogger(BUILD_ABSPATH(__file__, "../logs/log-tune.txt"),
+                      "tune")
+
+    # Decodifica o corpus uma única vez
+    images = []
+    for path, expected in load_corpus(args.corpus, args.labels, args.limit):
+        image = load_media(path, log)
+        if image is not None and image is not False:
+            images.append((image, expected))
+
+    if not images:
+        log.error("Nenhuma amostra encontrada no corpus.")
+        return
+
+    log.info(f"{len(images)} amostras carregadas.")
+
+    results = []
+    for psm, oem, whitelist, height in product(CANDIDATE_PSM, CANDIDATE_OEM,
+                                               CANDIDATE_WHITELIST,
+                                               CANDIDATE_TEXT_HEIGHT):
+        profile = {**DEFAULT_PROFILE, "psm": psm, "oem": oem,
+                   "whitelist": whitelist, "text_height": height}
+        try:
+            stats = evaluate(images, profile, log)
+        except Exception as e:
+            # Ex.: oem sem o traineddata correspondente instalado
+            log.warning(f"Configuração {profile} falhou: {e}")
+            continue
+
+        log.info(f"psm={psm} oem={oem} whitelist={bool(whitelist)} "
+                 f"text_height={height}: acerto {stats['recall']:.1%}, "
+                 f"{stats['latency'] * 1000:.0f} ms/img")
+        results.append((profile, stats))
+
+    if not results:
+        log.error("Nenhuma configuração pôde ser avaliada.")
+        return
+
+    accepted = [r for r in results if r[1]["recall"] >= args.recall]
+    if accepted:
+        profile, stats = min(accepted, key=lambda r: r[1]["latency"])
+    else:
+        log.warning(f"Nenhuma configuração atingiu {args.recall:.0%}. "
+                    "Usando a de maior acerto.")
+        profile, stats = max(results, key=lambda r: (r[1]["recall"],
+                                                     -r[1]["latency"]))
+
+    save_profile(args.output, {**profile, **stats,
+                               "samples": len(images)})
+    log.info(f"Perfil salvo em {args.output}: {profile} "
+             f"({stats['recall']:.1%}, {stats['latency'] * 1000:.0f} ms/img)")
+
+
+if __name__ == "__main__":
+    main()
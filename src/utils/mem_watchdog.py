@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Jun 19 20:03:17 2025.
+
+@author: vcsil
+"""
+from typing import Optional
+import tracemalloc
+import resource
+import asyncio
+import os
+
+# Arquivos ignorados nos relatórios (o próprio rastreamento)
+_IGNORED = (tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"))
+
+
+def rss_bytes() -> int:
+    """Retorna a memória residente atual do processo em bytes."""
+    try:
+        with open("/proc/self/statm", 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # Sem /proc: usa o pico, em KB no Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class MemoryWatchdog:
+    """
+    Acompanha o uso de memória de um processo de longa duração.
+
+    A cada `interval` segundos registra a memória residente e, com o
+    tracemalloc, os pontos do código que mais alocam e o que mais cresceu
+    desde a amostra anterior. Quando a memória passa de `ceiling`, chama
+    `on_ceiling` uma única vez e encerra o acompanhamento.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    interval : float, optional
+        Segundos entre amostras. The default is 60.
+    ceiling : int, optional
+        Limite de memória residente em bytes (0 = sem limite).
+        The default is 0.
+    top : int, optional
+        Pontos de alocação listados em cada relatório. The default is 10.
+    frames : int, optional
+        Quadros guardados por alocação no tracemalloc. The default is 1.
+    on_ceiling : TYPE, optional
+        Corrotina chamada ao atingir o limite. The default is None.
+
+    """
+
+    def __init__(self, log, interval: float = 60, ceiling: int = 0,
+                 top: int = 10, frames: int = 1, on_ceiling=None):
+        self.log = log
+        self.interval = interval
+        self.ceiling = ceiling
+        self.top = top
+        self.frames = frames
+        self.on_ceiling = on_ceiling
+        self._previous: Optional[tracemalloc.Snapshot] = None
+
+    def sample(self) -> int:
+        """
+        Registra uma amostra de memória.
+
+        Returns
+        -------
+        int
+            Memória residente em bytes.
+
+        """
+        rss = rss_bytes()
+        traced, peak = tracemalloc.get_traced_memory()
+        self.log.info(f"Memória: RSS {rss / 1e6:.0f} MB, rastreada "
+                      f"{traced / 1e6:.0f} MB (pico {peak / 1e6:.0f} MB)",
+                      False)
+
+        if not self.top or not tracemalloc.is_tracing():
+            return rss
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        for stat in snapshot.statistics("lineno")[:self.top]:
+            self.log.info(f"  alocação: {stat}", False)
+
+        if self._previous is not None:
+            diff = snapshot.compare_to(self._previous, "lineno")
+            for stat in diff[:self.top]:
+                if stat.size_diff <= 0:
+                    break
+                self.log.info(f"  crescimento: {stat}", False)
+
+        self._previous = snapshot
+        return rss
+
+    async def run(self) -> None:
+        """Amostra a memória periodicamente até atingir o limite."""
+        if self.top and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+        limit = (f"{self.ceiling / 1e6:.0f} MB" if self.ceiling
+                 else "sem limite")
+        self.log.info(f"Monitor de memória ativo (a cada {self.interval}s, "
+                      f"{limit}).")
+        while True:
+            await asyncio.sleep(self.interval)
+            rss = await asyncio.to_thread(self.sample)
+
+            if self.ceiling and rss > self.ceiling:
+                self.log.warning(
+                    f"Memória ({rss / 1e6:.0f} MB) acima do limite de "
+                    f"{self.ceiling / 1e6:.0f} MB.")
+                if self.on_ceiling is not None:
+                    await self.on_ceiling()
+                return
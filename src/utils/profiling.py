@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Jun 21 15:36:09 2025.
+
+@author: vcsil
+"""
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from pathlib import Path
+import threading
+import random
+import time
+import sys
+import os
+
+# Módulos onde uma thread fica parada esperando (amostras ignoradas)
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py")
+# Esperas que contam como trabalho (ex.: tesseract e ffmpeg)
+_BUSY_FILES = ("subprocess.py",)
+
+# Esperas por vaga (segundos por etapa) da mensagem medida no contexto
+_WAITS: ContextVar[Optional[dict]] = ContextVar("profile_waits",
+                                                default=None)
+
+
+def is_idle(frame) -> bool:
+    """Indica se a pilha é de uma thread parada em uma espera."""
+    if os.path.basename(frame.f_code.co_filename) not in _IDLE_FILES:
+        return False
+
+    while frame is not None:
+        if os.path.basename(frame.f_code.co_filename) in _BUSY_FILES:
+            return False
+        frame = frame.f_back
+
+    return True
+
+
+def record_wait(stage: str, seconds: float) -> None:
+    """Soma uma espera por vaga à mensagem medida no contexto atual."""
+    waits = _WAITS.get()
+    if waits is not None:
+        waits[stage] = waits.get(stage, 0) + seconds
+
+
+def fold_stack(frame, thread_name: str) -> str:
+    """Converte a pilha de um quadro para o formato "folded"."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}"
+                     f":{frame.f_lineno})")
+        frame = frame.f_back
+
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class MessageProfiler:
+    """
+    Amostrador de pilhas para medir onde o tempo de cada mensagem é gasto.
+
+    Uma thread captura as pilhas de todas as threads a cada `interval`
+    segundos enquanto houver mensagens sendo medidas. Threads paradas em
+    esperas (filas, locks, o seletor do asyncio) são ignoradas, exceto
+    quando aguardam um subprocesso. Mensagens mais lentas que `threshold`,
+    e uma fração `sample_rate` das demais, têm as pilhas salvas no formato
+    "folded" (flamegraph.pl, speedscope).
+
+    Esperas assíncronas (rede, sleeps, filas do asyncio) não aparecem nas
+    amostras: durante elas o loop está parado no seletor. Por isso o
+    registro de uma mensagem lenta é salvo mesmo sem amostras, com o
+    tempo total no nome e as esperas por vaga do escalonador (ver
+    `record_wait`) como pilhas "espera;<etapa>".
+    Como as pilhas são de todo o processo, mensagens processadas ao mesmo
+    tempo aparecem umas nos registros das outras.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    out_dir : Path
+        Pasta onde os registros são salvos.
+    enabled : bool, optional
+        Liga as medições. The default is False.
+    threshold : float, optional
+        Segundos a partir dos quais a mensagem é salva. The default is 10.
+    sample_rate : float, optional
+        Fração das mensagens rápidas salvas mesmo assim. The default is 0.
+    interval : float, optional
+        Segundos entre amostras. The default is 0.005.
+
+    """
+
+    def __init__(self, log, out_dir: Path, enabled: bool = False,
+                 threshold: float = 10, sample_rate: float = 0,
+                 interval: float = 0.005):
+        self.log = log
+        self.out_dir = Path(out_dir)
+        self.enabled = enabled
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.interval = interval
+
+        self._active: list[Counter] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> list[str]:
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            if is_idle(frame):
+                continue
+            stacks.append(fold_stack(frame, names.get(ident, str(ident))))
+
+        return stacks
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            stacks = self._sample()
+            with self._lock:
+                for counts in self._active:
+                    counts.update(stacks)
+                if not self._active:
+                    self._wake.clear()
+
+    def _start(self) -> Counter:
+        counts = Counter()
+        with self._lock:
+            self._active.append(counts)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop,
+                                                name="profiler", daemon=True)
+                self._thread.start()
+            self._wake.set()
+
+        return counts
+
+    def _stop(self, counts: Counter) -> None:
+        with self._lock:
+            self._active.remove(counts)
+
+    def _save(self, counts: Counter, elapsed: float, tags: dict,
+              waits: dict) -> Path:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        label = "-".join(f"{key}{value}" for key, value in tags.items())
+        path = self.out_dir / f"{stamp}-{label}-{elapsed:.1f}s.folded"
+        with open(path, 'w') as f:
+            # Esperas em amostras equivalentes, para a mesma escala
+            for stage, seconds in waits.items():
+                samples = round(seconds / self.interval)
+                if samples:
+                    f.write(f"espera;{stage} {samples}\n")
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+        return path
+
+    @asynccontextmanager
+    async def profile(self, **tags):
+        """
+        Mede o bloco e salva as pilhas se ele for lento ou sorteado.
+
+        Parameters
+        ----------
+        **tags : TYPE
+            Identificação do registro (ex.: msg, media, size). O dicionário
+            é entregue ao bloco, que pode completá-lo.
+
+        """
+        if not self.enabled:
+            yield tags
+            return
+
+        counts = self._start()
+        waits = {}
+        token = _WAITS.set(waits)
+        started = time.monotonic()
+        try:
+            yield tags
+        finally:
+            _WAITS.reset(token)
+            self._stop(counts)
+            elapsed = time.monotonic() - started
+            slow = elapsed >= self.threshold
+            if slow or (counts and random.random() < self.sample_rate):
+                try:
+                    path = self._save(counts, elapsed, tags, waits)
+                    self.log.info(f"Perfil de {elapsed:.1f}s (esperando "
+                                  f"vagas por {sum(waits.values()):.1f}s) "
+                                  f"salvo em {path}", slow)
+                except OSError as e:
+                    self.log.warning(f"Falha ao salvar o perfil: {e}", False)
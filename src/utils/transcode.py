@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Jun 25 10:17:26 2025.
+
+@author: vcsil
+"""
+from pathlib import Path
+import subprocess
+import threading
+import tempfile
+import os
+
+from utils.utils import IMAGE_SUFFIXES, VIDEO_SUFFIXES
+
+# Parâmetros do ffmpeg para cada preset de vídeo
+VIDEO_PRESETS = {
+    # Só reorganiza o contêiner (moov na frente), sem perda
+    "remux": ["-c", "copy"],
+    "h264": ["-c:v", "libx264", "-preset", "veryfast", "-crf", "28",
+             "-c:a", "aac", "-b:a", "96k"],
+    "h265": ["-c:v", "libx265", "-preset", "fast", "-crf", "30",
+             "-tag:v", "hvc1", "-c:a", "aac", "-b:a", "96k"],
+}
+
+# Formatos de foto aceitos e sua extensão
+PHOTO_FORMATS = {"webp": ".webp", "jpeg": ".jpg"}
+
+
+class Transcoder:
+    """
+    Recodifica mídias antes do upload para reduzir os bytes enviados.
+
+    Fotos são recodificadas para WebP ou JPEG otimizado e vídeos passam
+    pelo ffmpeg com um dos presets de VIDEO_PRESETS. O resultado só
+    substitui o original se economizar pelo menos `min_saving`; arquivos
+    maiores que `max_size` ou que passem de `timeout` segundos ficam como
+    estão.
+
+    Parameters
+    ----------
+    log : TYPE
+        Chamável de log.
+    photo_format : str, optional
+        "webp", "jpeg" ou vazio para não mexer nas fotos.
+        The default is "webp".
+    photo_quality : int, optional
+        Qualidade das fotos (0 a 100). The default is 80.
+    video_preset : str, optional
+        Chave de VIDEO_PRESETS ou vazio para não mexer nos vídeos.
+        The default is "h264".
+    min_saving : float, optional
+        Economia mínima (fração do original). The default is 0.1.
+    max_size : int, optional
+        Tamanho máximo do original em bytes (0 = sem limite).
+        The default is 0.
+    timeout : float, optional
+        Segundos máximos por arquivo. The default is 120.
+
+    """
+
+    def __init__(self, log, photo_format: str = "webp",
+                 photo_quality: int = 80, video_preset: str = "h264",
+                 min_saving: float = 0.1, max_size: int = 0,
+                 timeout: float = 120):
+        if photo_format and photo_format not in PHOTO_FORMATS:
+            raise ValueError(f"Formato de foto desconhecido: {photo_format}")
+        if video_preset and video_preset not in VIDEO_PRESETS:
+            raise ValueError(f"Preset de vídeo desconhecido: {video_preset}")
+
+        self.log = log
+        self.photo_format = photo_format
+        self.photo_quality = photo_quality
+        self.video_preset = video_preset
+        self.min_saving = min_saving
+        self.max_size = max_size
+        self.timeout = timeout
+
+        self.stats = {"files": 0, "transcoded": 0, "bytes_in": 0,
+                      "bytes_out": 0}
+        self._lock = threading.Lock()
+
+    def _encode_photo(self, src: Path, dst: Path) -> None:
+        import cv2
+
+        image = cv2.imread(str(src))
+        if image is None:
+            raise ValueError("imagem ilegível")
+
+        if self.photo_format == "webp":
+            params = [cv2.IMWRITE_WEBP_QUALITY, self.photo_quality]
+        else:
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.photo_quality,
+                      cv2.IMWRITE_JPEG_OPTIMIZE, 1,
+                      cv2.IMWRITE_JPEG_PROGRESSIVE, 1]
+
+        ok, data = cv2.imencode(PHOTO_FORMATS[self.photo_format], image,
+                                params)
+        if not ok:
+            raise ValueError("falha na codificação")
+        dst.write_bytes(data.tobytes())
+
+    def _encode_video(self, src: Path, dst: Path) -> None:
+        command = ["ffmpeg", "-v", "error", "-y", "-i", str(src),
+                   *VIDEO_PRESETS[self.video_preset],
+                   "-movflags", "+faststart", "-f", "mp4", str(dst)]
+        subprocess.run(command, capture_output=True, check=True,
+                       timeout=self.timeout)
+
+    def _plan(self, path: Path):
+        """Retorna (codificador, nova extensão) ou None se não se aplica."""
+        suffix = path.suffix.lower()
+        # Fotos já no formato de saída não são recodificadas de novo
+        if (self.photo_format and suffix in IMAGE_SUFFIXES
+                and suffix not in (".gif", PHOTO_FORMATS[self.photo_format])):
+            return self._encode_photo, PHOTO_FORMATS[self.photo_format]
+        if self.video_preset and suffix in VIDEO_SUFFIXES:
+            return self._encode_video, ".mp4"
+        return None
+
+    def _record(self, size_in: int, size_out: int, replaced: bool) -> None:
+        with self._lock:
+            self.stats["files"] += 1
+            self.stats["transcoded"] += int(replaced)
+            self.stats["bytes_in"] += size_in
+            self.stats["bytes_out"] += size_out
+
+    def transcode(self, path: Path) -> Path:
+        """
+        Recodifica um arquivo, substituindo-o se valer a pena.
+
+        Parameters
+        ----------
+        path : Path
+            Arquivo já organizado.
+
+        Returns
+        -------
+        Path
+            Arquivo a ser enviado (o novo ou o original).
+
+        """
+        path = Path(path)
+        plan = self._plan(path)
+        size_in = path.stat().st_size
+        if plan is None or (self.max_size and size_in > self.max_size):
+            self._record(size_in, size_in, False)
+            return path
+
+        encode, suffix = plan
+        # Temporário sem extensão de mídia, ignorado pelo observador
+        fd, tmp_name = tempfile.mkstemp(suffix=".tmp", dir=path.parent)
+        os.close(fd)
+        tmp_path = Path(tmp_name)
+        try:
+            encode(path, tmp_path)
+            size_out = tmp_path.stat().st_size
+        except Exception as e:
+            tmp_path.unlink(missing_ok=True)
+            self.log.warning(f"Recodificação de {path.name} falhou: {e}",
+                             False)
+            self._record(size_in, size_in, False)
+            return path
+
+        if size_out > size_in * (1 - self.min_saving):
+            tmp_path.unlink(missing_ok=True)
+            self._record(size_in, size_in, False)
+            return path
+
+        new_path = path.with_suffix(suffix)
+        os.replace(tmp_path, new_path)
+        if new_path != path:
+            path.unlink(missing_ok=True)
+
+        self._record(size_in, size_out, True)
+        self.log.info(f"{path.name} recodificado: {size_in / 1e6:.2f} MB → "
+                      f"{size_out / 1e6:.2f} MB", False)
+        return new_path
+
+    def report(self) -> dict:
+        """Registra no log e retorna o total economizado."""
+        with self._lock:
+            stats = dict(self.stats)
+
+        saved = stats["bytes_in"] - stats["bytes_out"]
+        self.log.info(f"Recodificação: {stats['transcoded']} de "
+                      f"{stats['files']} arquivos, {saved / 1e6:.1f} MB "
+                      "economizados.")
+        return {**stats, "saved": saved}
@@ -6,6 +6,12 @@ Created on Sun May  4 14:39:42 2025.
 @author: vcsil
 """
 from pathlib import Path
+import hashlib
+import os
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp"}
+VIDEO_SUFFIXES = {".mp4", ".avi", ".mkv", ".mov"}
+MEDIA_SUFFIXES = IMAGE_SUFFIXES | VIDEO_SUFFIXES
 
 
 def BUILD_ABSPATH(root, *args):
@@ -29,16 +35,106 @@ def file_root_recursive(root_dir: Path) -> list[Path]:
         Lista com o endereço de todas os arquvios de imagem.
 
     """
-    IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif"}
-    VIDEO_SUFFIXES = {".mp4", ".avi", ".mkv", ".mov"}
+    return list(iter_media_files(root_dir))
+
+
+def iter_media_files(root_dir: Path):
+    """
+    Percorre os arquivos de mídia sob `root_dir` sem montar uma lista.
+
+    Usa os.scandir em profundidade, então o primeiro arquivo é entregue
+    imediatamente e a memória não cresce com o tamanho da árvore.
+
+    Parameters
+    ----------
+    root_dir : Path
+        Path do diretório raiz a se buscar os arquivos.
+
+    Yields
+    ------
+    Path
+        Endereço de cada arquivo de imagem ou vídeo encontrado.
+
+    """
+    stack = [str(root_dir)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif Path(entry.name).suffix.lower() in MEDIA_SUFFIXES:
+                        yield Path(entry.path)
+        except OSError:
+            # Diretório removido ou sem permissão durante a varredura
+            continue
+
+
+def try_lock(path: Path):
+    """
+    Tenta pegar, sem esperar, o lock exclusivo de um arquivo.
+
+    Returns
+    -------
+    TYPE
+        O arquivo aberto, que mantém o lock até ser fechado (ou o processo
+        terminar), ou None se outro processo já tem o lock.
+
+    """
+    import fcntl
 
-    files = [p for p in root_dir.rglob("*")
-             if p.suffix.lower() in (*IMAGE_SUFFIXES, *VIDEO_SUFFIXES)]
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
 
-    return files
+    return f
 
 
 def create_directory(path: Path):
     """Cria diretórios que não existem."""
     if not path.exists():
         path.mkdir(parents=True, exist_ok=True)
+
+
+def parse_size(value) -> int:
+    """
+    Converte tamanhos como "500M" ou "20G" para bytes.
+
+    Parameters
+    ----------
+    value : TYPE
+        Número de bytes ou texto com sufixo K, M, G ou T (base 1024).
+
+    Returns
+    -------
+    int
+        Tamanho em bytes (0 para valores vazios).
+
+    """
+    if value is None:
+        return 0
+
+    text = str(value).strip().upper().rstrip("B")
+    if not text:
+        return 0
+
+    units = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+
+    return int(float(text))
+
+
+def md5_file(path: Path, block: int = 1024 * 1024) -> str:
+    """Calcula o md5 de um arquivo lendo em blocos."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        while chunk := f.read(block):
+            digest.update(chunk)
+
+    return digest.hexdigest()